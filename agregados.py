@@ -0,0 +1,162 @@
+# ----------------------------------------------------------
+# CACHÉ DE AGREGADOS COMPARTIDA ENTRE SESIONES
+# ----------------------------------------------------------
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Memoria máxima de la caché (MB), configurable por entorno
+PRESUPUESTO_MB = float(os.environ.get("CRM_PRESUPUESTO_AGREGADOS_MB", 256))
+
+
+def tamano_objeto(valor):
+    """Memoria aproximada de un agregado en bytes"""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, (tuple, list)):
+        return sys.getsizeof(valor) + sum(tamano_objeto(elemento) for elemento in valor)
+    return sys.getsizeof(valor)
+
+
+class CacheAgregados:
+    """Agregados por (origen, versión de datos, nombre, filtros), con presupuesto de memoria.
+
+    Es un único objeto por proceso: todas las sesiones con los mismos
+    filtros reutilizan el mismo resultado, que se calcula una sola vez por
+    versión de los datos aunque varias sesiones lo pidan a la vez. Al
+    llegar una versión nueva se descartan los agregados de la anterior y,
+    si se supera el presupuesto, se expulsan los menos usados (LRU).
+
+    Los valores devueltos son compartidos: no se deben modificar.
+    """
+
+    def __init__(self, presupuesto_mb=PRESUPUESTO_MB):
+        self.presupuesto_bytes = int(presupuesto_mb * 1024 * 1024)
+        self.bytes_usados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+        self._entradas = OrderedDict()
+        self._versiones = {}
+        self._calculando = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, origen, version, nombre, filtros, calcular):
+        """Devuelve el agregado guardado o lo calcula con `calcular()`"""
+        clave = (origen, version, nombre, filtros)
+        with self._lock:
+            self._actualizar_version(origen, version)
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return self._entradas[clave][0]
+            lock_clave = self._calculando.setdefault(clave, threading.Lock())
+
+        # Un solo cálculo por clave; las demás sesiones esperan su resultado
+        with lock_clave:
+            with self._lock:
+                if clave in self._entradas:
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return self._entradas[clave][0]
+            try:
+                valor = calcular()
+            except BaseException:
+                with self._lock:
+                    self._calculando.pop(clave, None)
+                raise
+            with self._lock:
+                self.fallos += 1
+                if self._versiones.get(origen) == version:
+                    self._guardar(clave, valor)
+                # El lock de la clave se suelta con el valor ya guardado: quien llegue después lo encuentra
+                self._calculando.pop(clave, None)
+            return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.bytes_usados = 0
+
+    def _actualizar_version(self, origen, version):
+        """Registra una versión más nueva del origen y descarta los agregados anteriores a ella.
+
+        Una petición con una versión vieja (una sesión que aún no refrescó) no
+        expulsa nada: se calcula sin guardarse.
+        """
+        vigente = self._versiones.get(origen)
+        if vigente is not None and version <= vigente:
+            return
+        self._versiones[origen] = version
+        for clave in [c for c in self._entradas if c[0] == origen and c[1] < version]:
+            self._quitar(clave)
+
+    def _guardar(self, clave, valor):
+        tamano = tamano_objeto(valor)
+        if tamano > self.presupuesto_bytes:
+            return
+        while self._entradas and self.bytes_usados + tamano > self.presupuesto_bytes:
+            self._quitar(next(iter(self._entradas)))
+            self.expulsiones += 1
+        self._entradas[clave] = (valor, tamano)
+        self.bytes_usados += tamano
+
+    def _quitar(self, clave):
+        _, tamano = self._entradas.pop(clave)
+        self.bytes_usados -= tamano
+
+
+# ----------------------------------------------------------
+# AGREGADOS DE LAS PESTAÑAS
+# ----------------------------------------------------------
+def ventas_por_segmento(cubo, filtros):
+    """Ventas, clientes únicos y filas por segmento (pestaña Analítica)"""
+    segmentos = cubo.indicadores(filtros, por=["segmento"])
+    return pd.DataFrame({
+        "segmento": segmentos["segmento"].astype(str),
+        "monto_total": segmentos["monto_total_suma"],
+        "codigo_cliente": segmentos["clientes"],
+        "filas": segmentos["filas"],
+    })
+
+
+def productos_extremos(cubo, n=5):
+    """Productos más y menos vendidos por cantidad en todo el historial (pestaña Analítica)"""
+    cantidades = cubo.productos()[["producto", "cantidad"]].astype({"producto": object}).set_index("producto")["cantidad"]
+    return cantidades.nlargest(n).reset_index().dropna(), cantidades.nsmallest(n).reset_index().dropna()
+
+
+def productos_mas_vendidos(cubo, filtros, n=10):
+    """Productos con más unidades vendidas, con columnas formateadas (pestaña Vendedores)"""
+    top = (cubo.productos(filtros).astype({"producto": object})
+           .set_index("producto")[["cantidad", "monto"]]
+           .nlargest(n, "cantidad").reset_index())
+    top['monto_formateado'] = top['monto'].apply(lambda x: f"RD${x:,.2f}")
+    top['cantidad_formateada'] = top['cantidad'].apply(lambda x: f"{x:,.0f}")
+    return top
+
+
+def estadisticas_vendedores(cubo, filtros):
+    """Comparativa por vendedor/zona con columnas formateadas (pestaña Vendedores)"""
+    zonas = cubo.indicadores(filtros, por=["zona"])
+    stats = pd.DataFrame({
+        "zona": zonas["zona"].astype(str),
+        "nombre": zonas["filas"],
+        "intervalo_compra": zonas["intervalo_compra_promedio"],
+        "efectividad_entrega": zonas["efectividad_entrega_promedio"],
+        "ticket_promedio": zonas["ticket_promedio_promedio"],
+        "valor_cliente": zonas["valor_cliente_promedio"],
+        "monto_total": zonas["monto_total_suma"],
+    })
+    stats["clientes_formateado"] = stats["nombre"].apply(lambda x: f"{x:,.0f}")
+    stats["frecuencia_formateada"] = stats["intervalo_compra"].round(0).apply(lambda x: "—" if pd.isna(x) else f"{x:,.0f}")
+    stats["efectividad_formateada"] = (stats["efectividad_entrega"] * 100).round(2).apply(lambda x: f"{x:.2f}%")
+    stats["ticket_formateado"] = stats["ticket_promedio"].round(2).apply(lambda x: f"RD${x:,.2f}")
+    stats["valor_cliente_formateado"] = stats["valor_cliente"].round(2).apply(lambda x: f"RD${x:,.2f}")
+    stats["monto_total_formateado"] = stats["monto_total"].round(2).apply(lambda x: f"RD${x:,.2f}")
+    return stats
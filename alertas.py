@@ -0,0 +1,91 @@
+# ----------------------------------------------------------
+# MOTOR DE ALERTAS: REGLAS PONDERADAS Y PRIORIDAD VECTORIZADA
+# ----------------------------------------------------------
+import operator
+
+import numpy as np
+import pandas as pd
+
+SIN_ALERTA = "NINGUNA"
+
+OPERADORES = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Color de fondo de cada prioridad en las tablas
+COLORES_PRIORIDAD = {
+    "ALTA": "#ffcccc",
+    "MEDIA": "#fff2cc",
+    "BAJA": "#e6f3ff",
+}
+
+
+def condicion(nombre, columna, operador, umbral, peso=1.0):
+    """Condición de alerta sobre una columna: `columna <operador> umbral`"""
+    if operador not in OPERADORES:
+        raise ValueError(f"Operador desconocido: {operador}. Opciones: {', '.join(OPERADORES)}")
+    return {"nombre": nombre, "columna": columna, "operador": operador, "umbral": umbral, "peso": peso}
+
+
+def reglas_por_defecto(dias_inactividad=90, efectividad_minima=0.8):
+    """Reglas de la pestaña Alertas: visita por inactividad y baja efectividad de entrega.
+
+    Devuelve (condiciones, niveles). Cada nivel es (prioridad, condiciones
+    requeridas) y se evalúan en orden: gana el primero que se cumple.
+    """
+    condiciones = [
+        condicion("necesita_visita", "frecuencia_compra", ">", dias_inactividad, peso=2),
+        condicion("baja_efectividad", "efectividad_entrega", "<", efectividad_minima, peso=1),
+    ]
+    niveles = [
+        ("ALTA", ["necesita_visita", "baja_efectividad"]),
+        ("MEDIA", ["necesita_visita"]),
+        ("BAJA", ["baja_efectividad"]),
+    ]
+    return condiciones, niveles
+
+
+class MotorAlertas:
+    """Evalúa un conjunto de reglas sobre todos los clientes a la vez.
+
+    Cada condición es una comparación vectorizada sobre una columna y aporta
+    su `peso` al puntaje numérico del cliente. La prioridad categórica se
+    resuelve con `np.select` sobre los niveles, en orden; los clientes que no
+    cumplen ningún nivel quedan como `NINGUNA`.
+    """
+
+    def __init__(self, condiciones, niveles):
+        nombres = [c["nombre"] for c in condiciones]
+        for prioridad, requeridas in niveles:
+            faltan = set(requeridas) - set(nombres)
+            if faltan:
+                raise ValueError(f"El nivel {prioridad} usa condiciones no definidas: {', '.join(sorted(faltan))}")
+        self.condiciones = condiciones
+        self.niveles = niveles
+        self.categorias = pd.CategoricalDtype([p for p, _ in niveles] + [SIN_ALERTA], ordered=True)
+
+    def evaluar_condiciones(self, df):
+        """DataFrame booleano con una columna por condición"""
+        return pd.DataFrame({
+            c["nombre"]: OPERADORES[c["operador"]](df[c["columna"]], c["umbral"]).fillna(False).astype(bool)
+            for c in self.condiciones
+        }, index=df.index)
+
+    def evaluar(self, df):
+        """Condiciones, `puntaje` (suma de pesos) y `prioridad` (categórica) de cada fila"""
+        resultado = self.evaluar_condiciones(df)
+        pesos = np.array([c["peso"] for c in self.condiciones], dtype=float)
+        resultado["puntaje"] = resultado[[c["nombre"] for c in self.condiciones]].to_numpy() @ pesos
+        prioridad = np.select(
+            [resultado[requeridas].all(axis=1).to_numpy() for _, requeridas in self.niveles],
+            [p for p, _ in self.niveles],
+            default=SIN_ALERTA,
+        )
+        resultado["prioridad"] = pd.Categorical(prioridad, dtype=self.categorias)
+        return resultado
+
@@ -0,0 +1,80 @@
+# ----------------------------------------------------------
+# BENCHMARK: AGREGACIÓN POR CLIENTE (LAMBDA vs VECTORIZADA)
+# ----------------------------------------------------------
+# Uso: python benchmarks/bench_agregacion.py [--clientes 50000] [--lineas 2000000]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datos import agregar_pedidos, mes_mas_frecuente, preparar_pedidos
+from datos_sinteticos import generar
+
+
+def generar_pedidos(n_clientes, n_lineas, semilla=0):
+    """Hoja `pedido` sintética (ver datos_sinteticos.py), limpiada como en la carga"""
+    pedidos, _, _ = generar(n_clientes, n_lineas, semilla)
+    return preparar_pedidos(pedidos)
+
+
+def agregacion_lambda(pedidos):
+    """Agregación original de load_data_from_drive"""
+    pedidos_agg = pedidos.groupby("codigo_cliente").agg({
+        "fecha_pedido": "max",
+        "mes_pedido": lambda x: x.value_counts().index[0],
+        "monto": ["sum", "mean"],
+        "codigo_producto": "count"
+    })
+    pedidos_agg.columns = ['ultimo_pedido', 'mes_frecuente', 'monto_total', 'ticket_promedio', 'total_pedidos']
+    return pedidos_agg
+
+
+def agregacion_vectorizada(pedidos):
+    agregados, conteo_meses = agregar_pedidos(pedidos)
+    agregados["ticket_promedio"] = agregados["monto_total"] / agregados["n_montos"]
+    agregados["mes_frecuente"] = mes_mas_frecuente(conteo_meses)
+    return agregados, conteo_meses
+
+
+def cronometrar(funcion, *args, repeticiones=1):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la agregación por cliente")
+    parser.add_argument("--clientes", type=int, default=50_000)
+    parser.add_argument("--lineas", type=int, default=2_000_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    pedidos = generar_pedidos(args.clientes, args.lineas)
+    print(f"{len(pedidos):,} líneas de pedido, {pedidos['codigo_cliente'].nunique():,} clientes")
+
+    t_vectorizada, (nuevo, conteo_meses) = cronometrar(agregacion_vectorizada, pedidos, repeticiones=args.repeticiones)
+    t_lambda, original = cronometrar(agregacion_lambda, pedidos)
+
+    # Mismos resultados (en empates el mes elegido puede diferir, pero debe tener el conteo máximo)
+    nuevo = nuevo.loc[original.index]
+    for columna in ["ultimo_pedido", "monto_total", "ticket_promedio", "total_pedidos"]:
+        pd.testing.assert_series_equal(nuevo[columna], original[columna], check_dtype=False, check_names=False)
+    conteo_elegido = conteo_meses.loc[list(zip(nuevo.index, nuevo["mes_frecuente"]))].to_numpy()
+    conteo_maximo = conteo_meses.groupby(level=0).max().loc[original.index].to_numpy()
+    assert np.array_equal(conteo_elegido, conteo_maximo)
+
+    print(f"lambda (value_counts por cliente): {t_lambda:8.3f} s")
+    print(f"vectorizada:                       {t_vectorizada:8.3f} s")
+    print(f"aceleración:                       {t_lambda / t_vectorizada:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
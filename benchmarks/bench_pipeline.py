@@ -0,0 +1,365 @@
+# ----------------------------------------------------------
+# BENCHMARK: TUBERÍA COMPLETA DEL DASHBOARD CON DATOS SINTÉTICOS
+# ----------------------------------------------------------
+# Uso: python benchmarks/bench_pipeline.py [--escala pequena|mediana|grande|maxima] [--clientes N --lineas N]
+#      python benchmarks/bench_pipeline.py --comparar benchmarks/resultados/base.json   (sale con 1 si hay regresiones)
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agregados import estadisticas_vendedores, productos_extremos, productos_mas_vendidos, ventas_por_segmento
+from alertas import SIN_ALERTA, MotorAlertas, reglas_por_defecto
+from busqueda import IndiceClientes
+from cubo import CuboVentas
+from datos import AlmacenDatos
+from datos_sinteticos import FILAS_EXCEL, GeneradorVentas, escribir_directorio, escribir_libro
+from exportacion import contenido_exportacion
+from filtros import TODOS, MotorFiltros
+from fuentes import FuenteDatos, crear_fuente, leer_libro
+from geo import NIVELES, MapaVentas
+from instantanea import CARPETA_INSTANTANEA
+from perfiles import IndicePerfiles
+from recomendaciones import MotorRecomendaciones, recomendaciones_cliente
+from riesgo import entrenar_modelo
+from rutas import MAXIMO_PARADAS_RUTA, planificar_rutas
+
+# Escala -> (clientes, líneas de pedido)
+ESCALAS = {
+    "pequena": (1_000, 50_000),
+    "mediana": (50_000, 2_000_000),
+    "grande": (250_000, 10_000_000),
+    "maxima": (1_000_000, 50_000_000),
+}
+CARPETA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+# Fuentes generadas (xlsx y Parquet), reutilizadas entre ejecuciones con los mismos parámetros
+CARPETA_DATOS = os.path.join(CARPETA_INSTANTANEA, "benchmarks")
+
+# Los filtros del sidebar se recorren con estos meses (los más recientes) además de "Todos"
+MESES_FILTRO = 3
+CONSULTAS_BUSQUEDA = 200
+FICHAS_CLIENTE = 100
+# Umbrales por defecto de la pestaña Alertas
+DIAS_INACTIVIDAD = 90
+EFECTIVIDAD_MINIMA = 0.8
+# Se considera regresión una etapa más lenta que la base en más de TOLERANCIA (fracción)
+# y MINIMO_SEGUNDOS (por debajo de eso el ruido domina)
+TOLERANCIA = 0.25
+MINIMO_SEGUNDOS = 0.05
+
+pd.set_option("mode.copy_on_write", True)
+
+
+class FuenteMemoria(FuenteDatos):
+    """Hojas ya generadas, entregadas como si vinieran de la fuente (sin E/S)"""
+
+    tipo = "memoria"
+
+    def __init__(self, ubicacion, hojas):
+        super().__init__(ubicacion)
+        self.hojas = hojas
+
+    def _testigo_actual(self):
+        return [self.ubicacion]
+
+    def _leer(self):
+        # Copias superficiales: la limpieza añade columnas sin tocar las hojas generadas
+        return tuple(hoja.copy(deep=False) for hoja in self.hojas)
+
+
+class Informe:
+    """Tiempos por etapa y metadatos de la ejecución, guardados como JSON"""
+
+    def __init__(self, parametros):
+        self.parametros = parametros
+        self.etapas = []
+
+    @contextmanager
+    def etapa(self, nombre, **detalle):
+        """Mide el bloque; el bloque puede completar `detalle` (filas, consultas...)"""
+        inicio = time.perf_counter()
+        yield detalle
+        segundos = time.perf_counter() - inicio
+        self.etapas.append({"etapa": nombre, "segundos": round(segundos, 4), **detalle})
+        print(f"{nombre:<32} {segundos:9.3f} s  {json.dumps(detalle, ensure_ascii=False) if detalle else ''}")
+
+    def omitir(self, nombre, motivo):
+        self.etapas.append({"etapa": nombre, "segundos": None, "omitida": motivo})
+        print(f"{nombre:<32} {'—':>9}    omitida: {motivo}")
+
+    def como_dict(self):
+        return {
+            "version": 1,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "parametros": self.parametros,
+            "entorno": entorno(),
+            "memoria_maxima_mb": round(memoria_maxima_mb(), 1),
+            "etapas": self.etapas,
+        }
+
+    def guardar(self, ruta):
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(self.como_dict(), archivo, ensure_ascii=False, indent=2)
+
+
+def memoria_maxima_mb():
+    """Memoria residente máxima del proceso (ru_maxrss está en KB en Linux y en bytes en macOS)"""
+    maxima = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxima / 1024 ** 2 if sys.platform == "darwin" else maxima / 1024
+
+
+def entorno():
+    """Versiones y máquina, para comparar solo informes comparables"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import pyarrow
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pyarrow.__version__,
+        "plataforma": platform.platform(),
+        "procesadores": os.cpu_count(),
+    }
+
+
+# ----------------------------------------------------------
+# Etapas
+# ----------------------------------------------------------
+def medir_lectura(informe, generador, hojas, args):
+    """Lectura de la fuente: libro xlsx (si cabe en una hoja) y directorio Parquet"""
+    base = os.path.join(args.datos, f"{args.clientes}x{args.lineas}_s{args.semilla}_{generador.fin:%Y%m%d}")
+    if args.lineas > min(FILAS_EXCEL, args.xlsx_maximo):
+        informe.omitir("lectura_xlsx", f"{args.lineas:,} líneas (máximo {min(FILAS_EXCEL, args.xlsx_maximo):,} para xlsx)")
+    else:
+        ruta = base + ".xlsx"
+        if not os.path.exists(ruta):
+            escribir_libro(ruta, hojas)
+        with informe.etapa("lectura_xlsx", megabytes=round(os.path.getsize(ruta) / 1024 ** 2, 1)):
+            leer_libro(ruta)
+    if args.sin_parquet:
+        informe.omitir("lectura_directorio", "--sin-parquet")
+        return
+    if not os.path.isdir(base):
+        escribir_directorio(base + ".tmp", generador, args.lineas)
+        os.replace(base + ".tmp", base)
+    with informe.etapa("lectura_directorio"):
+        crear_fuente("directorio", base).leer_si_cambio(forzar=True)
+
+
+def medir_carga(informe, hojas, args, carpeta):
+    """Limpieza y agregados (refresco completo), modelo de riesgo y tablas de load_data_from_drive"""
+    fuente = FuenteMemoria(f"{args.clientes}x{args.lineas}_s{args.semilla}", hojas)
+    almacen = AlmacenDatos(fuente, carpeta=carpeta)
+    with informe.etapa("carga_agregados", lineas=args.lineas):
+        almacen.refrescar(forzar=True)
+    with informe.etapa("entrenamiento_riesgo") as detalle:
+        almacen.modelo_riesgo = entrenar_modelo(almacen.series, almacen.pedidos, almacen.entregas)
+        detalle["clientes"] = (almacen.modelo_riesgo.metadatos["clientes"] if almacen.modelo_riesgo is not None else 0)
+    with informe.etapa("load_data_from_drive"):
+        resultados = almacen.resultados()
+    # Arranque en frío de otro proceso: instantanea local en lugar de la fuente
+    with informe.etapa("arranque_instantanea"):
+        AlmacenDatos(FuenteMemoria(fuente.ubicacion, hojas), carpeta=carpeta).refrescar()
+    return almacen, resultados
+
+
+def combinaciones_filtros(motor):
+    meses = [TODOS] + motor.opciones["mes"][-MESES_FILTRO:]
+    return [
+        (vendedor, segmento, mes)
+        for vendedor in [TODOS] + motor.opciones["vendedor"]
+        for segmento in [TODOS] + motor.opciones["segmento"]
+        for mes in meses
+    ]
+
+
+def medir_filtros(informe, df, pedidos):
+    with informe.etapa("filtros_indices"):
+        motor = MotorFiltros(df, pedidos)
+    combinaciones = combinaciones_filtros(motor)
+    with informe.etapa("filtros_consultas", consultas=len(combinaciones)):
+        for combinacion in combinaciones:
+            motor.filtrar(df, *combinacion)
+    return motor, combinaciones
+
+
+def medir_analitica(informe, df, pedidos, series, combinaciones, motor):
+    with informe.etapa("analitica_cubo"):
+        cubo = CuboVentas(df, pedidos)
+    with informe.etapa("analitica_consultas", consultas=len(combinaciones)):
+        for combinacion in combinaciones:
+            filtros = cubo.filtros_cliente(*combinacion)
+            cubo.indicadores(filtros)
+            ventas_por_segmento(cubo, filtros)
+        productos_extremos(cubo)
+    with informe.etapa("analitica_tendencia", consultas=len(combinaciones)):
+        for combinacion in combinaciones:
+            filtrado = motor.filtrar(df, *combinacion)
+            series.serie("M", clientes=None if filtrado is df else filtrado["codigo_cliente"])
+    with informe.etapa("analitica_mapa"):
+        mapa = MapaVentas(df)
+    with informe.etapa("analitica_mapa_consultas", consultas=len(combinaciones) * len(NIVELES)):
+        for combinacion in combinaciones:
+            filtros = cubo.filtros_cliente(*combinacion)
+            for nivel in NIVELES:
+                mapa.celdas(filtros, nivel)
+    return cubo, mapa
+
+
+def medir_clientes(informe, df, pedidos, rng):
+    with informe.etapa("clientes_indice_busqueda"):
+        indice = IndiceClientes(df)
+    # Consultas: prefijos de código, palabras del nombre y nombres con una letra cambiada
+    nombres = df["nombre"].astype(str).to_numpy()[rng.integers(0, len(df), CONSULTAS_BUSQUEDA)]
+    consultas = [
+        str(df["codigo_cliente"].iloc[int(rng.integers(len(df)))])[:3] if i % 3 == 0
+        else nombre.split()[0] if i % 3 == 1
+        else nombre[:-2] + "x" + nombre[-1]
+        for i, nombre in enumerate(nombres)
+    ]
+    with informe.etapa("clientes_busqueda", consultas=len(consultas)):
+        for consulta in consultas:
+            indice.buscar(consulta)
+    with informe.etapa("clientes_perfiles"):
+        perfiles = IndicePerfiles(df, pedidos)
+    with informe.etapa("clientes_recomendaciones"):
+        motor = MotorRecomendaciones(pedidos)
+    fichas = rng.integers(0, len(df), FICHAS_CLIENTE)
+    with informe.etapa("clientes_fichas", consultas=len(fichas)):
+        for posicion in fichas:
+            cliente = df.iloc[int(posicion)]
+            perfiles.productos_cliente(cliente["codigo_cliente"])
+            recomendaciones_cliente(motor, perfiles, cliente)
+
+
+def medir_vendedores(informe, cubo, motor):
+    vendedores = [TODOS] + motor.opciones["vendedor"]
+    with informe.etapa("vendedores_consultas", consultas=len(vendedores)):
+        for vendedor in vendedores:
+            filtros = cubo.filtros_cliente(vendedor)
+            estadisticas_vendedores(cubo, filtros)
+            productos_mas_vendidos(cubo, filtros)
+            cubo.indicadores(filtros)
+
+
+def medir_alertas(informe, df, mapa):
+    motor = MotorAlertas(*reglas_por_defecto(DIAS_INACTIVIDAD, EFECTIVIDAD_MINIMA))
+    with informe.etapa("alertas_prioridad") as detalle:
+        evaluacion = motor.evaluar(df)
+        activas = evaluacion[evaluacion["prioridad"] != SIN_ALERTA].sort_values("puntaje", ascending=False, kind="mergesort")
+        con_alerta = pd.concat([df.loc[activas.index], activas], axis=1)
+        detalle["clientes_con_alerta"] = len(con_alerta)
+    # Las mismas paradas que planifica la pestaña Alertas (alertas de mayor puntaje, hasta el tope)
+    paradas = con_alerta.head(MAXIMO_PARADAS_RUTA)
+    posiciones = df.index.get_indexer(paradas.index)
+    por_vendedor = paradas["zona"].astype(str).value_counts()
+    with informe.etapa("alertas_rutas", paradas=len(paradas), paradas_maximas_vendedor=int(por_vendedor.max() if len(por_vendedor) else 0),
+                       paradas_por_vendedor={vendedor: int(n) for vendedor, n in por_vendedor.items()}):
+        planificar_rutas(paradas.assign(lat=mapa.lat[posiciones], lon=mapa.lon[posiciones]))
+    return con_alerta
+
+
+def medir_exportacion(informe, df, args):
+    for formato in ["CSV", "Parquet"]:
+        with informe.etapa(f"exportacion_{formato.lower()}", filas=len(df)) as detalle:
+            detalle["megabytes"] = round(len(contenido_exportacion(df, formato)) / 1024 ** 2, 1)
+    if len(df) > args.xlsx_maximo:
+        informe.omitir("exportacion_excel", f"{len(df):,} filas (máximo {args.xlsx_maximo:,})")
+    else:
+        with informe.etapa("exportacion_excel", filas=len(df)):
+            contenido_exportacion(df, "Excel")
+
+
+# ----------------------------------------------------------
+# Comparación con un informe base
+# ----------------------------------------------------------
+def comparar(actual, base, tolerancia=TOLERANCIA, minimo_segundos=MINIMO_SEGUNDOS):
+    """Filas (etapa, base, actual, cociente, regresión) de las etapas medidas en ambos informes"""
+    tiempos_base = {e["etapa"]: e["segundos"] for e in base["etapas"] if e.get("segundos") is not None}
+    filas = []
+    for etapa in actual["etapas"]:
+        anterior = tiempos_base.get(etapa["etapa"])
+        if anterior is None or etapa.get("segundos") is None:
+            continue
+        cociente = etapa["segundos"] / anterior if anterior > 0 else float("inf")
+        regresion = cociente > 1 + tolerancia and etapa["segundos"] - anterior > minimo_segundos
+        filas.append((etapa["etapa"], anterior, etapa["segundos"], cociente, regresion))
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la tubería del dashboard con datos sintéticos")
+    parser.add_argument("--escala", choices=list(ESCALAS), default="pequena")
+    parser.add_argument("--clientes", type=int, default=None, help="Sustituye los clientes de la escala")
+    parser.add_argument("--lineas", type=int, default=None, help="Sustituye las líneas de pedido de la escala")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--fin", default=None, help="Último día del histórico (fíjelo para comparar entre días)")
+    parser.add_argument("--datos", default=CARPETA_DATOS, help="Carpeta de las fuentes generadas")
+    parser.add_argument("--xlsx-maximo", type=int, default=250_000, help="Líneas máximas para generar y leer el xlsx")
+    parser.add_argument("--sin-parquet", action="store_true", help="No escribir ni leer el directorio Parquet")
+    parser.add_argument("--salida", default=None, help="Informe JSON (por defecto en benchmarks/resultados/)")
+    parser.add_argument("--comparar", default=None, help="Informe base: sale con código 1 si alguna etapa empeora")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+    clientes, lineas = ESCALAS[args.escala]
+    args.clientes = args.clientes or clientes
+    args.lineas = args.lineas or lineas
+
+    generador = GeneradorVentas(args.clientes, args.semilla, args.fin)
+    informe = Informe({
+        "escala": args.escala, "clientes": args.clientes, "lineas": args.lineas,
+        "semilla": args.semilla, "fin": f"{generador.fin:%Y-%m-%d}",
+    })
+    rng = np.random.default_rng(args.semilla)
+    with informe.etapa("generacion"):
+        hojas = generador.hojas(args.lineas)
+
+    medir_lectura(informe, generador, hojas, args)
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen, (df, pedidos, *_) = medir_carga(informe, hojas, args, carpeta)
+    motor, combinaciones = medir_filtros(informe, df, pedidos)
+    cubo, mapa = medir_analitica(informe, df, pedidos, almacen.series, combinaciones, motor)
+    medir_clientes(informe, df, pedidos, rng)
+    medir_vendedores(informe, cubo, motor)
+    medir_alertas(informe, df, mapa)
+    medir_exportacion(informe, df, args)
+
+    salida = args.salida or os.path.join(
+        CARPETA_RESULTADOS, f"pipeline_{args.clientes}x{args.lineas}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    informe.guardar(salida)
+    print(f"memoria máxima: {memoria_maxima_mb():,.0f} MB · informe en {os.path.abspath(salida)}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            base = json.load(archivo)
+        if base["parametros"] != informe.parametros:
+            print(f"Aviso: la base usa otros parámetros ({base['parametros']})")
+        filas = comparar(informe.como_dict(), base, args.tolerancia)
+        for etapa, anterior, segundos, cociente, regresion in filas:
+            print(f"{etapa:<32} {anterior:9.3f} → {segundos:9.3f} s  {cociente:5.2f}x{'  REGRESIÓN' if regresion else ''}")
+        regresiones = [fila[0] for fila in filas if fila[4]]
+        if regresiones:
+            raise SystemExit(f"{len(regresiones)} etapas más lentas que la base (tolerancia {args.tolerancia:.0%}): {', '.join(regresiones)}")
+
+
+if __name__ == "__main__":
+    main()
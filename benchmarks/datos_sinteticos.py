@@ -0,0 +1,254 @@
+# ----------------------------------------------------------
+# DATOS SINTÉTICOS: HOJAS pedido / entregado / clientes A CUALQUIER ESCALA
+# ----------------------------------------------------------
+# Uso: python benchmarks/datos_sinteticos.py datos/sinteticos.xlsx --clientes 1000 --lineas 50000
+#      python benchmarks/datos_sinteticos.py datos/sinteticos --clientes 1000000 --lineas 50000000
+# (sin extensión .xlsx se escribe un directorio Parquet para CRM_FUENTE=directorio)
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuentes import HOJAS
+
+# Zona -> (latitud, longitud, peso en la cartera)
+ZONAS = {
+    "Santo Domingo": (18.486, -69.931, 0.34),
+    "Santiago": (19.451, -70.697, 0.18),
+    "La Vega": (19.222, -70.529, 0.09),
+    "San Cristóbal": (18.417, -70.107, 0.09),
+    "San Pedro": (18.461, -69.306, 0.07),
+    "Puerto Plata": (19.793, -70.688, 0.08),
+    "La Romana": (18.427, -68.973, 0.08),
+    "Barahona": (18.208, -71.101, 0.07),
+}
+# Tipo de negocio -> (peso en la cartera, multiplicador de compras)
+TIPOS_NEGOCIO = {
+    "Colmado": (0.55, 1.0),
+    "Supermercado": (0.08, 4.0),
+    "Farmacia": (0.10, 1.5),
+    "Ferretería": (0.08, 1.2),
+    "Cafetería": (0.09, 0.8),
+    "Repostería": (0.10, 0.7),
+}
+NOMBRES = ["Juan", "María", "José", "Ana", "Luis", "Carmen", "Pedro", "Rosa", "Miguel", "Altagracia",
+           "Rafael", "Juana", "Francisco", "Mercedes", "Ramón", "Yolanda", "Manuel", "Belkis", "Carlos", "Ángela"]
+APELLIDOS = ["Pérez", "Rodríguez", "Martínez", "García", "Santana", "Reyes", "Díaz", "Jiménez", "Núñez", "Peña",
+             "Castillo", "Féliz", "Almonte", "Rosario", "Guzmán", "Mejía", "Tavárez", "Encarnación", "Batista", "Vásquez"]
+FAMILIAS = ["Arroz", "Aceite", "Habichuelas", "Salami", "Leche", "Café", "Azúcar", "Pasta", "Refresco", "Cerveza",
+            "Jabón", "Detergente", "Galletas", "Harina", "Sardinas", "Avena", "Ron", "Agua", "Papel", "Pilas"]
+
+ANIOS = 3
+N_PRODUCTOS = 800
+VENDEDORES_POR_ZONA = 3
+FRACCION_CODIGOS_TEXTO = 0.05   # códigos como "C000123" mezclados con numéricos, como en la hoja real
+FRACCION_SIN_COORDENADAS = 0.15
+FRACCION_ABANDONO = 0.30
+LINEAS_POR_PEDIDO = 4           # media de productos por pedido
+TAMANO_BLOQUE = 1_000_000       # líneas generadas por bloque
+FILAS_EXCEL = 1_048_575         # filas de datos que caben en una hoja xlsx
+
+
+def _acumulados(pesos):
+    acumulados = np.cumsum(pesos, dtype=float)
+    return acumulados / acumulados[-1]
+
+
+def _elegir(acumulados, rng, n):
+    """Índices al azar según probabilidades acumuladas (más rápido que `rng.choice` con `p`)"""
+    return np.minimum(np.searchsorted(acumulados, rng.random(n), side="right"), len(acumulados) - 1)
+
+
+class GeneradorVentas:
+    """Cartera de clientes y líneas de pedido/entrega con distribuciones realistas.
+
+    - Clientes: zona y tipo de negocio con pesos fijos, 5% de códigos de
+      texto, coordenadas alrededor de la ciudad de la zona (15% sin ellas).
+    - Actividad por cliente de cola larga (Pareto), con fecha de alta y un
+      30% que deja de comprar en algún momento (abandono).
+    - Pedidos de varias líneas el mismo día; productos por popularidad Zipf,
+      desplazada por tipo de negocio para que los perfiles difieran.
+    - Entregas: cada línea se entrega con la efectividad del cliente
+      (Beta, media ~88%) entre 0 y 3 días después.
+
+    Todo depende solo de la semilla: el bloque k de líneas sale de su propio
+    generador, así que escribir por bloques da el mismo resultado que en memoria.
+    """
+
+    def __init__(self, n_clientes, semilla=0, fin=None, anios=ANIOS, n_productos=N_PRODUCTOS):
+        self.n_clientes = n_clientes
+        self.semilla = semilla
+        self.n_productos = n_productos
+        self.fin = pd.Timestamp(fin if fin is not None else pd.Timestamp.now()).normalize()
+        self.dias = int(anios * 365)
+        rng = np.random.default_rng([semilla, 0])
+
+        self.zona = _elegir(_acumulados([peso for *_, peso in ZONAS.values()]), rng, n_clientes)
+        self.tipo = _elegir(_acumulados([peso for peso, _ in TIPOS_NEGOCIO.values()]), rng, n_clientes)
+        # Ventana de actividad (días desde el inicio del histórico): un tercio ya estaba al empezar
+        self.alta = np.clip((rng.random(n_clientes) * 1.5 - 0.5) * self.dias, 0, self.dias - 1).astype(np.int64)
+        abandona = rng.random(n_clientes) < FRACCION_ABANDONO
+        self.baja = np.where(abandona, self.alta + rng.random(n_clientes) * (self.dias - self.alta), self.dias).astype(np.int64)
+        self.baja = np.maximum(self.baja, self.alta + 1)
+        multiplicador = np.array([m for _, m in TIPOS_NEGOCIO.values()])[self.tipo]
+        actividad = (rng.pareto(1.5, n_clientes) + 1) * multiplicador * (self.baja - self.alta)
+        self._clientes_acumulados = _acumulados(actividad)
+        self.efectividad = rng.beta(9, 1.2, n_clientes)
+
+        # Catálogo: popularidad Zipf y precio base por producto
+        self._productos_acumulados = _acumulados(1 / np.arange(1, n_productos + 1) ** 1.1)
+        self.precio_base = np.round(rng.lognormal(np.log(150), 0.8, n_productos), 2)
+        self.nombres_producto = [
+            f"{FAMILIAS[i % len(FAMILIAS)]} {['Premium', 'Clásico', 'Económico', 'Familiar'][(i // len(FAMILIAS)) % 4]} {i:04d}"
+            for i in range(n_productos)
+        ]
+        # Desplazamiento del ranking de productos por tipo de negocio
+        self._desplazamiento = rng.integers(0, n_productos, len(TIPOS_NEGOCIO))
+
+        numeros = np.arange(1, n_clientes + 1)
+        texto = rng.random(n_clientes) < FRACCION_CODIGOS_TEXTO
+        self.codigos = np.where(texto, pd.Index(numeros).map("C{:06d}".format).to_numpy(dtype=object), numeros.astype(object))
+
+    # ----------------------------------------------------------
+    # Hojas
+    # ----------------------------------------------------------
+    def clientes(self):
+        """Hoja `clientes`"""
+        rng = np.random.default_rng([self.semilla, 1])
+        n = self.n_clientes
+        nombres, apellidos = np.array(NOMBRES, dtype=object), np.array(APELLIDOS, dtype=object)
+        zonas = list(ZONAS)
+        centro = np.array([ZONAS[z][:2] for z in zonas])[self.zona]
+        radio = rng.gamma(2.0, 0.04, n)
+        angulo = rng.random(n) * 2 * np.pi
+        lat = centro[:, 0] + radio * np.sin(angulo)
+        lon = centro[:, 1] + radio * np.cos(angulo)
+        sin_coordenadas = rng.random(n) < FRACCION_SIN_COORDENADAS
+        lat[sin_coordenadas] = np.nan
+        lon[sin_coordenadas] = np.nan
+        zona = pd.Series(np.array(zonas, dtype=object)[self.zona])
+        telefono = pd.Series(rng.integers(2_000_000, 10_000_000, n)).astype(str)
+        return pd.DataFrame({
+            "codigo_cliente": self.codigos,
+            "nombre": nombres[rng.integers(0, len(NOMBRES), n)] + " " + apellidos[rng.integers(0, len(APELLIDOS), n)]
+                      + " " + apellidos[rng.integers(0, len(APELLIDOS), n)],
+            "telefono": ("809-" + telefono.str[:3] + "-" + telefono.str[3:]).to_numpy(),
+            "direccion": ("Calle " + pd.Series(rng.integers(1, 80, n)).astype(str) + " #"
+                          + pd.Series(rng.integers(1, 300, n)).astype(str) + ", " + zona).to_numpy(),
+            "tipo_negocio": np.array(list(TIPOS_NEGOCIO), dtype=object)[self.tipo],
+            "quien_atiende": (zona + " - Vendedor " + pd.Series(rng.integers(1, VENDEDORES_POR_ZONA + 1, n)).astype(str)).to_numpy(),
+            "zona": zona.to_numpy(),
+            "lat": lat.round(6),
+            "lon": lon.round(6),
+        })
+
+    def bloque(self, k, n_lineas):
+        """Líneas (pedidos, entregas) del bloque k, generadas con su propia semilla"""
+        rng = np.random.default_rng([self.semilla, 2, k])
+        # Pedidos con varias líneas: cliente y fecha se comparten entre las líneas de un pedido
+        lineas_pedido = 1 + rng.geometric(1 / LINEAS_POR_PEDIDO, n_lineas // LINEAS_POR_PEDIDO + 1)
+        pedido = np.repeat(np.arange(len(lineas_pedido)), lineas_pedido)[:n_lineas]
+        n_pedidos = pedido[-1] + 1 if n_lineas else 0
+        cliente_pedido = _elegir(self._clientes_acumulados, rng, n_pedidos)
+        dia_pedido = self.alta[cliente_pedido] + (rng.random(n_pedidos) * (self.baja - self.alta)[cliente_pedido]).astype(np.int64)
+        cliente, dia = cliente_pedido[pedido], dia_pedido[pedido]
+
+        producto = (_elegir(self._productos_acumulados, rng, n_lineas) + self._desplazamiento[self.tipo[cliente]]) % self.n_productos
+        # La mitad de las líneas siguen el ranking general, el resto el del tipo de negocio
+        general = rng.random(n_lineas) < 0.5
+        producto[general] = _elegir(self._productos_acumulados, rng, int(general.sum()))
+        cantidad = np.minimum(rng.geometric(0.25, n_lineas), 48)
+        precio = np.round(self.precio_base[producto] * rng.uniform(0.95, 1.05, n_lineas), 2)
+        inicio = self.fin - pd.Timedelta(days=self.dias)
+        productos = pd.Categorical.from_codes(producto, self.nombres_producto)
+
+        pedidos = pd.DataFrame({
+            "codigo_cliente": self.codigos[cliente],
+            "fecha_pedido": inicio + pd.to_timedelta(dia, unit="D"),
+            "codigo_producto": producto + 1000,
+            "producto": productos,
+            "cantidad": cantidad,
+            "precio_unitario": precio,
+        })
+        entregada = rng.random(n_lineas) < self.efectividad[cliente]
+        entregas = pd.DataFrame({
+            "codigo_cliente": self.codigos[cliente[entregada]],
+            "fecha_entrega": inicio + pd.to_timedelta(np.minimum(dia[entregada] + rng.integers(0, 4, int(entregada.sum())), self.dias), unit="D"),
+            "codigo_producto": producto[entregada] + 1000,
+            "producto": productos[entregada],
+            "cantidad": cantidad[entregada],
+        })
+        return pedidos, entregas
+
+    def bloques(self, n_lineas, tamano_bloque=TAMANO_BLOQUE):
+        """(pedidos, entregas) por bloques de `tamano_bloque` líneas"""
+        for k, inicio in enumerate(range(0, n_lineas, tamano_bloque)):
+            yield self.bloque(k, min(tamano_bloque, n_lineas - inicio))
+
+    def hojas(self, n_lineas, tamano_bloque=TAMANO_BLOQUE):
+        """(pedidos, entregas, clientes) en memoria, en el orden de HOJAS"""
+        pedidos, entregas = zip(*(list(self.bloques(n_lineas, tamano_bloque)) or [self.bloque(0, 0)]))
+        return pd.concat(pedidos, ignore_index=True), pd.concat(entregas, ignore_index=True), self.clientes()
+
+
+def generar(n_clientes, n_lineas, semilla=0, fin=None):
+    """Hojas (pedidos, entregas, clientes) sintéticas, como las devuelve una FuenteDatos"""
+    return GeneradorVentas(n_clientes, semilla, fin).hojas(n_lineas)
+
+
+# ----------------------------------------------------------
+# Escritura como fuente de datos
+# ----------------------------------------------------------
+def escribir_libro(ruta, hojas):
+    """Libro xlsx con las tres hojas (CRM_FUENTE=excel)"""
+    if max(len(hoja) for hoja in hojas) > FILAS_EXCEL:
+        raise ValueError(f"Una hoja xlsx admite como máximo {FILAS_EXCEL:,} filas; use un directorio Parquet")
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+    with pd.ExcelWriter(ruta) as libro:
+        for nombre, hoja in zip(HOJAS, hojas):
+            hoja.to_excel(libro, sheet_name=nombre, index=False)
+
+
+def escribir_directorio(carpeta, generador, n_lineas, tamano_bloque=TAMANO_BLOQUE):
+    """Directorio Parquet (CRM_FUENTE=directorio), con pedidos y entregas en una partición por bloque.
+
+    Solo hay un bloque en memoria a la vez. Parquet no admite columnas con
+    números y texto mezclados, así que `codigo_cliente` se escribe como texto
+    en las tres hojas.
+    """
+    for hoja in HOJAS[:2]:
+        os.makedirs(os.path.join(carpeta, hoja), exist_ok=True)
+    for k, (pedidos, entregas) in enumerate(generador.bloques(n_lineas, tamano_bloque)):
+        for hoja, tabla in zip(HOJAS[:2], (pedidos, entregas)):
+            tabla.assign(codigo_cliente=tabla["codigo_cliente"].astype(str)).to_parquet(
+                os.path.join(carpeta, hoja, f"parte_{k:05d}.parquet"), index=False
+            )
+    clientes = generador.clientes()
+    clientes.assign(codigo_cliente=clientes["codigo_cliente"].astype(str)).to_parquet(
+        os.path.join(carpeta, f"{HOJAS[2]}.parquet"), index=False
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera las hojas pedido/entregado/clientes sintéticas")
+    parser.add_argument("salida", help="Libro .xlsx o carpeta (directorio Parquet)")
+    parser.add_argument("--clientes", type=int, default=1_000)
+    parser.add_argument("--lineas", type=int, default=50_000)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--fin", default=None, help="Fecha del último día del histórico (por defecto, hoy)")
+    args = parser.parse_args()
+
+    generador = GeneradorVentas(args.clientes, args.semilla, args.fin)
+    if args.salida.lower().endswith(".xlsx"):
+        escribir_libro(args.salida, generador.hojas(args.lineas))
+    else:
+        escribir_directorio(args.salida, generador, args.lineas)
+    print(f"{args.clientes:,} clientes y {args.lineas:,} líneas de pedido en {os.path.abspath(args.salida)}")
+
+
+if __name__ == "__main__":
+    main()
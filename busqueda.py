@@ -0,0 +1,170 @@
+# ----------------------------------------------------------
+# ÍNDICE DE BÚSQUEDA DE CLIENTES (CÓDIGO, PREFIJOS Y TRIGRAMAS)
+# ----------------------------------------------------------
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Resultados devueltos por consulta (opciones del selector de resultados)
+MAXIMO_RESULTADOS = 20
+# Fracción mínima de trigramas de la consulta presentes en el nombre
+SIMILITUD_MINIMA = 0.4
+
+# Puntajes por tipo de coincidencia (la similitud por trigramas va de 0 a 1)
+PUNTAJE_CODIGO_EXACTO = 4.0
+PUNTAJE_PREFIJO_CODIGO = 3.0
+PUNTAJE_PREFIJO_NOMBRE = 2.5
+PUNTAJE_PALABRAS = 2.0
+
+_ESPACIOS = re.compile(r"\s+")
+_FIN = "\uffff"
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes, sin signos y con espacios simples"""
+    texto = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    texto = re.sub(r"[^\w\s]", " ", texto.lower())
+    return _ESPACIOS.sub(" ", texto).strip()
+
+
+def normalizar_textos(textos):
+    """`normalizar_texto` aplicada solo a los valores distintos (nulos como texto vacío)"""
+    codigos, unicos = pd.factorize(pd.Series(textos, dtype=object), use_na_sentinel=True)
+    normalizados = np.array([normalizar_texto(u) for u in unicos] + [""], dtype=object)
+    return normalizados[codigos]
+
+
+def clave_codigo(codigo):
+    """Orden natural de códigos: primero los numéricos por valor, luego el texto"""
+    texto = str(codigo)
+    if texto.replace('.', '', 1).isdigit():
+        return (0, float(texto), "")
+    return (1, 0.0, texto.lower())
+
+
+def trigramas(texto):
+    """Trigramas de cada palabra, con bordes para que cuenten los inicios y finales"""
+    return {
+        relleno[i:i + 3]
+        for palabra in texto.split()
+        for relleno in [f"  {palabra} "]
+        for i in range(len(relleno) - 2)
+    }
+
+
+class IndiceClientes:
+    """Búsqueda de clientes por código o nombre, construida una vez por carga.
+
+    - Códigos: array ordenado (búsqueda binaria por prefijo) y rango en
+      orden natural para listar resultados.
+    - Nombres (sin tildes ni mayúsculas): prefijo del nombre completo y
+      prefijo de cada palabra, también por búsqueda binaria.
+    - Trigramas de los nombres con listas de filas, para tolerar errores
+      de escritura.
+
+    Las consultas devuelven posiciones de fila de `df`, ordenadas por
+    puntaje, y se pueden restringir a las posiciones de los filtros.
+    """
+
+    def __init__(self, df):
+        self.n = len(df)
+        self.codigos = df["codigo_cliente"].astype(str).to_numpy(dtype=object)
+        self.nombres = df["nombre"].astype(str).to_numpy(dtype=object)
+
+        # Orden natural de los códigos (una sola vez por carga)
+        orden_natural = sorted(range(self.n), key=lambda i: clave_codigo(self.codigos[i]))
+        self.rango_natural = np.empty(self.n, dtype=np.int64)
+        self.rango_natural[orden_natural] = np.arange(self.n)
+
+        codigos_busqueda = np.array([codigo.strip().lower() for codigo in self.codigos], dtype=object).astype(str)
+        self._orden_codigos = np.argsort(codigos_busqueda, kind="stable")
+        self._codigos = codigos_busqueda[self._orden_codigos]
+
+        normalizados = normalizar_textos(self.nombres).astype(str)
+        self._orden_nombres = np.argsort(normalizados, kind="stable")
+        self._nombres = normalizados[self._orden_nombres]
+
+        # Palabras y trigramas, calculados por nombre distinto
+        codigos_nombre, unicos = pd.factorize(normalizados)
+        filas_por_nombre = np.argsort(codigos_nombre, kind="stable")
+        inicios = np.r_[0, np.cumsum(np.bincount(codigos_nombre, minlength=len(unicos)))]
+        palabras, filas_palabra = [], []
+        listas = defaultdict(list)
+        for k, nombre in enumerate(unicos):
+            filas = filas_por_nombre[inicios[k]:inicios[k + 1]]
+            for palabra in set(nombre.split()):
+                palabras.append(palabra)
+                filas_palabra.append(filas)
+            for trigrama in trigramas(nombre):
+                listas[trigrama].append(filas)
+        repeticiones = [len(filas) for filas in filas_palabra]
+        palabras = np.repeat(np.array(palabras, dtype=object), repeticiones).astype(str) if palabras else np.array([], dtype=str)
+        filas_palabra = np.concatenate(filas_palabra) if filas_palabra else np.array([], dtype=np.intp)
+        orden = np.argsort(palabras, kind="stable")
+        self._palabras, self._filas_palabra = palabras[orden], filas_palabra[orden]
+        self._trigramas = {trigrama: np.concatenate(filas) for trigrama, filas in listas.items()}
+
+    @staticmethod
+    def _prefijo(ordenados, prefijo):
+        return np.searchsorted(ordenados, prefijo, side="left"), np.searchsorted(ordenados, prefijo + _FIN, side="left")
+
+    def _puntajes(self, consulta):
+        puntajes = np.zeros(self.n)
+        codigo = str(consulta).strip().lower()
+        texto = normalizar_texto(consulta)
+
+        if codigo:
+            inicio, fin = self._prefijo(self._codigos, codigo)
+            filas = self._orden_codigos[inicio:fin]
+            puntajes[filas] = np.where(self._codigos[inicio:fin] == codigo, PUNTAJE_CODIGO_EXACTO, PUNTAJE_PREFIJO_CODIGO)
+        if not texto:
+            return puntajes
+
+        # Todas las palabras de la consulta son prefijo de alguna palabra del nombre
+        palabras = texto.split()
+        coincidencias = np.zeros(self.n, dtype=np.int64)
+        for palabra in palabras:
+            inicio, fin = self._prefijo(self._palabras, palabra)
+            coincidencias[np.unique(self._filas_palabra[inicio:fin])] += 1
+        puntajes = np.maximum(puntajes, np.where(coincidencias == len(palabras), PUNTAJE_PALABRAS, 0.0))
+
+        inicio, fin = self._prefijo(self._nombres, texto)
+        filas = self._orden_nombres[inicio:fin]
+        puntajes[filas] = np.maximum(puntajes[filas], PUNTAJE_PREFIJO_NOMBRE)
+
+        # Similitud por trigramas (errores de escritura)
+        consulta_trigramas = [t for t in trigramas(texto) if t in self._trigramas]
+        if consulta_trigramas:
+            comunes = np.bincount(np.concatenate([self._trigramas[t] for t in consulta_trigramas]), minlength=self.n)
+            similitud = comunes / len(trigramas(texto))
+            puntajes = np.maximum(puntajes, np.where(similitud >= SIMILITUD_MINIMA, similitud, 0.0))
+        return puntajes
+
+    def buscar(self, consulta, posiciones=None, limite=MAXIMO_RESULTADOS):
+        """Posiciones de fila que coinciden con la consulta, de mejor a peor.
+
+        `posiciones` restringe la búsqueda (p. ej. a la selección de los
+        filtros); None busca en todos los clientes.
+        """
+        if not str(consulta or "").strip():
+            return np.array([], dtype=np.int64)
+        puntajes = self._puntajes(consulta)
+        if posiciones is not None:
+            permitidas = np.zeros(self.n, dtype=bool)
+            permitidas[posiciones] = True
+            puntajes[~permitidas] = 0
+        candidatas = np.flatnonzero(puntajes > 0)
+        orden = np.lexsort((self.rango_natural[candidatas], -puntajes[candidatas]))
+        return candidatas[orden[:limite]]
+
+    def listar(self, posiciones=None, limite=MAXIMO_RESULTADOS):
+        """Primeras posiciones en orden natural de código"""
+        candidatas = np.arange(self.n) if posiciones is None else np.asarray(posiciones)
+        return candidatas[np.argsort(self.rango_natural[candidatas], kind="stable")[:limite]]
+
+    def etiqueta(self, posicion):
+        """Texto de una opción del selector de resultados"""
+        return f"{self.codigos[posicion]} · {self.nombres[posicion]}"
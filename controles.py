@@ -0,0 +1,32 @@
+# ----------------------------------------------------------
+# CONTROLES DE SECCIÓN: SU VALOR SE CONSERVA AL CAMBIAR DE SECCIÓN
+# ----------------------------------------------------------
+# Streamlit borra el estado de los widgets que no se dibujan en una ejecución:
+# al volver a una sección sus controles empezarían de cero. Cada control copia
+# su valor a una clave propia de la sesión (que no se borra) y lo recupera al
+# dibujarse con `value=`/`index=`.
+import streamlit as st
+
+PREFIJO = "guardado_"
+
+
+def guardar_control(clave):
+    """Callback `on_change`: copia el valor del widget `clave` a su clave guardada"""
+    st.session_state[PREFIJO + clave] = st.session_state[clave]
+
+
+def recordar_control(clave):
+    """Argumentos `key`, `on_change` y `args` de un control cuyo valor se recuerda"""
+    return {"key": clave, "on_change": guardar_control, "args": (clave,)}
+
+
+def valor_guardado(clave, defecto=None):
+    """Último valor del control (para `value=`), o `defecto`"""
+    return st.session_state.get(PREFIJO + clave, defecto)
+
+
+def indice_guardado(clave, opciones, defecto=0):
+    """Posición del último valor del control en `opciones` (para `index=`), o `defecto`"""
+    opciones = list(opciones)
+    guardado = valor_guardado(clave)
+    return opciones.index(guardado) if guardado in opciones else defecto
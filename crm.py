@@ -4,27 +4,30 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
+import time
 import numpy as np
 from st_aggrid import AgGrid, GridOptionsBuilder
-import requests
-from io import BytesIO
+from agregados import CacheAgregados, estadisticas_vendedores, productos_extremos, productos_mas_vendidos, ventas_por_segmento
+from alertas import COLORES_PRIORIDAD, SIN_ALERTA, MotorAlertas, reglas_por_defecto
+from busqueda import MAXIMO_RESULTADOS, IndiceClientes
+from controles import guardar_control, indice_guardado, recordar_control, valor_guardado
+from cubo import CuboVentas
+from datos import AlmacenDatos
+from esquema import reporte_memoria
+from filtros import MotorFiltros
+from fuentes import configuracion_fuente, crear_fuente
+from geo import NIVEL_POR_DEFECTO, NIVELES, CacheGeocodificacion, MapaVentas
+from guia_ventas import frecuencia_contacto, guion_cliente
+from latencias import medir, registrar, resumen, ultima
+from perfiles import IndicePerfiles
+from recomendaciones import MotorRecomendaciones, recomendaciones_cliente
+from rutas import MAXIMO_PARADAS_RUTA, VISITAS_POR_DIA, planificar_rutas, resumen_rutas
+from series import SeriesVentas
+from tablas import boton_exportar, tabla_paginada
 
-# ----------------------------------------------------------
-# FUNCIÓN PARA ORDENAR CÓDIGOS
-# ----------------------------------------------------------
-def ordenar_codigos_seguro(codigos):
-    def clave_ordenacion(x):
-        try:
-            if isinstance(x, (int, float)):
-                return (0, float(x))
-            if str(x).replace('.', '', 1).isdigit():
-                return (0, float(x))
-            return (1, str(x).lower())
-        except:
-            return (1, str(x).lower())
-    
-    return sorted(codigos, key=clave_ordenacion)
+# Copy-on-write: las tablas cargadas se comparten entre sesiones sin copiarlas;
+# cualquier columna derivada en una sesión crea su propia copia de esa columna
+pd.set_option("mode.copy_on_write", True)
 
 # ----------------------------------------------------------
 # CONFIGURACION DE LA PAGINA
@@ -37,105 +40,97 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Inicio de la ejecución completa del script (panel de latencias)
+inicio_ejecucion = time.perf_counter()
+
 # ----------------------------------------------------------
-# Función para cargar datos desde Google Drive
+# Función para cargar datos desde la fuente configurada
 # ----------------------------------------------------------
-@st.cache_data
-def load_data_from_drive(file_id):
-    """Carga y procesa los datos desde Google Drive"""
+@st.cache_resource
+def obtener_almacen(tipo_fuente, ubicacion):
+    """Almacén compartido por todas las sesiones, se refresca por deltas"""
+    return AlmacenDatos(crear_fuente(tipo_fuente, ubicacion))
+
+@st.cache_resource(max_entries=2)
+def load_data_from_drive(tipo_fuente, ubicacion, version):
+    """Construye las tablas del dashboard para una versión de los datos.
+
+    El resultado se comparte entre sesiones sin copiarlo (solo lectura):
+    las columnas propias de una sesión se añaden con `assign` sobre la vista
+    filtrada, nunca sobre `df`, `pedidos` o `entregas`.
+    """
+    return obtener_almacen(tipo_fuente, ubicacion).resultados()
+
+def cargar_datos(tipo_fuente, ubicacion, forzar=False):
+    """Comprueba cambios en la fuente y devuelve la versión vigente (con su número y sus series)"""
     try:
-        # Construir la URL de descarga directa para archivos de Google Sheets
-        download_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=xlsx"
-        
-        with st.spinner('Cargando datos...'):
-            # Descargar el archivo
-            response = requests.get(download_url)
-            response.raise_for_status()  # Verificar que la descarga fue exitosa
-            
-            # Leer el archivo Excel
-            excel_file = BytesIO(response.content)
-            
-            # Cargar las hojas de Excel
-            pedidos = pd.read_excel(excel_file, sheet_name="pedido")
-            entregas = pd.read_excel(excel_file, sheet_name="entregado")
-            clientes = pd.read_excel(excel_file, sheet_name="clientes")
-            
-            # Limpieza de datos
-            clientes["direccion"] = clientes["direccion"].astype(str).str.replace('"', '').str.strip()
-            
-            # Procesar pedidos
-            pedidos["fecha_pedido"] = pd.to_datetime(pedidos["fecha_pedido"])
-            pedidos["mes_pedido"] = pedidos["fecha_pedido"].dt.to_period('M')
-            pedidos["monto"] = pedidos["cantidad"] * pedidos["precio_unitario"]
-            
-            # Procesar entregas
-            entregas["fecha_entrega"] = pd.to_datetime(entregas["fecha_entrega"])
-            entregas["mes_entrega"] = entregas["fecha_entrega"].dt.to_period('M')
-            
-            # Obtener fechas extremas para el pie de página
-            fecha_min_pedidos = pedidos["fecha_pedido"].min().strftime('%d/%m/%Y') if not pedidos.empty else "N/A"
-            fecha_max_pedidos = pedidos["fecha_pedido"].max().strftime('%d/%m/%Y') if not pedidos.empty else "N/A"
-            fecha_min_entregas = entregas["fecha_entrega"].min().strftime('%d/%m/%Y') if not entregas.empty else "N/A"
-            fecha_max_entregas = entregas["fecha_entrega"].max().strftime('%d/%m/%Y') if not entregas.empty else "N/A"
-            
-            # Agregación de pedidos por cliente
-            pedidos_agg = pedidos.groupby("codigo_cliente").agg({
-                "fecha_pedido": "max",
-                "mes_pedido": lambda x: x.value_counts().index[0],
-                "monto": ["sum", "mean"],
-                "codigo_producto": "count"
-            })
-            pedidos_agg.columns = ['ultimo_pedido', 'mes_frecuente', 'monto_total', 'ticket_promedio', 'total_pedidos']
-            pedidos_agg = pedidos_agg.reset_index()
-            
-            # Unir datos
-            df = pd.merge(clientes, pedidos_agg, on="codigo_cliente", how="left").fillna(0)
-            
-            # CORRECCIÓN: Cálculo seguro de frecuencia de compra (días desde último pedido)
-            hoy = pd.Timestamp.now().normalize()
-            df["frecuencia_compra"] = (hoy - pd.to_datetime(df["ultimo_pedido"])).dt.days.fillna(0).astype(int)
-            
-            # CORRECCIÓN: Limitar frecuencia máxima a 365 días
-            df["frecuencia_compra"] = df["frecuencia_compra"].clip(upper=365)
-            
-            # Calcular efectividad de entrega (pedidos vs entregas)
-            entregas_count = entregas.groupby("codigo_cliente").size().reset_index(name='entregas_count')
-            df = pd.merge(df, entregas_count, on="codigo_cliente", how="left").fillna(0)
-            df["efectividad_entrega"] = (df["entregas_count"] / df["total_pedidos"].replace(0, 1)).clip(0, 1)
-            
-            # Segmentación automática
-            df["segmento"] = pd.cut(
-                df["frecuencia_compra"],
-                bins=[-1, 30, 90, float('inf')],
-                labels=["Activo", "Disminuido", "Inactivo"],
-                right=False
-            ).astype(str)
-            
-            # Valor del cliente (proyección anual)
-            df["valor_cliente"] = (df["ticket_promedio"] * (365 / df["frecuencia_compra"].replace(0, 1))).round(2)
-            
-            # Productos top y bottom
-            top_productos = (pedidos.groupby("producto")["cantidad"].sum()
-                            .nlargest(5).reset_index().dropna())
-            bottom_productos = (pedidos.groupby("producto")["cantidad"].sum()
-                               .nsmallest(5).reset_index().dropna())
-            
-            return df, top_productos, bottom_productos, pedidos, entregas, fecha_min_pedidos, fecha_max_pedidos, fecha_min_entregas, fecha_max_entregas
-        
+        almacen = obtener_almacen(tipo_fuente, ubicacion)
+    except Exception as e:
+        st.error(f"Error al configurar la fuente de datos: {str(e)}")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), "N/A", "N/A", "N/A", "N/A", None, None
+    try:
+        if forzar or not almacen.cargado:
+            with st.spinner('Cargando datos...'):
+                almacen.refrescar(forzar=forzar)
+        else:
+            almacen.refrescar_si_corresponde()
     except Exception as e:
         st.error(f"Error al cargar los datos: {str(e)}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), "N/A", "N/A", "N/A", "N/A"
+    if not almacen.cargado:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), "N/A", "N/A", "N/A", "N/A", None, None
+    return load_data_from_drive(tipo_fuente, ubicacion, almacen.version)
+
+@st.cache_resource(max_entries=2)
+def obtener_motor_filtros(tipo_fuente, ubicacion, version, _df, _pedidos):
+    """Índices de los filtros, compartidos por todas las sesiones de una versión"""
+    return MotorFiltros(_df, _pedidos)
+
+@st.cache_resource(max_entries=2)
+def obtener_indice_perfiles(tipo_fuente, ubicacion, version, _df, _pedidos):
+    """Perfiles de producto por cliente y por (tipo de negocio, zona)"""
+    return IndicePerfiles(_df, _pedidos)
+
+@st.cache_resource(max_entries=2)
+def obtener_cubo(tipo_fuente, ubicacion, version, _df, _pedidos):
+    """Cubo de clientes y pedidos por zona, segmento, mes, tipo de negocio y producto"""
+    return CuboVentas(_df, _pedidos)
+
+@st.cache_resource(max_entries=2)
+def obtener_indice_busqueda(tipo_fuente, ubicacion, version, _df):
+    """Índice de búsqueda de clientes por código y nombre"""
+    return IndiceClientes(_df)
+
+@st.cache_resource(max_entries=2)
+def obtener_mapa(tipo_fuente, ubicacion, version, _df):
+    """Celdas del mapa por nivel de zoom (coordenadas de la hoja, caché de geocodificación o zona)"""
+    return MapaVentas(_df, CacheGeocodificacion())
+
+@st.cache_data(max_entries=2)
+def obtener_reporte_memoria(tipo_fuente, ubicacion, version, _tablas):
+    """Memoria de las tablas cargadas, calculada una vez por versión"""
+    return reporte_memoria(_tablas)
+
+@st.cache_resource
+def obtener_cache_agregados():
+    """Caché de agregados por versión y filtros, única para todo el proceso"""
+    return CacheAgregados()
+
+@st.cache_resource(max_entries=2)
+def obtener_motor_recomendaciones(tipo_fuente, ubicacion, version, _pedidos):
+    """Recomendaciones precalculadas para todos los clientes"""
+    return MotorRecomendaciones(_pedidos)
 
 # ----------------------------------------------------------
-# CARGAR DATOS DESDE GOOGLE DRIVE
+# CARGAR DATOS (GOOGLE DRIVE POR DEFECTO)
 # ----------------------------------------------------------
 
-# ID del archivo en Google Drive (extraído de la URL compartida)
-# URL proporcionada: https://docs.google.com/spreadsheets/d/1MLgtcblazoKbx0ZwiPljCQxix5bTuKBn/edit?usp=sharing&ouid=117295945155119200843&rtpof=true&sd=true
-FILE_ID = "1MLgtcblazoKbx0ZwiPljCQxix5bTuKBn"
+# Fuente de datos: sheets (por defecto, ver FILE_ID en fuentes.py), excel, directorio, sqlite o duckdb
+# p. ej. CRM_FUENTE=excel CRM_RUTA=datos/ventas.xlsx streamlit run crm.py
+TIPO_FUENTE, UBICACION_FUENTE = configuracion_fuente()
 
-# Cargar datos
-df, top_productos, bottom_productos, pedidos, entregas, fecha_min_p, fecha_max_p, fecha_min_e, fecha_max_e = load_data_from_drive(FILE_ID)
+# Cargar datos (el botón fuerza una recarga completa)
+forzar_recarga = st.sidebar.button("🔄 Actualizar datos", help="Descarga de nuevo el archivo y recalcula todo")
+df, pedidos, entregas, fecha_min_p, fecha_max_p, fecha_min_e, fecha_max_e, version_datos, series_ventas = cargar_datos(TIPO_FUENTE, UBICACION_FUENTE, forzar=forzar_recarga)
 
 if df.empty:
     st.warning("No se encontraron datos o hubo un error al cargarlos. Verifica con el administrador.")
@@ -150,50 +145,71 @@ with st.sidebar.expander("Explicación de los filtros"):
     - **Mes:** Filtra por mes específico de actividad
     """)
 
-# Opciones de filtros
-df['zona'] = df.get('zona', 'No especificada').astype(str)
-df['segmento'] = df.get('segmento', 'No especificado').astype(str)
+# Opciones de filtros (precalculadas en el motor de filtros)
+motor_filtros = obtener_motor_filtros(TIPO_FUENTE, UBICACION_FUENTE, version_datos, df, pedidos)
+cache_agregados = obtener_cache_agregados()
 
-# Filtro por mes (convertir a string para evitar problemas)
-if not pedidos.empty:
-    meses_disponibles = pedidos["mes_pedido"].astype(str).unique()
-else:
-    meses_disponibles = []
+def agregado(nombre, filtros, calcular):
+    """Agregado compartido entre sesiones para la versión de datos y los filtros dados"""
+    return cache_agregados.obtener((TIPO_FUENTE, UBICACION_FUENTE), version_datos, nombre, filtros, calcular)
+
+def limpiar_busqueda_cliente():
+    # Callback: se ejecuta antes de volver a dibujar la búsqueda
+    st.session_state.cliente_busqueda = ""
+    guardar_control("cliente_busqueda")
+
+def mostrar_latencia(nombre):
+    """Tiempo de la última ejecución de un panel (si el panel de depuración está activo)"""
+    if st.session_state.get("mostrar_latencias"):
+        st.caption(f"⏱️ {nombre}: {ultima(st.session_state, nombre):,.0f} ms")
 
 selected_vendedor = st.sidebar.selectbox(
     "Vendedor (Zona)",
-    options=["Todos"] + sorted(df["zona"].unique().tolist(), key=str)
+    options=["Todos"] + motor_filtros.opciones["vendedor"]
 )
 
 selected_segmento = st.sidebar.selectbox(
     "Segmento",
-    options=["Todos"] + sorted(df["segmento"].unique().tolist(), key=str),
-    help="Clasificación basada en frecuencia de compra: Activo (<30 días), Disminuido (30-90 días), Inactivo (>90 días)"
+    options=["Todos"] + motor_filtros.opciones["segmento"],
+    help="Clasificación según los días sin comprar frente a la cadencia habitual de cada cliente"
 )
 
 selected_mes = st.sidebar.selectbox(
     "Mes",
-    options=["Todos"] + sorted(meses_disponibles.tolist()),
+    options=["Todos"] + motor_filtros.opciones["mes"],
     help="Filtrar por mes de actividad"
 )
 
-# Filtrado de datos
-filtered_df = df.copy()
-if selected_vendedor != "Todos":
-    filtered_df = filtered_df[filtered_df["zona"] == selected_vendedor]
-if selected_segmento != "Todos":
-    filtered_df = filtered_df[filtered_df["segmento"] == selected_segmento]
-if selected_mes != "Todos":
-    filtered_df = filtered_df[filtered_df["mes_frecuente"].astype(str) == selected_mes]
+# Panel de depuración con la latencia de cada ejecución (script completo y paneles)
+st.sidebar.checkbox("⏱️ Mostrar latencias", key="mostrar_latencias", help="Tiempo de cada ejecución completa y de cada panel independiente")
+
+# Memoria de las tablas (tipos compactos definidos en esquema.py)
+with st.sidebar.expander("💾 Memoria de los datos"):
+    st.dataframe(
+        obtener_reporte_memoria(TIPO_FUENTE, UBICACION_FUENTE, version_datos, {"clientes": df, "pedidos": pedidos, "entregas": entregas}),
+        hide_index=True
+    )
+
+# Filtrado de datos (selección memorizada por combinación de filtros)
+filtered_df = motor_filtros.filtrar(df, selected_vendedor, selected_segmento, selected_mes)
+filtros_actuales = (selected_vendedor, selected_segmento, selected_mes)
+
+# Tabla de clientes de los filtros con todas sus métricas (el archivo se genera al descargar)
+with st.sidebar.expander("📥 Exportar clientes"):
+    st.caption(f"{len(filtered_df):,} clientes con segmento, RFM, valor y riesgo de abandono")
+    boton_exportar(lambda: filtered_df, "clientes", key="exportar_clientes")
 
 # Pestañas principales - INTERCAMBIADAS: Ahora Analítica es primero
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Analítica", "📞 Clientes", "👤 Vendedores", "🔥 Promociones", "🚨 Alertas"])
+# Navegación por páginas: solo se ejecuta la pestaña visible (st.tabs ejecuta las cinco en cada interacción)
+PESTANAS = ["📊 Analítica", "📞 Clientes", "👤 Vendedores", "🔥 Promociones", "🚨 Alertas"]
+pestana = st.radio("Sección", PESTANAS, horizontal=True, label_visibility="collapsed", key="pestana")
 
 # ----------------------------------------------------------
 # PESTAÑA 1: Analítica Comercial
 # ----------------------------------------------------------
-with tab1:
+if pestana == PESTANAS[0]:
     st.header("📊 Analítica Comercial", help="Métricas y visualizaciones para toma de decisiones")
+    cubo = obtener_cubo(TIPO_FUENTE, UBICACION_FUENTE, version_datos, df, pedidos)
     
     if not filtered_df.empty:
         # KPIs generales con explicación
@@ -202,37 +218,46 @@ with tab1:
             st.write("""
             - **Clientes totales:** Número único de clientes activos
             - **Compra promedio:** Valor promedio de los pedidos
-            - **Frecuencia promedio:** Días entre compras (menos es mejor)
-            - **Valor cliente:** Proyección anual de gasto del cliente
+            - **Frecuencia promedio:** Días entre compras de los clientes con al menos dos compras (menos es mejor)
+            - **Valor cliente:** Proyección anual de gasto (ticket promedio × compras esperadas por año según su cadencia)
             """)
         
+        # Indicadores desde el cubo (sin recorrer la tabla de clientes)
+        filtros_cubo = cubo.filtros_cliente(selected_vendedor, selected_segmento, selected_mes)
+        kpis = cubo.indicadores(filtros_cubo)
+        
         metric_cols = st.columns(4)
         with metric_cols[0]:
-            st.metric("Clientes totales", filtered_df["codigo_cliente"].nunique())
+            st.metric("Clientes totales", int(kpis["clientes"]))
         with metric_cols[1]:
-            st.metric("Compra promedio", f"${filtered_df['monto_total'].mean():,.2f}")
+            st.metric("Compra promedio", f"${kpis['monto_total_promedio']:,.2f}")
         with metric_cols[2]:
-            st.metric("Frecuencia promedio", f"{filtered_df['frecuencia_compra'].mean():.0f} días")
+            st.metric("Frecuencia promedio", f"{kpis['intervalo_compra_promedio']:.0f} días")
         with metric_cols[3]:
-            st.metric("Valor cliente promedio", f"${filtered_df['valor_cliente'].mean():,.2f}")
+            st.metric("Valor cliente promedio", f"${kpis['valor_cliente_promedio']:,.2f}")
         
         # Segmentación de clientes
         st.subheader("🔍 Segmentación de Clientes")
         with st.expander("📌 Cómo se calculan los segmentos"):
             st.write("""
-            Los clientes se clasifican automáticamente según días desde su última compra:
-            - **Activo:** <30 días
-            - **Disminuido:** 30-90 días
-            - **Inactivo:** >90 días
+            Los clientes se clasifican según los días desde su última compra comparados con su
+            intervalo típico entre compras (mediana de días entre compras):
+            - **Activo:** menos de 1.5 intervalos sin comprar
+            - **Disminuido:** entre 1.5 y 3 intervalos
+            - **Inactivo:** 3 intervalos o más
+            
+            Con menos de dos compras se usan 30 y 90 días como límites.
             """)
         
+        ventas_segmento = agregado("ventas_por_segmento", filtros_actuales, lambda: ventas_por_segmento(cubo, filtros_cubo))
+        
         seg_cols = st.columns(2)
         with seg_cols[0]:
-            fig = px.pie(filtered_df, names="segmento", title="Distribución por Segmento")
+            fig = px.pie(ventas_segmento, names="segmento", values="filas", title="Distribución por Segmento")
             st.plotly_chart(fig, use_container_width=True)
         with seg_cols[1]:
             fig = px.bar(
-                filtered_df.groupby("segmento").agg({"monto_total": "sum", "codigo_cliente": "nunique"}).reset_index(),
+                ventas_segmento,
                 x="segmento",
                 y=["monto_total", "codigo_cliente"],
                 barmode="group",
@@ -241,6 +266,47 @@ with tab1:
             )
             st.plotly_chart(fig, use_container_width=True)
         
+        # Tendencia de ventas de los clientes filtrados
+        st.subheader("📈 Tendencia de Ventas")
+        with st.expander("ℹ️ Cómo leer la tendencia"):
+            st.write("""
+            Ventas por periodo según la fecha de cada pedido de los clientes filtrados.
+            - **Acumulado móvil:** suma de los últimos N periodos, suaviza la estacionalidad
+            - **Crecimiento:** variación del último periodo completo frente al anterior
+            """)
+        
+        tendencia_cols = st.columns([2, 2, 1])
+        with tendencia_cols[0]:
+            frecuencia_tendencia = st.selectbox(
+                "Periodo", ["M", "W", "D"],
+                index=indice_guardado("frecuencia_tendencia", ["M", "W", "D"]),
+                format_func={"M": "Mensual", "W": "Semanal", "D": "Diario"}.get,
+                **recordar_control("frecuencia_tendencia")
+            )
+        with tendencia_cols[1]:
+            periodos_movil = st.slider("Periodos del acumulado móvil", 1, 12, valor_guardado("periodos_movil", 3),
+                                       **recordar_control("periodos_movil"))
+        
+        clientes_tendencia = None if filtered_df is df else filtered_df["codigo_cliente"]
+        ventas_periodo = series_ventas.serie(frecuencia_tendencia, clientes=clientes_tendencia)
+        if not ventas_periodo.empty:
+            tendencia = pd.DataFrame({
+                "periodo": ventas_periodo.index,
+                "Ventas": ventas_periodo.to_numpy(),
+                "Acumulado móvil": SeriesVentas.acumulado_movil(ventas_periodo, periodos_movil).to_numpy(),
+            })
+            crecimiento = SeriesVentas.tasa_crecimiento(ventas_periodo.iloc[:-1])
+            with tendencia_cols[2]:
+                ultimo_crecimiento = crecimiento.iloc[-1] if len(crecimiento) else np.nan
+                st.metric("Crecimiento", "N/A" if pd.isna(ultimo_crecimiento) else f"{ultimo_crecimiento:+.1%}",
+                          help="Último periodo completo frente al anterior")
+            fig = px.line(
+                tendencia, x="periodo", y=["Ventas", "Acumulado móvil"],
+                title="Ventas por Periodo",
+                labels={"value": "Ventas (RD$)", "variable": "Serie", "periodo": "Periodo"}
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        
         # Productos más y menos vendidos
         st.subheader("📦 Análisis de Productos")
         with st.expander("ℹ️ Fuente de datos"):
@@ -249,6 +315,8 @@ with tab1:
             Los productos se ponderan por cantidad vendida.
             """)
         
+        top_productos, bottom_productos = agregado("productos_extremos", (), lambda: productos_extremos(cubo))
+        
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("**🏆 Top 5 Productos**")
@@ -268,306 +336,294 @@ with tab1:
             - Planificar campañas geolocalizadas
             """)
         
-        # Asegurar coordenadas
-        if "lat" not in filtered_df.columns or "lon" not in filtered_df.columns:
-            filtered_df["lat"] = 18.5  # RD centro
-            filtered_df["lon"] = -69.9
+        # Celdas precalculadas por nivel de detalle (se envía una fila por celda, no por cliente)
+        mapa = obtener_mapa(TIPO_FUENTE, UBICACION_FUENTE, version_datos, df)
+        col_nivel, col_zonas = st.columns([3, 1])
+        with col_nivel:
+            nivel_mapa = st.select_slider("Nivel de detalle", options=list(NIVELES),
+                                          value=valor_guardado("nivel_mapa", NIVEL_POR_DEFECTO), **recordar_control("nivel_mapa"))
+        with col_zonas:
+            mostrar_zonas = st.checkbox("Centroides por zona", value=valor_guardado("mostrar_zonas", False),
+                                        **recordar_control("mostrar_zonas"))
+        zoom, _, radio = NIVELES[nivel_mapa]
+        celdas_mapa = mapa.celdas(filtros_cubo, nivel_mapa)
         
         fig = px.density_mapbox(
-            filtered_df,
+            celdas_mapa,
             lat="lat",
             lon="lon",
             z="monto_total",
-            radius=20,
-            zoom=7,
+            radius=radio,
+            zoom=zoom,
+            center={"lat": mapa.centro[0], "lon": mapa.centro[1]},
             mapbox_style="open-street-map",
-            hover_name="nombre",
-            hover_data=["segmento", "valor_cliente"],
+            hover_data={"clientes": ":,", "monto_total": ":,.2f", "lat": False, "lon": False},
             title="Concentración de Ventas por Zona"
         )
+        if mostrar_zonas:
+            zonas_mapa = mapa.zonas(filtros_cubo)
+            fig.add_scattermapbox(
+                lat=zonas_mapa["lat"], lon=zonas_mapa["lon"], mode="markers+text",
+                text=zonas_mapa["zona"], textposition="top center", name="Zonas",
+                marker={"size": 10, "color": "#1f77b4"},
+                customdata=zonas_mapa[["clientes", "monto_total"]],
+                hovertemplate="%{text}<br>Clientes: %{customdata[0]:,}<br>Monto: RD$%{customdata[1]:,.2f}<extra></extra>"
+            )
         st.plotly_chart(fig, use_container_width=True)
+        origen = mapa.conteo_origen
+        st.caption(
+            f"{len(celdas_mapa):,} celdas · clientes con coordenadas de la hoja: {origen['hoja']:,}, "
+            f"geocodificados: {origen['geocodificada']:,}, ubicados en el centro de su zona: {origen['zona']:,}, "
+            f"sin ubicación: {origen['sin ubicación']:,}"
+        )
     else:
         st.warning("No hay datos que coincidan con los filtros seleccionados")
 
 # ----------------------------------------------------------
 # PESTAÑA 2: Gestión de Clientes
 # ----------------------------------------------------------
-with tab2:
-    st.header("📞 Gestión de Clientes")
-    
-    if not filtered_df.empty:
-        # BÚSQUEDA MEJORADA: Por código O nombre
-        col_busqueda1, col_busqueda2 = st.columns(2)
-        
-        with col_busqueda1:
-            # Obtener códigos únicos y manejar nulos
-            codigos_unicos = filtered_df["codigo_cliente"].dropna().unique()
-            codigos_options = [""] + ordenar_codigos_seguro([str(cod) for cod in codigos_unicos])
-            
-            cliente_search_code = st.selectbox(
-                "Buscar por CÓDIGO del cliente",
-                options=codigos_options,
-                format_func=lambda x: "Seleccione un código..." if x == "" else x,
-                key="cliente_search_code"  # Key único para evitar conflicto
-            )
+@st.fragment
+def panel_cliente(filtered_df, posiciones, indice_busqueda, indice_perfiles, motor_recomendaciones):
+    """Búsqueda y ficha del cliente; sus widgets solo vuelven a ejecutar este panel"""
+    with medir(st.session_state, "panel_cliente"):
+        if not filtered_df.empty:
+            # BÚSQUEDA: un solo campo por código o nombre, resuelto en el índice (ver busqueda.py)
+            col_busqueda1, col_busqueda2 = st.columns(2)
         
-        with col_busqueda2:
-            # Obtener nombres únicos
-            nombres_unicos = filtered_df["nombre"].dropna().unique()
-            nombres_options = [""] + sorted([str(nombre) for nombre in nombres_unicos])
-            
-            cliente_search_name = st.selectbox(
-                "Buscar por NOMBRE del cliente",
-                options=nombres_options,
-                format_func=lambda x: "Seleccione un nombre..." if x == "" else x,
-                key="cliente_search_name"  # Key único para evitar conflicto
-            )
+            with col_busqueda1:
+                consulta_cliente = st.text_input(
+                    "Buscar por CÓDIGO o NOMBRE del cliente",
+                    placeholder="Código, nombre o parte del nombre...",
+                    value=valor_guardado("cliente_busqueda", ""),
+                    **recordar_control("cliente_busqueda")
+                )
         
-        # Proceso de búsqueda mejorado
-        cliente_filtrado = pd.DataFrame()
+            # Solo se envían al navegador las mejores coincidencias, no la lista completa
+            resultados_busqueda = [int(p) for p in indice_busqueda.buscar(consulta_cliente, posiciones)]
         
-        if cliente_search_code and cliente_search_code != "":
-            try:
-                cliente_filtrado = filtered_df[filtered_df["codigo_cliente"].astype(str) == cliente_search_code]
-            except Exception as e:
-                st.error(f"Error en búsqueda por código: {str(e)}")
+            # Al volver a la sección se recupera el cliente elegido; al cambiar la consulta, la mejor coincidencia
+            if st.session_state.get("cliente_resultado") not in resultados_busqueda:
+                guardado = valor_guardado("cliente_resultado")
+                st.session_state.cliente_resultado = (guardado if guardado in resultados_busqueda
+                                                      else resultados_busqueda[0] if resultados_busqueda else None)
         
-        elif cliente_search_name and cliente_search_name != "":
-            try:
-                # Búsqueda flexible por nombre (contiene el texto)
-                cliente_filtrado = filtered_df[filtered_df["nombre"].str.contains(cliente_search_name, case=False, na=False)]
-            except Exception as e:
-                st.error(f"Error en búsqueda por nombre: {str(e)}")
+            with col_busqueda2:
+                posicion_cliente = st.selectbox(
+                    "Resultados",
+                    options=resultados_busqueda,
+                    format_func=indice_busqueda.etiqueta,
+                    placeholder="Escriba para buscar..." if not consulta_cliente else "Sin coincidencias",
+                    **recordar_control("cliente_resultado")
+                )
         
-        # Mostrar resultados de búsqueda
-        if not cliente_filtrado.empty:
-            if len(cliente_filtrado) > 1:
-                st.info(f"Se encontraron {len(cliente_filtrado)} clientes. Mostrando el primero.")
+            # Mostrar resultados de búsqueda
+            if posicion_cliente is not None:
+                if len(resultados_busqueda) > 1:
+                    st.caption(f"{len(resultados_busqueda)} coincidencias (máximo {MAXIMO_RESULTADOS}), de mejor a peor.")
             
-            cliente_data = cliente_filtrado.iloc[0]
+                cliente_data = df.iloc[posicion_cliente]
             
-            # Mostrar datos básicos
-            cols = st.columns(3)
-            with cols[0]:
-                st.info(f"**Nombre:** {cliente_data['nombre']}")
-                st.info(f"**Código:** {cliente_data['codigo_cliente']}")
-                st.info(f"**Teléfono:** {cliente_data['telefono']}")
-            with cols[1]:
-                st.info(f"**Dirección:** {cliente_data['direccion']}")
-                st.info(f"**Tipo negocio:** {cliente_data['tipo_negocio']}")
-            with cols[2]:
-                st.info(f"**Quién atiende:** {cliente_data['quien_atiende']}")
-                st.info(f"**Vendedor (Zona):** {cliente_data['zona']}")
+                # Mostrar datos básicos
+                cols = st.columns(3)
+                with cols[0]:
+                    st.info(f"**Nombre:** {cliente_data['nombre']}")
+                    st.info(f"**Código:** {cliente_data['codigo_cliente']}")
+                    st.info(f"**Teléfono:** {cliente_data['telefono']}")
+                with cols[1]:
+                    st.info(f"**Dirección:** {cliente_data['direccion']}")
+                    st.info(f"**Tipo negocio:** {cliente_data['tipo_negocio']}")
+                with cols[2]:
+                    st.info(f"**Quién atiende:** {cliente_data['quien_atiende']}")
+                    st.info(f"**Vendedor (Zona):** {cliente_data['zona']}")
             
-            # Mostrar KPIs con formato mejorado
-            st.subheader("📊 Indicadores Clave")
-            kpi_cols = st.columns(4)
-            with kpi_cols[0]:
-                st.metric("Ticket promedio", f"RD${cliente_data['ticket_promedio']:,.2f}")
-            with kpi_cols[1]:
-                st.metric("Frecuencia compra", f"{cliente_data['frecuencia_compra']:,.0f} días")
-            with kpi_cols[2]:
-                st.metric("Efectividad entrega", f"{cliente_data['efectividad_entrega']:.2%}")
-            with kpi_cols[3]:
-                estado_color = {"Activo": "normal", "Disminuido": "off", "Inactivo": "inverse"}.get(cliente_data["segmento"], "off")
-                st.metric("Segmento", cliente_data["segmento"], delta_color=estado_color)
+                # Mostrar KPIs con formato mejorado
+                st.subheader("📊 Indicadores Clave")
+                kpi_cols = st.columns(4)
+                with kpi_cols[0]:
+                    st.metric("Ticket promedio", f"RD${cliente_data['ticket_promedio']:,.2f}")
+                with kpi_cols[1]:
+                    st.metric("Días sin compra", f"{cliente_data['frecuencia_compra']:,.0f} días")
+                with kpi_cols[2]:
+                    st.metric("Efectividad entrega", f"{cliente_data['efectividad_entrega']:.2%}")
+                with kpi_cols[3]:
+                    estado_color = {"Activo": "normal", "Disminuido": "off", "Inactivo": "inverse"}.get(cliente_data["segmento"], "off")
+                    st.metric("Segmento", cliente_data["segmento"], delta_color=estado_color)
+                if "intervalo_compra" in cliente_data:
+                    cadencia = "sin cadencia (menos de dos compras)" if pd.isna(cliente_data["intervalo_compra"]) else f"compra cada ~{cliente_data['intervalo_compra']:,.0f} días"
+                    st.caption(
+                        f"{cadencia} · {int(cliente_data['compras']):,} días con compra · "
+                        f"RFM {int(cliente_data['r_score'])}-{int(cliente_data['f_score'])}-{int(cliente_data['m_score'])} (recencia-frecuencia-monto, 1 a 5)"
+                    )
                       
-            # SECCIÓN DE ANÁLISIS DE PRODUCTOS MEJORADA
-            st.subheader("🍅 Análisis de Productos", help="Datos históricos de compras y recomendaciones")
-            
-            # Productos del cliente
-            productos_cliente = pedidos[pedidos['codigo_cliente'] == cliente_data['codigo_cliente']]
-            
-            # Top productos del cliente (con monto total)
-            top_productos_cliente = productos_cliente.groupby('producto').agg({
-                'cantidad': 'sum',
-                'monto': 'sum'
-            }).nlargest(5, 'cantidad').reset_index()
-            top_productos_cliente['monto_formateado'] = top_productos_cliente['monto'].apply(lambda x: f"RD${x:,.2f}")
-            
-            # Productos recomendados (basado en clientes similares) con montos
-            with st.expander("🔍 Método de recomendación"):
-                st.write("""
-                Los productos recomendados se calculan basándose en:
-                1. Clientes con mismo tipo de negocio y zona
-                2. Productos más vendidos entre ese grupo
-                3. Productos que este cliente no compra actualmente
-                4. Monto total en ventas de cada producto
-                """)
+                # SECCIÓN DE ANÁLISIS DE PRODUCTOS MEJORADA
+                st.subheader("🍅 Análisis de Productos", help="Datos históricos de compras y recomendaciones")
             
-            clientes_similares = filtered_df[
-                (filtered_df['tipo_negocio'] == cliente_data['tipo_negocio']) & 
-                (filtered_df['zona'] == cliente_data['zona'])
-            ]
+                # Productos del cliente (perfil precalculado, ordenado por cantidad)
+                productos_cliente = indice_perfiles.productos_cliente(cliente_data['codigo_cliente'])
             
-            productos_recomendados = pedidos[
-                pedidos['codigo_cliente'].isin(clientes_similares['codigo_cliente'])
-            ].groupby('producto').agg({
-                'cantidad': 'sum',
-                'monto': 'sum'
-            }).nlargest(5, 'cantidad').reset_index()
-            productos_recomendados['monto_formateado'] = productos_recomendados['monto'].apply(lambda x: f"RD${x:,.2f}")
+                # Top productos del cliente (con monto total)
+                top_productos_cliente = productos_cliente.head(5).copy()
+                top_productos_cliente['monto_formateado'] = top_productos_cliente['monto'].apply(lambda x: f"RD${x:,.2f}")
             
-            # Productos no comprados (oportunidades) con precios de referencia
-            todos_productos = pedidos['producto'].unique()
-            productos_no_comprados = [p for p in todos_productos if p not in productos_cliente['producto'].unique()]
-            
-            # Obtener precios de referencia para productos no comprados
-            oportunidades_data = []
-            for producto in productos_no_comprados[:5]:  # Solo primeros 5
-                precio_referencia = pedidos[pedidos['producto'] == producto]['precio_unitario'].mean()
-                oportunidades_data.append({
-                    'producto': producto,
-                    'precio_referencia': f"RD${precio_referencia:,.2f}" if not pd.isna(precio_referencia) else "N/A"
-                })
-            oportunidades_df = pd.DataFrame(oportunidades_data)
+                # Productos recomendados (filtrado colaborativo) con precios de referencia
+                with st.expander("🔍 Método de recomendación"):
+                    st.write("""
+                    Los productos recomendados se calculan basándose en:
+                    1. Productos que suelen comprarse junto con los que este cliente ya compra
+                    2. Afinidad: suma de similitudes con su historial de compras
+                    3. Solo productos que este cliente no compra actualmente
+                    4. Si el cliente tiene poco historial, se completa con lo que compran
+                       los clientes con mismo tipo de negocio y zona
+                    """)
             
-            # Mostrar en 3 columnas con formato mejorado
-            col1, col2, col3 = st.columns(3)
+                productos_recomendados = recomendaciones_cliente(
+                    motor_recomendaciones, indice_perfiles, cliente_data, n=5
+                )
+                productos_recomendados['precio_formateado'] = productos_recomendados['precio_referencia'].apply(
+                    lambda x: f"RD${x:,.2f}" if not pd.isna(x) else "N/A"
+                )
             
-            with col1:
-                st.markdown("**📦 Productos que más compra**")
-                # Crear tabla formateada
-                display_top = top_productos_cliente[['producto', 'cantidad', 'monto_formateado']].copy()
-                display_top.columns = ['Producto', 'Cantidad', 'Monto Total']
-                st.dataframe(
-                    display_top.style.format({
-                        'Cantidad': '{:,.0f}',
-                        'Monto Total': '{}'
-                    }), 
-                    hide_index=True,
-                    use_container_width=True
+                # Productos no comprados (oportunidades) con precios de referencia
+                # (ordenados por % de clientes similares que los compran)
+                oportunidades_df = indice_perfiles.oportunidades(
+                    cliente_data['codigo_cliente'], cliente_data['tipo_negocio'], cliente_data['zona'], n=5
                 )
-                
-            with col2:
-                st.markdown("**💡 Recomendados para su negocio**")
-                # Crear tabla formateada
-                display_recomendados = productos_recomendados[['producto', 'cantidad', 'monto_formateado']].copy()
-                display_recomendados.columns = ['Producto', 'Cantidad', 'Monto Total']
-                st.dataframe(
-                    display_recomendados.style.format({
-                        'Cantidad': '{:,.0f}',
-                        'Monto Total': '{}'
-                    }), 
-                    hide_index=True,
-                    use_container_width=True
+                oportunidades_df['precio_referencia'] = oportunidades_df['precio_referencia'].apply(
+                    lambda x: f"RD${x:,.2f}" if not pd.isna(x) else "N/A"
                 )
+            
+                # Mostrar en 3 columnas con formato mejorado
+                col1, col2, col3 = st.columns(3)
+            
+                with col1:
+                    st.markdown("**📦 Productos que más compra**")
+                    # Crear tabla formateada
+                    display_top = top_productos_cliente[['producto', 'cantidad', 'monto_formateado']].copy()
+                    display_top.columns = ['Producto', 'Cantidad', 'Monto Total']
+                    st.dataframe(
+                        display_top.style.format({
+                            'Cantidad': '{:,.0f}',
+                            'Monto Total': '{}'
+                        }), 
+                        hide_index=True,
+                        use_container_width=True
+                    )
                 
-            with col3:
-                st.markdown("**🚀 Oportunidades de venta**")
-                if not oportunidades_df.empty:
+                with col2:
+                    st.markdown("**💡 Recomendados para su negocio**")
+                    # Crear tabla formateada
+                    display_recomendados = productos_recomendados[['producto', 'afinidad', 'precio_formateado']].copy()
+                    display_recomendados.columns = ['Producto', 'Afinidad', 'Precio Referencia']
                     st.dataframe(
-                        oportunidades_df.rename(columns={
-                            'producto': 'Producto', 
-                            'precio_referencia': 'Precio Referencia'
+                        display_recomendados.style.format({
+                            'Afinidad': '{:,.2f}'
                         }), 
                         hide_index=True,
                         use_container_width=True
                     )
-                else:
-                    st.write("No hay oportunidades identificadas")
+                
+                with col3:
+                    st.markdown("**🚀 Oportunidades de venta**")
+                    if not oportunidades_df.empty:
+                        st.dataframe(
+                            oportunidades_df[['producto', 'precio_referencia', 'tasa_similares']].rename(columns={
+                                'producto': 'Producto', 
+                                'precio_referencia': 'Precio Referencia',
+                                'tasa_similares': 'Compran Similares'
+                            }).style.format({
+                                'Compran Similares': '{:.0%}'
+                            }), 
+                            hide_index=True,
+                            use_container_width=True
+                        )
+                    else:
+                        st.write("No hay oportunidades identificadas")
+            
+                # GUÍA DE CONVERSACIÓN COMERCIAL
+                st.subheader("💬 Guía de Ventas", help="Estrategias según perfil del cliente")
             
-            # GUÍA DE CONVERSACIÓN COMERCIAL
-            st.subheader("💬 Guía de Ventas", help="Estrategias según perfil del cliente")
+                # Explicación del segmento
+                with st.expander(f"📌 Explicación del segmento: {cliente_data['segmento']}"):
+                    if cliente_data['segmento'] == "Activo":
+                        st.write("""
+                        **Cliente ACTIVO:** Compra a su ritmo habitual (menos de 1.5 intervalos sin comprar)
+                        - Estrategia: Fidelización y venta cruzada
+                        - Objetivo: Aumentar ticket promedio
+                        """)
+                    elif cliente_data['segmento'] == "Disminuido":
+                        st.write("""
+                        **Cliente DISMINUIDO:** Compra menos de lo habitual (entre 1.5 y 3 intervalos sin comprar)
+                        - Estrategia: Reactivación
+                        - Objetivo: Recuperar frecuencia histórica
+                        """)
+                    else:
+                        st.write("""
+                        **Cliente INACTIVO:** Sin compras recientes (3 intervalos o más sin comprar)
+                        - Estrategia: Recuperación
+                        - Objetivo: Primera compra
+                        """)
             
-            # Explicación del segmento
-            with st.expander(f"📌 Explicación del segmento: {cliente_data['segmento']}"):
+                # Discurso recomendado (mismas plantillas que la guía por lotes de guia_ventas.py)
+                guion = guion_cliente(
+                    cliente_data,
+                    top_productos_cliente['producto'].iloc[0] if not top_productos_cliente.empty else None,
+                    productos_recomendados['producto'].iloc[0] if not productos_recomendados.empty else None,
+                )
                 if cliente_data['segmento'] == "Activo":
-                    st.write("""
-                    **Cliente ACTIVO:** Realiza compras frecuentes (última compra hace menos de 30 días)
-                    - Estrategia: Fidelización y venta cruzada
-                    - Objetivo: Aumentar ticket promedio
-                    """)
+                    st.success("**Discurso recomendado para cliente ACTIVO:**")
                 elif cliente_data['segmento'] == "Disminuido":
-                    st.write("""
-                    **Cliente DISMINUIDO:** Frecuencia de compra reducida (última compra hace 30-90 días)
-                    - Estrategia: Reactivación
-                    - Objetivo: Recuperar frecuencia histórica
-                    """)
+                    st.warning("**Discurso recomendado para cliente DISMINUIDO:**")
                 else:
-                    st.write("""
-                    **Cliente INACTIVO:** Sin compras recientes (última compra hace más de 90 días)
-                    - Estrategia: Recuperación
-                    - Objetivo: Primera compra
-                    """)
+                    st.error("**Discurso recomendado para cliente INACTIVO:**")
+                st.write(guion)
             
-            # Discurso recomendado
-            if cliente_data['segmento'] == "Activo":
-                st.success("**Discurso recomendado para cliente ACTIVO:**")
-                st.write(f"""
-                "Don/Dña {cliente_data['nombre'].split()[0]}, siempre es un placer atenderle. 
-                Como veo que frecuenta nuestro colmado, quería comentarle sobre **{productos_recomendados.iloc[0]['producto']}** 
-                que está teniendo mucha aceptación. ¿Le interesaría probar una muestra o llevar una cantidad pequeña 
-                con un **5% de descuento** por ser cliente preferencial?"
-                """)
-                
-            elif cliente_data['segmento'] == "Disminuido":
-                st.warning("**Discurso recomendado para cliente DISMINUIDO:**")
-                st.write(f"""
-                "Don/Dña {cliente_data['nombre'].split()[0]}, ¡cuánto tiempo sin atenderle! 
-                Hemos notado que antes solía comprar **{top_productos_cliente.iloc[0]['producto']}** con frecuencia. 
-                Tenemos una **oferta especial** solo para usted este mes. ¿Quiere que le aparte algunas unidades 
-                con un **10% de descuento** para que vuelva a disfrutar de nuestros productos?"
-                """)
-                
-            else:
-                st.error("**Discurso recomendado para cliente INACTIVO:**")
-                st.write(f"""
-                "Don/Dña {cliente_data['nombre'].split()[0]}, espero que esté bien. 
-                Nos hacía falta su visita y queríamos ofrecerle un **descuento especial del 15%** 
-                en su próxima compra más **entrega gratuita**. ¿Qué productos necesita actualmente 
-                para su negocio? Tenemos disponibilidad de **{productos_recomendados.iloc[0]['producto']}** 
-                que podría interesarle."
-                """)
-            
-            # Frecuencia de contacto recomendada
-            st.markdown("**⏰ Frecuencia recomendada de contacto:**")
-            if cliente_data['frecuencia_compra'] < 15:
-                st.write("- Cada 2 semanas (cliente muy activo)")
-            elif cliente_data['frecuencia_compra'] < 30:
-                st.write("- Semanal (mantener engagement)")
-            else:
-                st.write("- 2-3 veces por semana (recuperación urgente)")
+                # Frecuencia de contacto recomendada
+                st.markdown("**⏰ Frecuencia recomendada de contacto:**")
+                st.write(f"- {frecuencia_contacto(cliente_data['frecuencia_compra'])}")
             
-            # BOTÓN PARA LIMPIAR BÚSQUEDA Y VOLVER AL INICIO
-            st.markdown("---")
-            if st.button("🔄 Limpiar búsqueda y volver al listado", type="secondary"):
-                # Usamos session state para resetear los selectboxes
-                st.session_state.cliente_search_code = ""
-                st.session_state.cliente_search_name = ""
-                st.rerun()
+                # BOTÓN PARA LIMPIAR BÚSQUEDA Y VOLVER AL INICIO
+                st.markdown("---")
+                # El callback limpia la búsqueda y solo se vuelve a ejecutar este panel
+                st.button("🔄 Limpiar búsqueda y volver al listado", type="secondary", on_click=limpiar_busqueda_cliente)
             
-        else:
-            if cliente_search_code or cliente_search_name:
-                st.warning("No se encontraron clientes con los criterios de búsqueda")
-                # Botón para limpiar búsqueda
-                if st.button("🔄 Limpiar búsqueda", type="secondary"):
-                    st.session_state.cliente_search_code = ""
-                    st.session_state.cliente_search_name = ""
-                    st.rerun()
             else:
-                st.info("Use los filtros de búsqueda para encontrar un cliente específico")
+                if consulta_cliente:
+                    st.warning("No se encontraron clientes con los criterios de búsqueda")
+                    # Botón para limpiar búsqueda
+                    st.button("🔄 Limpiar búsqueda", type="secondary", on_click=limpiar_busqueda_cliente)
+                else:
+                    st.info("Use los filtros de búsqueda para encontrar un cliente específico")
                 
-                # Mostrar lista resumida de clientes disponibles
-                with st.expander("👥 Ver lista de clientes disponibles"):
-                    clientes_resumen = filtered_df[['codigo_cliente', 'nombre', 'segmento', 'zona']].head(10)
-                    st.dataframe(
-                        clientes_resumen.style.format({
-                            'codigo_cliente': '{}'
-                        }), 
-                        hide_index=True,
-                        use_container_width=True
-                    )
-                    if len(filtered_df) > 10:
-                        st.caption(f"Mostrando 10 de {len(filtered_df)} clientes. Use la búsqueda para encontrar clientes específicos.")
-    else:
-        st.warning("No hay clientes que coincidan con los filtros seleccionados")
+                    # Mostrar lista resumida de clientes disponibles
+                    with st.expander("👥 Ver lista de clientes disponibles"):
+                        clientes_resumen = df.iloc[indice_busqueda.listar(posiciones, 10)][['codigo_cliente', 'nombre', 'segmento', 'zona']]
+                        st.dataframe(
+                            clientes_resumen.astype({'codigo_cliente': str}),
+                            hide_index=True,
+                            use_container_width=True
+                        )
+                        if len(filtered_df) > 10:
+                            st.caption(f"Mostrando 10 de {len(filtered_df)} clientes. Use la búsqueda para encontrar clientes específicos.")
+        else:
+            st.warning("No hay clientes que coincidan con los filtros seleccionados")
+    mostrar_latencia("panel_cliente")
+
+if pestana == PESTANAS[1]:
+    st.header("📞 Gestión de Clientes")
+    indice_perfiles = obtener_indice_perfiles(TIPO_FUENTE, UBICACION_FUENTE, version_datos, df, pedidos)
+    motor_recomendaciones = obtener_motor_recomendaciones(TIPO_FUENTE, UBICACION_FUENTE, version_datos, pedidos)
+    indice_busqueda = obtener_indice_busqueda(TIPO_FUENTE, UBICACION_FUENTE, version_datos, df)
+    panel_cliente(
+        filtered_df, motor_filtros.seleccion(selected_vendedor, selected_segmento, selected_mes),
+        indice_busqueda, indice_perfiles, motor_recomendaciones
+    )
 
 # ----------------------------------------------------------
 # PESTAÑA 3: Desempeño de Vendedores
 # ----------------------------------------------------------
-with tab3:
+if pestana == PESTANAS[2]:
     st.header("👤 Desempeño de Vendedores", help="Métricas y análisis por vendedor/zona")
+    cubo = obtener_cubo(TIPO_FUENTE, UBICACION_FUENTE, version_datos, df, pedidos)
     
     if not filtered_df.empty:
         # Selección de vendedor específico para análisis detallado
@@ -575,39 +631,38 @@ with tab3:
         vendedor_seleccionado = st.selectbox(
             "Seleccionar Vendedor para Análisis Detallado",
             options=vendedores_disponibles,
+            index=indice_guardado("vendedor_seleccionado", vendedores_disponibles),
             help="Seleccione un vendedor para ver análisis específico",
-            key="vendedor_seleccionado"
+            **recordar_control("vendedor_seleccionado")
         )
         
         # Filtrar datos si se selecciona un vendedor específico
-        df_vendedor = filtered_df if vendedor_seleccionado == "Todos" else filtered_df[filtered_df["zona"] == vendedor_seleccionado]
+        vendedor_filtro = selected_vendedor if vendedor_seleccionado == "Todos" else vendedor_seleccionado
+        df_vendedor = motor_filtros.filtrar(df, vendedor_filtro, selected_segmento, selected_mes)
         
         if vendedor_seleccionado != "Todos":
             st.subheader(f"📊 Análisis Detallado: {vendedor_seleccionado}")
             
             # KPIs del vendedor con formato mejorado
+            filtros_vendedor = cubo.filtros_cliente(vendedor_filtro, selected_segmento, selected_mes)
+            kpis_vendedor = cubo.indicadores(filtros_vendedor)
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                st.metric("Total Clientes", f"{df_vendedor['codigo_cliente'].nunique():,}")
+                st.metric("Total Clientes", f"{int(kpis_vendedor['clientes']):,}")
             with col2:
-                st.metric("Ventas Totales", f"RD${df_vendedor['monto_total'].sum():,.2f}")
+                st.metric("Ventas Totales", f"RD${kpis_vendedor['monto_total_suma']:,.2f}")
             with col3:
-                st.metric("Ticket Promedio", f"RD${df_vendedor['ticket_promedio'].mean():,.2f}")
+                st.metric("Ticket Promedio", f"RD${kpis_vendedor['ticket_promedio_promedio']:,.2f}")
             with col4:
-                st.metric("Efectividad", f"{df_vendedor['efectividad_entrega'].mean():.2%}")
+                st.metric("Efectividad", f"{kpis_vendedor['efectividad_entrega_promedio']:.2%}")
             
             # Productos que más vende el vendedor con formato
             st.subheader("📦 Productos que Más Vende")
             if not pedidos.empty:
-                productos_vendedor = pedidos[pedidos['codigo_cliente'].isin(df_vendedor['codigo_cliente'])]
-                top_productos_vendedor = productos_vendedor.groupby('producto').agg({
-                    'cantidad': 'sum',
-                    'monto': 'sum'
-                }).nlargest(10, 'cantidad').reset_index()
-                
-                # Formatear montos para display
-                top_productos_vendedor['monto_formateado'] = top_productos_vendedor['monto'].apply(lambda x: f"RD${x:,.2f}")
-                top_productos_vendedor['cantidad_formateada'] = top_productos_vendedor['cantidad'].apply(lambda x: f"{x:,.0f}")
+                top_productos_vendedor = agregado(
+                    "productos_mas_vendidos", (vendedor_filtro, selected_segmento, selected_mes),
+                    lambda: productos_mas_vendidos(cubo, filtros_vendedor)
+                )
                 
                 fig_productos = px.bar(
                     top_productos_vendedor,
@@ -640,13 +695,18 @@ with tab3:
                         use_container_width=True
                     )
             
-            # Segmentación de clientes del vendedor
+            # Segmentación de clientes del vendedor (consultada al cubo)
             st.subheader("🔍 Segmentación de Clientes")
+            segmentos_vendedor = agregado(
+                "ventas_por_segmento", (vendedor_filtro, selected_segmento, selected_mes),
+                lambda: ventas_por_segmento(cubo, filtros_vendedor)
+            )
             seg_vendedor_cols = st.columns(2)
             with seg_vendedor_cols[0]:
                 fig_segmento = px.pie(
-                    df_vendedor, 
+                    segmentos_vendedor, 
                     names="segmento", 
+                    values="filas", 
                     title=f"Segmentación - {vendedor_seleccionado}",
                     hole=0.4
                 )
@@ -658,41 +718,37 @@ with tab3:
                 st.metric("Clientes Inactivos", f"{len(clientes_inactivos):,}")
                 if len(clientes_inactivos) > 0:
                     with st.expander("📋 Ver clientes inactivos"):
-                        display_inactivos = clientes_inactivos[['nombre', 'codigo_cliente', 'frecuencia_compra', 'monto_total']].copy()
-                        display_inactivos['monto_total_formateado'] = display_inactivos['monto_total'].apply(lambda x: f"RD${x:,.2f}")
-                        display_inactivos['frecuencia_compra_formateada'] = display_inactivos['frecuencia_compra'].apply(lambda x: f"{x:,} días")
-                        
-                        st.dataframe(
-                            display_inactivos[['nombre', 'codigo_cliente', 'frecuencia_compra_formateada', 'monto_total_formateado']].rename(columns={
-                                'nombre': 'Nombre',
-                                'codigo_cliente': 'Código',
-                                'frecuencia_compra_formateada': 'Días sin Compra',
-                                'monto_total_formateado': 'Histórico Ventas'
-                            }), 
-                            hide_index=True,
-                            use_container_width=True
+                        columnas_inactivos = ['nombre', 'codigo_cliente', 'telefono', 'direccion', 'frecuencia_compra', 'monto_total']
+                        titulos_inactivos = {
+                            'nombre': 'Nombre',
+                            'codigo_cliente': 'Código',
+                            'telefono': 'Teléfono',
+                            'direccion': 'Dirección',
+                            'frecuencia_compra': 'Días sin Compra',
+                            'monto_total': 'Histórico Ventas'
+                        }
+                        tabla_paginada(
+                            clientes_inactivos,
+                            columnas_inactivos,
+                            key="tabla_inactivos",
+                            titulos=titulos_inactivos,
+                            formatos={'frecuencia_compra': "{:,} días", 'monto_total': "RD${:,.2f}"},
+                            orden='monto_total'
+                        )
+                        sufijo_inactivos = "" if vendedor_seleccionado == "Todos" else f"_{vendedor_seleccionado}"
+                        boton_exportar(
+                            lambda: clientes_inactivos[columnas_inactivos], f"clientes_inactivos{sufijo_inactivos}",
+                            key="exportar_inactivos", titulos=titulos_inactivos
                         )
         
         # Estadísticas generales por vendedor (tabla comparativa) CON FORMATO MEJORADO
         st.subheader("📋 Comparativa de Vendedores")
         
-        # Calcular estadísticas con formato
-        vendedor_stats = filtered_df.groupby("zona").agg({
-            "nombre": "count",
-            "frecuencia_compra": "mean",
-            "efectividad_entrega": "mean",
-            "ticket_promedio": "mean",
-            "valor_cliente": "mean",
-            "monto_total": "sum"
-        }).reset_index()
-
-        # Aplicar formato a las métricas
-        vendedor_stats["clientes_formateado"] = vendedor_stats["nombre"].apply(lambda x: f"{x:,.0f}")
-        vendedor_stats["frecuencia_formateada"] = vendedor_stats["frecuencia_compra"].round(0).apply(lambda x: f"{x:,.0f}")
-        vendedor_stats["efectividad_formateada"] = (vendedor_stats["efectividad_entrega"] * 100).round(2).apply(lambda x: f"{x:.2f}%")
-        vendedor_stats["ticket_formateado"] = vendedor_stats["ticket_promedio"].round(2).apply(lambda x: f"RD${x:,.2f}")
-        vendedor_stats["valor_cliente_formateado"] = vendedor_stats["valor_cliente"].round(2).apply(lambda x: f"RD${x:,.2f}")
-        vendedor_stats["monto_total_formateado"] = vendedor_stats["monto_total"].round(2).apply(lambda x: f"RD${x:,.2f}")
+        # Estadísticas con formato (compartidas entre sesiones con los mismos filtros)
+        vendedor_stats = agregado(
+            "estadisticas_vendedores", (selected_vendedor, selected_segmento, selected_mes),
+            lambda: estadisticas_vendedores(cubo, cubo.filtros_cliente(selected_vendedor, selected_segmento, selected_mes))
+        )
 
         # Configuración de AgGrid con formato mejorado
         gb = GridOptionsBuilder.from_dataframe(
@@ -719,7 +775,7 @@ with tab3:
                           header_name="Frecuencia (días)",
                           width=130,
                           tooltipField="Frecuencia (días)",
-                          headerTooltip="Días promedio entre compras")
+                          headerTooltip="Días promedio entre compras (clientes con al menos dos compras)")
         
         gb.configure_column("efectividad_formateada", 
                           header_name="Efectividad",
@@ -819,10 +875,10 @@ with tab3:
             
             # Calcular algunas métricas comparativas
             promedio_industria_efectividad = 0.85  # 85% como referencia
-            promedio_industria_frecuencia = 45  # 45 días como referencia
+            promedio_industria_frecuencia = 45  # 45 días entre compras como referencia
             
-            efectividad_vendedor = df_vendedor['efectividad_entrega'].mean()
-            frecuencia_vendedor = df_vendedor['frecuencia_compra'].mean()
+            efectividad_vendedor = kpis_vendedor['efectividad_entrega_promedio']
+            frecuencia_vendedor = kpis_vendedor['intervalo_compra_promedio']
             
             col_res1, col_res2, col_res3 = st.columns(3)
             
@@ -833,14 +889,16 @@ with tab3:
                     st.warning(f"⚠️ Efectividad: **{efectividad_vendedor:.2%}** (Por debajo de referencia)")
             
             with col_res2:
-                if frecuencia_vendedor < promedio_industria_frecuencia:
+                if pd.isna(frecuencia_vendedor):
+                    st.info("ℹ️ Frecuencia: sin clientes con al menos dos compras")
+                elif frecuencia_vendedor < promedio_industria_frecuencia:
                     st.success(f"✅ Frecuencia: **{frecuencia_vendedor:,.0f} días** (Mejor que referencia)")
                 else:
                     st.warning(f"⚠️ Frecuencia: **{frecuencia_vendedor:,.0f} días** (Mayor que referencia)")
             
             with col_res3:
-                clientes_activos = len(df_vendedor[df_vendedor['segmento'] == 'Activo'])
-                porcentaje_activos = (clientes_activos / len(df_vendedor)) * 100
+                clientes_activos = int(segmentos_vendedor.loc[segmentos_vendedor['segmento'] == 'Activo', 'filas'].sum())
+                porcentaje_activos = (clientes_activos / kpis_vendedor['filas']) * 100
                 st.info(f"📊 Clientes Activos: **{clientes_activos:,}** ({porcentaje_activos:.1f}%)")
         
     else:
@@ -849,7 +907,7 @@ with tab3:
 # ----------------------------------------------------------
 # PESTAÑA 4: ESTRATEGIAS DE PROMOCIÓN
 # ----------------------------------------------------------
-with tab4:
+if pestana == PESTANAS[3]:
     st.header("🔥 Estrategias de Promoción", help="Generador de promociones por segmento")
     
     # Promociones por segmento
@@ -892,23 +950,29 @@ with tab4:
         4. Copie el texto generado
         """)
     
+    productos_promo = pedidos['producto'].unique()
     producto_promo = st.selectbox(
         "Producto para promoción",
-        options=pedidos['producto'].unique(),
-        help="Seleccione el producto a promocionar"
+        options=productos_promo,
+        index=indice_guardado("producto_promo", productos_promo),
+        help="Seleccione el producto a promocionar",
+        **recordar_control("producto_promo")
     )
     
     descuento = st.slider(
         "Porcentaje de descuento", 
         min_value=5, 
         max_value=50, 
-        value=10,
-        help="Descuento a aplicar (5% mínimo para ser atractivo)"
+        value=valor_guardado("descuento_promo", 10),
+        help="Descuento a aplicar (5% mínimo para ser atractivo)",
+        **recordar_control("descuento_promo")
     )
     
     validez = st.date_input(
         "Válido hasta",
-        help="Fecha límite para crear sentido de urgencia"
+        value=valor_guardado("validez_promo", "today"),
+        help="Fecha límite para crear sentido de urgencia",
+        **recordar_control("validez_promo")
     )
     
     if st.button("Generar texto promocional", help="Clic para generar el mensaje"):
@@ -932,123 +996,159 @@ with tab4:
 # ----------------------------------------------------------
 # PESTAÑA 5: Alertas y Seguimiento de Clientes
 # ----------------------------------------------------------
-with tab5:
-    st.header("🚨 Alertas y Seguimiento de Clientes")
-    
-    if not filtered_df.empty:
-        # Configuración de umbrales para alertas
-        st.subheader("⚙️ Configuración de Alertas")
-        col_umbral1, col_umbral2 = st.columns(2)
-        
-        with col_umbral1:
-            dias_alerta_inactivos = st.slider(
-                "Días para alerta de clientes inactivos",
-                min_value=30,
-                max_value=180,
-                value=90,
-                help="Clientes con más días que este umbral se considerarán para visita urgente"
-            )
-        
-        with col_umbral2:
-            umbral_efectividad = st.slider(
-                "Umbral mínimo de efectividad (%)",
-                min_value=50,
-                max_value=95,
-                value=80,
-                help="Clientes por debajo de este % requieren atención"
-            )
+@st.fragment
+def panel_alertas(filtered_df, filtros):
+    """Umbrales, semáforo y listado de alertas; mover un umbral solo vuelve a ejecutar este panel"""
+    with medir(st.session_state, "panel_alertas"):
+        if not filtered_df.empty:
+            # Configuración de umbrales para alertas
+            st.subheader("⚙️ Configuración de Alertas")
+            col_umbral1, col_umbral2 = st.columns(2)
         
-        # SEMÁFORO DE ALERTAS
-        st.subheader("🚦 Semáforo de Alertas por Cliente")
+            with col_umbral1:
+                dias_alerta_inactivos = st.slider(
+                    "Días para alerta de clientes inactivos",
+                    min_value=30,
+                    max_value=180,
+                    value=valor_guardado("dias_alerta_inactivos", 90),
+                    help="Clientes con más días que este umbral se considerarán para visita urgente",
+                    **recordar_control("dias_alerta_inactivos")
+                )
         
-        # Calcular alertas
-        filtered_df["necesita_visita"] = filtered_df["frecuencia_compra"] > dias_alerta_inactivos
-        filtered_df["baja_efectividad"] = filtered_df["efectividad_entrega"] < (umbral_efectividad / 100)
+            with col_umbral2:
+                umbral_efectividad = st.slider(
+                    "Umbral mínimo de efectividad (%)",
+                    min_value=50,
+                    max_value=95,
+                    value=valor_guardado("umbral_efectividad", 80),
+                    help="Clientes por debajo de este % requieren atención",
+                    **recordar_control("umbral_efectividad")
+                )
         
-        # Contadores de alertas
-        total_clientes = len(filtered_df)
-        clientes_visita = filtered_df["necesita_visita"].sum()
-        clientes_efectividad = filtered_df["baja_efectividad"].sum()
+            # SEMÁFORO DE ALERTAS
+            st.subheader("🚦 Semáforo de Alertas por Cliente")
         
-        # Mostrar resumen de alertas
-        col_alert1, col_alert2, col_alert3 = st.columns(3)
-        with col_alert1:
-            st.metric("Total Clientes", total_clientes)
-        with col_alert2:
-            st.metric("Necesitan Visita", clientes_visita, delta=f"{(clientes_visita/total_clientes*100):.1f}%")
-        with col_alert3:
-            st.metric("Baja Efectividad", clientes_efectividad, delta=f"{(clientes_efectividad/total_clientes*100):.1f}%")
+            # Calcular alertas (reglas ponderadas evaluadas sobre todos los clientes a la vez)
+            # (memorizadas por filtros y umbrales: solo las columnas de alerta, no la tabla de clientes)
+            motor_alertas = MotorAlertas(*reglas_por_defecto(dias_alerta_inactivos, umbral_efectividad / 100))
+            evaluacion = agregado(
+                "alertas", (filtros, dias_alerta_inactivos, umbral_efectividad),
+                lambda: motor_alertas.evaluar(filtered_df)
+            )
         
-        # Tabla de clientes con alertas
-        st.subheader("📋 Listado de Clientes con Alertas")
+            # Contadores de alertas
+            total_clientes = len(evaluacion)
+            clientes_visita = evaluacion["necesita_visita"].sum()
+            clientes_efectividad = evaluacion["baja_efectividad"].sum()
         
-        # Crear columna de prioridad
-        def calcular_prioridad(fila):
-            if fila['necesita_visita'] and fila['baja_efectividad']:
-                return "ALTA"
-            elif fila['necesita_visita']:
-                return "MEDIA"
-            elif fila['baja_efectividad']:
-                return "BAJA"
-            else:
-                return "NINGUNA"
+            # Mostrar resumen de alertas
+            col_alert1, col_alert2, col_alert3 = st.columns(3)
+            with col_alert1:
+                st.metric("Total Clientes", total_clientes)
+            with col_alert2:
+                st.metric("Necesitan Visita", clientes_visita, delta=f"{(clientes_visita/total_clientes*100):.1f}%")
+            with col_alert3:
+                st.metric("Baja Efectividad", clientes_efectividad, delta=f"{(clientes_efectividad/total_clientes*100):.1f}%")
         
-        filtered_df["prioridad"] = filtered_df.apply(calcular_prioridad, axis=1)
+            # Tabla de clientes con alertas
+            st.subheader("📋 Listado de Clientes con Alertas")
         
-        # Filtrar solo clientes con alertas
-        clientes_con_alerta = filtered_df[filtered_df["prioridad"] != "NINGUNA"]
+            # Filtrar solo clientes con alertas, de mayor a menor puntaje, y unirles sus datos
+            alertas_activas = evaluacion[evaluacion["prioridad"] != SIN_ALERTA].sort_values("puntaje", ascending=False, kind="mergesort")
+            clientes_con_alerta = pd.concat([filtered_df.loc[alertas_activas.index], alertas_activas], axis=1)
         
-        if not clientes_con_alerta.empty:
-            # Mostrar tabla con alertas
-            columnas_alerta = ['nombre', 'codigo_cliente', 'zona', 'frecuencia_compra', 
-                             'efectividad_entrega', 'prioridad']
-            
-            # Aplicar formato condicional
-            def estilo_filas(fila):
-                if fila['prioridad'] == 'ALTA':
-                    return ['background-color: #ffcccc'] * len(fila)
-                elif fila['prioridad'] == 'MEDIA':
-                    return ['background-color: #fff2cc'] * len(fila)
-                elif fila['prioridad'] == 'BAJA':
-                    return ['background-color: #e6f3ff'] * len(fila)
-                else:
-                    return [''] * len(fila)
-            
-            st.dataframe(
-                clientes_con_alerta[columnas_alerta].style.apply(estilo_filas, axis=1),
-                use_container_width=True
-            )
+            if not clientes_con_alerta.empty:
+                # Mostrar tabla con alertas
+                columnas_alerta = ['nombre', 'codigo_cliente', 'zona', 'frecuencia_compra', 
+                                 'efectividad_entrega', 'prioridad', 'puntaje', 'riesgo_abandono']
             
-            # Botón para exportar lista de visitas
-            if st.button("📥 Exportar Lista de Visitas"):
-                visita_data = clientes_con_alerta[['nombre', 'codigo_cliente', 'zona', 'telefono', 'direccion', 'prioridad']]
-                csv = visita_data.to_csv(index=False)
-                st.download_button(
-                    "Descargar CSV",
-                    data=csv,
-                    file_name=f"visitas_prioritarias_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv"
+                # Tabla paginada en el servidor, con color de fila por prioridad
+                tabla_paginada(
+                    clientes_con_alerta,
+                    columnas_alerta,
+                    key="tabla_alertas",
+                    formatos={'efectividad_entrega': "{:.1%}", 'riesgo_abandono': "{:.0%}"},
+                    orden='puntaje',
+                    colores_filas=('prioridad', COLORES_PRIORIDAD)
                 )
-        else:
-            st.success("🎉 No hay clientes con alertas activas según los criterios configurados")
+                columnas_condiciones = [c["nombre"] for c in motor_alertas.condiciones]
+                boton_exportar(
+                    lambda: clientes_con_alerta[columnas_alerta + ['telefono', 'direccion'] + columnas_condiciones],
+                    "clientes_con_alerta", key="exportar_alertas"
+                )
+            
+                # Exportar la lista de visitas como ruta ordenada por vendedor (ver rutas.py)
+                if st.toggle("📥 Exportar Lista de Visitas", value=valor_guardado("exportar_visitas", False),
+                             **recordar_control("exportar_visitas")):
+                    col_ruta1, col_ruta2 = st.columns(2)
+                    with col_ruta1:
+                        visitas_por_dia = st.number_input("Visitas por día", min_value=1, max_value=100, step=1,
+                                                          value=valor_guardado("visitas_por_dia", VISITAS_POR_DIA),
+                                                          **recordar_control("visitas_por_dia"))
+                    
+                    # Solo las alertas de mayor puntaje: el tiempo de planificación crece con las paradas
+                    paradas_ruta = clientes_con_alerta.head(MAXIMO_PARADAS_RUTA)
+                    if len(clientes_con_alerta) > MAXIMO_PARADAS_RUTA:
+                        st.caption(f"La ruta incluye las {MAXIMO_PARADAS_RUTA:,} alertas de mayor puntaje "
+                                   f"de {len(clientes_con_alerta):,}; filtre por zona para planificar el resto.")
+                    
+                    # Coordenadas resueltas del mapa (hoja, geocodificación o centro de la zona)
+                    mapa = obtener_mapa(TIPO_FUENTE, UBICACION_FUENTE, version_datos, df)
+                    posiciones_alerta = df.index.get_indexer(paradas_ruta.index)
+                    ruta_visitas = agregado(
+                        "ruta_visitas", (filtros, dias_alerta_inactivos, umbral_efectividad, int(visitas_por_dia)),
+                        lambda: planificar_rutas(
+                            paradas_ruta.assign(lat=mapa.lat[posiciones_alerta], lon=mapa.lon[posiciones_alerta]),
+                            visitas_por_dia=int(visitas_por_dia)
+                        )
+                    )
+                    st.dataframe(resumen_rutas(ruta_visitas), hide_index=True, use_container_width=True)
+                    
+                    with col_ruta2:
+                        vendedores_ruta = ["Todos"] + sorted(ruta_visitas["zona"].astype(str).unique())
+                        vendedor_ruta = st.selectbox("Ruta del vendedor", vendedores_ruta,
+                                                     index=indice_guardado("vendedor_ruta", vendedores_ruta),
+                                                     **recordar_control("vendedor_ruta"))
+                    if vendedor_ruta != "Todos":
+                        ruta_visitas = ruta_visitas[ruta_visitas["zona"].astype(str) == vendedor_ruta]
+                    
+                    visita_data = ruta_visitas[['zona', 'dia', 'orden', 'nombre', 'codigo_cliente', 'telefono', 'direccion',
+                                                'prioridad', 'puntaje', 'riesgo_abandono', 'distancia_km', 'acumulado_km']]
+                    sufijo_ruta = "" if vendedor_ruta == "Todos" else f"_{vendedor_ruta}"
+                    boton_exportar(lambda: visita_data, f"visitas_prioritarias{sufijo_ruta}", key="exportar_ruta")
+            else:
+                st.success("🎉 No hay clientes con alertas activas según los criterios configurados")
         
-        # Gráfico de distribución de alertas
-        st.subheader("📊 Distribución de Alertas")
-        if not clientes_con_alerta.empty:
-            fig_alertas = px.pie(
-                clientes_con_alerta,
-                names="prioridad",
-                title="Distribución de Prioridades de Alerta",
-                color="prioridad",
-                color_discrete_map={
-                    "ALTA": "#ff4444",
-                    "MEDIA": "#ffaa00", 
-                    "BAJA": "#44aaff"
-                }
-            )
-            st.plotly_chart(fig_alertas, use_container_width=True)
+            # Gráfico de distribución de alertas
+            st.subheader("📊 Distribución de Alertas")
+            if not clientes_con_alerta.empty:
+                fig_alertas = px.pie(
+                    clientes_con_alerta,
+                    names="prioridad",
+                    title="Distribución de Prioridades de Alerta",
+                    color="prioridad",
+                    color_discrete_map={
+                        "ALTA": "#ff4444",
+                        "MEDIA": "#ffaa00", 
+                        "BAJA": "#44aaff"
+                    }
+                )
+                st.plotly_chart(fig_alertas, use_container_width=True)
         
-    else:
-        st.warning("No hay datos para mostrar alertas")
+        else:
+            st.warning("No hay datos para mostrar alertas")
+    mostrar_latencia("panel_alertas")
+
+if pestana == PESTANAS[4]:
+    st.header("🚨 Alertas y Seguimiento de Clientes")
+    panel_alertas(filtered_df, filtros_actuales)
 
-# ----------------------------------------------------------
\ No newline at end of file
+# ----------------------------------------------------------
+# LATENCIA DE EJECUCIÓN (DEPURACIÓN)
+# ----------------------------------------------------------
+# Los paneles de Clientes y Alertas se vuelven a ejecutar solos (st.fragment):
+# sus mediciones aparecen aquí en la siguiente ejecución completa
+registrar(st.session_state, "ejecución completa", (time.perf_counter() - inicio_ejecucion) * 1000)
+if st.session_state.get("mostrar_latencias"):
+    with st.expander("⏱️ Latencia de ejecución", expanded=True):
+        st.dataframe(resumen(st.session_state), hide_index=True, use_container_width=True)
@@ -0,0 +1,143 @@
+# ----------------------------------------------------------
+# CUBO OLAP: MEDIDAS ADITIVAS POR ZONA, SEGMENTO, MES, TIPO DE NEGOCIO Y PRODUCTO
+# ----------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+from filtros import TODOS, MotorFiltros
+
+# Dimensiones de cliente (las mismas columnas que usan los filtros del sidebar)
+DIMENSIONES_CLIENTE = ["zona", "segmento", "mes_frecuente", "tipo_negocio"]
+DIMENSIONES_PEDIDO = DIMENSIONES_CLIENTE + ["mes_pedido", "producto"]
+
+# Columnas de clientes cuyo promedio se consulta (se guarda suma y conteo)
+COLUMNAS_PROMEDIO = ["monto_total", "frecuencia_compra", "intervalo_compra", "efectividad_entrega", "ticket_promedio", "valor_cliente"]
+
+# Rollups materializados del cubo de pedidos, además del nivel base
+ROLLUPS_PEDIDOS = [
+    ["zona", "segmento", "mes_frecuente", "producto"],
+    ["mes_pedido", "producto"],
+    ["producto"],
+]
+
+
+def texto_categorico(serie):
+    """Categórica con las categorías en texto (solo se formatean los valores distintos)"""
+    categorias = pd.Categorical(serie)
+    return categorias.rename_categories(categorias.categories.astype(str))
+
+
+class Cubo:
+    """Medidas aditivas agregadas por un conjunto de dimensiones.
+
+    El nivel base guarda una fila por combinación presente de dimensiones
+    (no el producto cartesiano). Los rollups son el mismo cubo con menos
+    dimensiones; una consulta usa el cuboide más pequeño que contiene las
+    dimensiones filtradas y agrupadas, así que no recorre los datos crudos.
+    """
+
+    def __init__(self, hechos, dimensiones, medidas, rollups=()):
+        self.dimensiones = list(dimensiones)
+        self.medidas = list(medidas)
+        # Agrupar sobre categorías (códigos enteros) es mucho más rápido que sobre texto
+        hechos = hechos.astype({dimension: "category" for dimension in self.dimensiones})
+        base = self._agrupar(hechos, self.dimensiones)
+        self.cuboides = {frozenset(self.dimensiones): base}
+        for rollup in rollups:
+            self.cuboides[frozenset(rollup)] = self._agrupar(base, list(rollup))
+
+    def _agrupar(self, tabla, dimensiones):
+        # Las filas con dimensiones nulas se conservan para que los totales cuadren
+        agrupado = (tabla.groupby(dimensiones, observed=True, dropna=False, sort=False)[self.medidas]
+                    .sum().reset_index())
+        return agrupado.astype({dimension: "category" for dimension in dimensiones})
+
+    def cuboide(self, dimensiones):
+        """Cuboide materializado más pequeño que contiene esas dimensiones"""
+        candidatos = [tabla for dims, tabla in self.cuboides.items() if set(dimensiones) <= dims]
+        if not candidatos:
+            raise KeyError(f"Dimensiones fuera del cubo: {', '.join(sorted(set(dimensiones) - set(self.dimensiones)))}")
+        return min(candidatos, key=len)
+
+    def consultar(self, filtros=None, por=()):
+        """Suma de las medidas para los filtros dados, agrupada por `por`.
+
+        `filtros` es {dimensión: valor}; `TODOS` no filtra. Sin `por`
+        devuelve una Serie con los totales; con `por` un DataFrame ordenado
+        por esas dimensiones (como un groupby).
+        """
+        filtros = {dimension: valor for dimension, valor in (filtros or {}).items() if valor != TODOS}
+        por = list(por)
+        tabla = self.cuboide(set(filtros) | set(por))
+        if filtros:
+            mascara = np.ones(len(tabla), dtype=bool)
+            for dimension, valor in filtros.items():
+                mascara &= (tabla[dimension] == valor).to_numpy()
+            tabla = tabla[mascara]
+        if not por:
+            return tabla[self.medidas].sum()
+        return tabla.groupby(por, observed=True, sort=True)[self.medidas].sum().reset_index()
+
+
+class CuboVentas:
+    """Cubos de clientes y de pedidos, construidos una vez por carga de datos.
+
+    - `clientes`: por zona, segmento, mes más frecuente y tipo de negocio;
+      clientes distintos, filas y suma/conteo de las métricas de cliente
+      (los promedios se obtienen como suma / conteo).
+    - `pedidos`: por las mismas dimensiones del cliente más `mes_pedido` y
+      `producto`; cantidad, monto y líneas.
+
+    Las dimensiones de cliente son las columnas de los filtros del sidebar,
+    en texto como en `MotorFiltros`, así que cualquier combinación de
+    filtros es una consulta al cubo. Se asume una fila por cliente en `df`.
+    """
+
+    def __init__(self, df, pedidos):
+        dimensiones = pd.DataFrame({dimension: df[dimension].astype(str).astype("category") for dimension in DIMENSIONES_CLIENTE}, index=df.index)
+
+        hechos_clientes = dimensiones.assign(
+            clientes=(~df["codigo_cliente"].duplicated()).astype(np.int64),
+            filas=1,
+        )
+        for columna in COLUMNAS_PROMEDIO:
+            # Sin la columna (p. ej. `intervalo_compra` sin series de ventas) el promedio queda en NaN
+            valores = df[columna] if columna in df else pd.Series(np.nan, index=df.index)
+            hechos_clientes[f"suma_{columna}"] = valores.fillna(0).to_numpy(dtype=float)
+            hechos_clientes[f"n_{columna}"] = valores.notna().astype(np.int64).to_numpy()
+        self.clientes = Cubo(hechos_clientes, DIMENSIONES_CLIENTE, [c for c in hechos_clientes.columns if c not in DIMENSIONES_CLIENTE])
+
+        # Dimensiones de cliente de cada pedido (primera fila de cada código en df)
+        unicos = ~df["codigo_cliente"].duplicated()
+        posicion = pd.Index(df["codigo_cliente"][unicos]).get_indexer(pedidos["codigo_cliente"])
+        dims_pedido = dimensiones[unicos.to_numpy()].reset_index(drop=True).reindex(posicion)
+        hechos_pedidos = dims_pedido.reset_index(drop=True).assign(
+            mes_pedido=texto_categorico(pedidos["mes_pedido"]),
+            producto=pd.Categorical(pedidos["producto"]),
+            cantidad=pedidos["cantidad"].to_numpy(),
+            monto=pedidos["monto"].to_numpy(),
+            lineas=1,
+        )
+        self.pedidos = Cubo(hechos_pedidos, DIMENSIONES_PEDIDO, ["cantidad", "monto", "lineas"], ROLLUPS_PEDIDOS)
+
+    @staticmethod
+    def filtros_cliente(vendedor=TODOS, segmento=TODOS, mes=TODOS):
+        """Filtros del sidebar traducidos a dimensiones del cubo"""
+        valores = {"vendedor": vendedor, "segmento": segmento, "mes": mes}
+        return {MotorFiltros.COLUMNAS[filtro]: valor for filtro, valor in valores.items()}
+
+    def indicadores(self, filtros=None, por=()):
+        """Clientes, filas, sumas y promedios de las métricas de cliente"""
+        por = list(por)
+        totales = self.clientes.consultar(filtros, por)
+        if not por:
+            totales = totales.to_frame().T
+        resultado = totales[por + ["clientes", "filas"]].copy()
+        for columna in COLUMNAS_PROMEDIO:
+            resultado[f"{columna}_suma"] = totales[f"suma_{columna}"]
+            resultado[f"{columna}_promedio"] = totales[f"suma_{columna}"] / totales[f"n_{columna}"].replace(0, np.nan)
+        return resultado if por else resultado.iloc[0]
+
+    def productos(self, filtros=None, por=("producto",)):
+        """Cantidad, monto y líneas por producto para los filtros dados"""
+        return self.pedidos.consultar(filtros, por)
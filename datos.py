@@ -0,0 +1,393 @@
+# ----------------------------------------------------------
+# CAPA DE DATOS: DESCARGA, LIMPIEZA Y AGREGADOS POR CLIENTE
+# ----------------------------------------------------------
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from esquema import concatenar, rellenar, tipar
+from instantanea import carpeta_instantanea, cargar_instantanea, guardar_instantanea
+from rfm import calcular_rfm, compras_anuales, segmentar
+from riesgo import ModeloRiesgo, firma_modelo, puntuar_clientes
+from series import SeriesVentas
+
+# Segundos entre comprobaciones automáticas de cambios en la exportación
+INTERVALO_REFRESCO = 10 * 60
+
+# Tablas de una versión de los datos, publicadas juntas tras cada refresco
+EstadoDatos = namedtuple("EstadoDatos", ["version", "pedidos", "entregas", "clientes", "agregados",
+                                         "conteo_meses", "entregas_count", "series"])
+
+
+# ----------------------------------------------------------
+# Limpieza de las hojas
+# ----------------------------------------------------------
+def preparar_pedidos(pedidos):
+    """Tipos y columnas derivadas de la hoja de pedidos"""
+    pedidos["fecha_pedido"] = pd.to_datetime(pedidos["fecha_pedido"])
+    pedidos["mes_pedido"] = pedidos["fecha_pedido"].dt.to_period('M')
+    pedidos["monto"] = pedidos["cantidad"] * pedidos["precio_unitario"]
+    return tipar(pedidos, "pedidos")
+
+
+def preparar_entregas(entregas):
+    """Tipos y columnas derivadas de la hoja de entregas"""
+    entregas["fecha_entrega"] = pd.to_datetime(entregas["fecha_entrega"])
+    entregas["mes_entrega"] = entregas["fecha_entrega"].dt.to_period('M')
+    return tipar(entregas, "entregas")
+
+
+def preparar_clientes(clientes):
+    """Limpieza de la hoja de clientes"""
+    clientes["direccion"] = clientes["direccion"].astype(str).str.replace('"', '').str.strip()
+    return tipar(clientes, "clientes")
+
+
+# ----------------------------------------------------------
+# Agregados aditivos (se pueden sumar al llegar filas nuevas)
+# ----------------------------------------------------------
+def agregar_pedidos(pedidos):
+    """Agregados por cliente y conteo por (cliente, mes) en una sola pasada.
+
+    Los códigos de cliente y de mes se factorizan una vez; sumas y conteos
+    salen de `np.bincount` y el conteo por (cliente, mes) de una clave
+    entera combinada, sin funciones Python por grupo.
+    """
+    cod_cliente, clientes = pd.factorize(pedidos["codigo_cliente"])
+    cod_mes, meses = pd.factorize(pedidos["mes_pedido"])
+    validos = cod_cliente >= 0
+    n = len(clientes)
+
+    monto = pedidos["monto"].to_numpy(dtype=float, na_value=np.nan)
+    monto_valido = ~np.isnan(monto)
+    fechas = pedidos["fecha_pedido"].to_numpy(dtype="datetime64[ns]").view("i8")
+    ultimo = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(ultimo, cod_cliente[validos], fechas[validos])
+
+    agregados = pd.DataFrame({
+        "ultimo_pedido": ultimo.view("datetime64[ns]"),
+        "monto_total": np.bincount(cod_cliente[validos], weights=np.where(monto_valido, monto, 0)[validos], minlength=n),
+        "n_montos": np.bincount(cod_cliente[validos & monto_valido], minlength=n),
+        "total_pedidos": np.bincount(cod_cliente[validos & pedidos["codigo_producto"].notna().to_numpy()], minlength=n),
+    }, index=pd.Index(clientes, name="codigo_cliente"))
+
+    # Conteo por (cliente, mes) con una clave entera combinada
+    validos &= cod_mes >= 0
+    clave = cod_cliente[validos].astype(np.int64) * max(len(meses), 1) + cod_mes[validos]
+    claves, conteos = np.unique(clave, return_counts=True)
+    indice = pd.MultiIndex(
+        levels=[clientes, meses],
+        codes=[claves // max(len(meses), 1), claves % max(len(meses), 1)],
+        names=["codigo_cliente", "mes_pedido"],
+    )
+    return agregados, pd.Series(conteos, index=indice)
+
+
+def contar_entregas(entregas):
+    """Cantidad de entregas por cliente"""
+    return entregas.groupby("codigo_cliente").size()
+
+
+def combinar_agregados(actual, delta):
+    """Suma los componentes de un delta a los agregados existentes"""
+    # Los códigos de cliente mezclan números y texto: no se ordena el índice
+    combinado = actual.reindex(actual.index.append(delta.index.difference(actual.index, sort=False)))
+    delta = delta.reindex(combinado.index)
+    for columna in ["monto_total", "n_montos", "total_pedidos"]:
+        combinado[columna] = combinado[columna].fillna(0) + delta[columna].fillna(0)
+    combinado["ultimo_pedido"] = pd.concat([combinado["ultimo_pedido"], delta["ultimo_pedido"]], axis=1).max(axis=1)
+    return combinado
+
+
+def sumar_conteos(actual, delta):
+    """Suma dos series de conteos alineadas por índice"""
+    niveles = list(range(actual.index.nlevels))
+    return pd.concat([actual, delta]).groupby(level=niveles, sort=False, observed=True).sum()
+
+
+def mes_mas_frecuente(conteo_meses):
+    """Mes con más líneas de pedido de cada cliente (empate: el más antiguo)"""
+    if conteo_meses.empty:
+        return pd.Series(dtype=object, name="mes_frecuente")
+    indice = conteo_meses.index
+    meses_ordenados = indice.levels[1].sort_values()
+    rango_mes = meses_ordenados.get_indexer(indice.levels[1])[indice.codes[1]]
+
+    # Agrupar por cliente y quedarse con el menor mes entre los de conteo máximo
+    orden = np.argsort(indice.codes[0], kind="stable")
+    cod_cliente = indice.codes[0][orden]
+    conteos = conteo_meses.to_numpy()[orden]
+    inicios = np.flatnonzero(np.r_[True, cod_cliente[1:] != cod_cliente[:-1]])
+    maximo = np.repeat(np.maximum.reduceat(conteos, inicios), np.diff(np.r_[inicios, len(conteos)]))
+    candidatos = np.where(conteos == maximo, rango_mes[orden], len(meses_ordenados))
+    mejor = np.minimum.reduceat(candidatos, inicios)
+    return pd.Series(
+        meses_ordenados.take(mejor),
+        index=indice.levels[0].take(cod_cliente[inicios]),
+        name="mes_frecuente",
+    )
+
+
+def huellas_filas(tabla):
+    """Hash por fila para detectar si el histórico ya cargado cambió"""
+    return pd.util.hash_pandas_object(tabla, index=False).to_numpy()
+
+
+# ----------------------------------------------------------
+# Construcción de la tabla de clientes del dashboard
+# ----------------------------------------------------------
+def construir_clientes(clientes, agregados, conteo_meses, entregas_count, hoy=None, serie_clientes=None):
+    """Une clientes con sus agregados y calcula las métricas derivadas.
+
+    Con `serie_clientes` (ventas diarias por cliente de `SeriesVentas`) el
+    segmento y el valor del cliente usan su cadencia real de compra y se
+    añaden las columnas RFM; sin ella se usan cortes fijos por días sin compra.
+    """
+    pedidos_agg = agregados.copy()
+    pedidos_agg["ticket_promedio"] = pedidos_agg["monto_total"] / pedidos_agg["n_montos"].replace(0, np.nan)
+    pedidos_agg["mes_frecuente"] = mes_mas_frecuente(conteo_meses)
+    pedidos_agg = pedidos_agg[['ultimo_pedido', 'mes_frecuente', 'monto_total', 'ticket_promedio', 'total_pedidos']]
+    pedidos_agg = pedidos_agg.rename_axis("codigo_cliente").reset_index()
+
+    # Unir datos
+    df = rellenar(pd.merge(clientes, pedidos_agg, on="codigo_cliente", how="left"))
+    df["zona"] = df["zona"].astype(str) if "zona" in df else "No especificada"
+
+    # Cálculo seguro de frecuencia de compra (días desde último pedido)
+    hoy = hoy if hoy is not None else pd.Timestamp.now().normalize()
+    df["frecuencia_compra"] = (hoy - pd.to_datetime(df["ultimo_pedido"])).dt.days.fillna(0).astype(int)
+
+    # Limitar frecuencia máxima a 365 días
+    df["frecuencia_compra"] = df["frecuencia_compra"].clip(upper=365)
+
+    # Calcular efectividad de entrega (pedidos vs entregas)
+    entregas_count = entregas_count.rename("entregas_count").rename_axis("codigo_cliente").reset_index()
+    df = rellenar(pd.merge(df, entregas_count, on="codigo_cliente", how="left"))
+    df["efectividad_entrega"] = (df["entregas_count"] / df["total_pedidos"].replace(0, 1)).clip(0, 1)
+
+    if serie_clientes is not None:
+        # Cadencia y RFM por cliente (ver rfm.py)
+        rfm = calcular_rfm(serie_clientes, hoy).rename_axis("codigo_cliente").reset_index()
+        df = pd.merge(df, rfm, on="codigo_cliente", how="left")
+        df = df.fillna({"compras": 0, "monto_rfm": 0, "r_score": 1, "f_score": 1, "m_score": 1, "rfm_score": 3})
+
+        # Segmentación según los días sin comprar frente a la cadencia de cada cliente
+        df["segmento"] = segmentar(df["recencia"], df["intervalo_compra"])
+
+        # Valor del cliente (proyección anual: ticket promedio × compras esperadas por año)
+        df["valor_cliente"] = (df["ticket_promedio"] * compras_anuales(df["intervalo_compra"], df["compras"])).round(2)
+        return tipar(df, "clientes")
+
+    # Segmentación automática
+    df["segmento"] = pd.cut(
+        df["frecuencia_compra"],
+        bins=[-1, 30, 90, float('inf')],
+        labels=["Activo", "Disminuido", "Inactivo"],
+        right=False
+    ).astype(str)
+
+    # Valor del cliente (proyección anual)
+    df["valor_cliente"] = (df["ticket_promedio"] * (365 / df["frecuencia_compra"].replace(0, 1))).round(2)
+    return tipar(df, "clientes")
+
+
+def formatear_fecha(fecha):
+    return fecha.strftime('%d/%m/%Y') if not pd.isna(fecha) else "N/A"
+
+
+# ----------------------------------------------------------
+# Almacén con refresco incremental
+# ----------------------------------------------------------
+class AlmacenDatos:
+    """Mantiene los datos cargados y los actualiza con deltas.
+
+    Las hojas se obtienen de una `FuenteDatos` (ver fuentes.py), que solo
+    las vuelve a leer cuando detecta cambios. Cuando las hojas de pedidos y
+    entregas solo crecieron por el final, se procesan únicamente las filas nuevas y se actualizan los
+    agregados por cliente; cualquier otro cambio provoca una recarga total.
+
+    Tras cada carga se guarda una instantánea columnar de las tablas ya
+    tipadas; en un arranque en frío se parte de ella y la fuente solo se
+    vuelve a leer cuando cambió.
+
+    Los atributos de las tablas solo los usa el refresco (bajo `_lock`); las
+    sesiones leen `estado`, que se reemplaza entero al terminar cada refresco.
+    """
+
+    def __init__(self, fuente, intervalo_refresco=INTERVALO_REFRESCO, carpeta=None):
+        self.fuente = fuente
+        self.carpeta = carpeta_instantanea(fuente.identificador, carpeta)
+        self.intervalo_refresco = intervalo_refresco
+        self.version = 0
+        self.ultima_comprobacion = 0.0
+        self.ultimo_modo = None
+        self._lock = threading.Lock()
+        self._huellas = {}
+        self.pedidos = None
+        self.entregas = None
+        self.clientes = None
+        self.estado = None
+        self.modelo_riesgo = None
+        self._firma_modelo = None
+
+    @property
+    def cargado(self):
+        return self.estado is not None
+
+    def refrescar_si_corresponde(self):
+        """Comprueba cambios si venció el intervalo de refresco"""
+        if self.cargado and time.time() - self.ultima_comprobacion < self.intervalo_refresco:
+            return False
+        return self.refrescar()
+
+    def refrescar(self, forzar=False):
+        """Lee la fuente si cambió y aplica el delta. Devuelve True si hubo cambios"""
+        # Si otra sesión ya está refrescando, se siguen usando los datos actuales
+        if not self._lock.acquire(blocking=not self.cargado):
+            return False
+        try:
+            if not self.cargado and not forzar and self._cargar_instantanea():
+                self._publicar()
+                return True
+            hojas = self.fuente.leer_si_cambio(forzar=forzar or not self.cargado)
+            self.ultima_comprobacion = time.time()
+            if hojas is None:
+                return False
+            pedidos, entregas, clientes = hojas
+            self._aplicar(pedidos, entregas, clientes, forzar)
+            self._publicar()
+            self._guardar_instantanea()
+            return True
+        finally:
+            self._lock.release()
+
+    def _publicar(self):
+        """Nueva versión: las tablas actuales pasan a `estado` de una sola vez"""
+        self.estado = EstadoDatos(self.version + 1, self.pedidos, self.entregas, self.clientes, self.agregados,
+                                  self.conteo_meses, self.entregas_count, self.series)
+        self.version = self.estado.version
+
+    def _aplicar(self, pedidos, entregas, clientes, forzar=False):
+        """Aplica las hojas descargadas como delta o como recarga total"""
+        self.clientes = preparar_clientes(clientes)
+
+        nuevos_pedidos = self._filas_nuevas("pedido", pedidos)
+        nuevas_entregas = self._filas_nuevas("entregado", entregas)
+
+        if forzar or nuevos_pedidos is None or nuevas_entregas is None:
+            self._recarga_total(pedidos, entregas)
+            return
+
+        self.ultimo_modo = "incremental"
+        if not nuevos_pedidos.empty:
+            self._registrar_huellas("pedido", nuevos_pedidos)
+            nuevos_pedidos = preparar_pedidos(nuevos_pedidos)
+            self.pedidos = concatenar(self.pedidos, nuevos_pedidos, "pedidos")
+            agregados, conteo_meses = agregar_pedidos(nuevos_pedidos)
+            self.agregados = combinar_agregados(self.agregados, agregados)
+            self.conteo_meses = sumar_conteos(self.conteo_meses, conteo_meses)
+            self.series = self.series.con_pedidos(nuevos_pedidos)
+        if not nuevas_entregas.empty:
+            self._registrar_huellas("entregado", nuevas_entregas)
+            nuevas_entregas = preparar_entregas(nuevas_entregas)
+            self.entregas = concatenar(self.entregas, nuevas_entregas, "entregas")
+            self.entregas_count = sumar_conteos(self.entregas_count, contar_entregas(nuevas_entregas))
+
+    def _filas_nuevas(self, nombre, hoja):
+        """Filas añadidas al final de la hoja; None si el histórico cambió"""
+        if nombre not in self._huellas:
+            return None
+        columnas, huellas = self._huellas[nombre]
+        if list(hoja.columns) != columnas or len(hoja) < len(huellas):
+            return None
+        if not np.array_equal(huellas_filas(hoja.iloc[:len(huellas)]), huellas):
+            return None
+        return hoja.iloc[len(huellas):].reset_index(drop=True)
+
+    def _registrar_huellas(self, nombre, filas, reiniciar=False):
+        huellas = huellas_filas(filas)
+        if not reiniciar:
+            huellas = np.concatenate([self._huellas[nombre][1], huellas])
+        self._huellas[nombre] = (list(filas.columns), huellas)
+
+    def _recarga_total(self, pedidos, entregas):
+        self.ultimo_modo = "total"
+        self._registrar_huellas("pedido", pedidos, reiniciar=True)
+        self._registrar_huellas("entregado", entregas, reiniciar=True)
+        self.pedidos = preparar_pedidos(pedidos)
+        self.entregas = preparar_entregas(entregas)
+        self._recalcular_agregados()
+
+    def _recalcular_agregados(self):
+        self.agregados, self.conteo_meses = agregar_pedidos(self.pedidos)
+        self.entregas_count = contar_entregas(self.entregas)
+        self.series = SeriesVentas(self.pedidos)
+
+    def _cargar_instantanea(self):
+        """Arranque en frío desde la instantánea local, sin leer el xlsx"""
+        instantanea = cargar_instantanea(self.carpeta)
+        if instantanea is None:
+            return False
+        tablas, self._huellas, metadatos = instantanea
+        self.pedidos = tipar(tablas["pedidos"], "pedidos")
+        self.entregas = tipar(tablas["entregas"], "entregas")
+        self.clientes = tipar(tablas["clientes"], "clientes")
+        self.fuente.testigo = metadatos.get("testigo")
+        self.ultima_comprobacion = metadatos.get("comprobado", 0.0)
+        self.ultimo_modo = "instantanea"
+        self._recalcular_agregados()
+        return True
+
+    def _guardar_instantanea(self):
+        tablas = {"pedidos": self.pedidos, "entregas": self.entregas, "clientes": self.clientes}
+        metadatos = {
+            "testigo": self.fuente.testigo,
+            "comprobado": self.ultima_comprobacion,
+        }
+        try:
+            guardar_instantanea(self.carpeta, tablas, self._huellas, metadatos)
+        except (OSError, TypeError):
+            # Sin disco escribible (o con una columna mixta de un tipo no admitido) el
+            # dashboard sigue funcionando, solo sin arranque rápido
+            pass
+
+    def _puntuar_riesgo(self, df, estado):
+        """Riesgo de abandono de todos los clientes en un solo lote (NaN si no hay modelo).
+
+        El modelo se entrena fuera del dashboard (`python riesgo.py`); aquí
+        solo se carga, y se vuelve a leer únicamente si el archivo cambió
+        (también cuando no existe: la falta de modelo queda recordada).
+        """
+        firma = firma_modelo()
+        if firma != self._firma_modelo:
+            self._firma_modelo = firma
+            self.modelo_riesgo = ModeloRiesgo.cargar() if firma is not None else None
+        if self.modelo_riesgo is None:
+            return np.nan
+        return puntuar_clientes(self.modelo_riesgo, df, estado.series.clientes, estado.series.fecha_max).astype(np.float32)
+
+    def resultados(self):
+        """Tablas del dashboard en el mismo formato que load_data_from_drive.
+
+        Se calculan de un único `estado`, así un refresco simultáneo en otra
+        sesión no mezcla tablas de dos versiones. Al final van la versión y
+        las series de ese mismo `estado`: las cachés por versión deben usar
+        estas y no `self.version`, que puede haber avanzado.
+        """
+        estado = self.estado
+        pedidos, entregas = estado.pedidos, estado.entregas
+        df = construir_clientes(estado.clientes, estado.agregados, estado.conteo_meses, estado.entregas_count,
+                                serie_clientes=estado.series.clientes)
+        df["riesgo_abandono"] = self._puntuar_riesgo(df, estado)
+
+        # Fechas extremas para el pie de página
+        fecha_min_pedidos = formatear_fecha(pedidos["fecha_pedido"].min()) if not pedidos.empty else "N/A"
+        fecha_max_pedidos = formatear_fecha(pedidos["fecha_pedido"].max()) if not pedidos.empty else "N/A"
+        fecha_min_entregas = formatear_fecha(entregas["fecha_entrega"].min()) if not entregas.empty else "N/A"
+        fecha_max_entregas = formatear_fecha(entregas["fecha_entrega"].max()) if not entregas.empty else "N/A"
+
+        return (df, pedidos, entregas, fecha_min_pedidos, fecha_max_pedidos, fecha_min_entregas, fecha_max_entregas,
+                estado.version, estado.series)
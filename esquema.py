@@ -0,0 +1,117 @@
+# ----------------------------------------------------------
+# ESQUEMA DE TIPOS: CATEGÓRICAS, NUMÉRICOS REDUCIDOS Y TEXTO ARROW
+# ----------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+# Tipos lógicos:
+# - "categoria": pocos valores distintos (zona, producto...), códigos enteros + diccionario
+# - "texto": texto libre en cadenas Arrow (sin un objeto Python por celda)
+# - "entero": entero del menor ancho posible (si no hay nulos)
+# - "real32": coordenadas y otros reales donde 7 dígitos bastan
+# Los montos y precios se mantienen en float64: las sumas en float32 cambiarían los totales.
+# `codigo_cliente` se deja como está porque mezcla códigos numéricos y de texto.
+ESQUEMA = {
+    "pedidos": {
+        "producto": "categoria",
+        "codigo_producto": "entero",
+        "cantidad": "entero",
+    },
+    "entregas": {
+        "producto": "categoria",
+        "codigo_producto": "entero",
+        "cantidad": "entero",
+    },
+    "clientes": {
+        "nombre": "texto",
+        "telefono": "texto",
+        "direccion": "texto",
+        "zona": "categoria",
+        "tipo_negocio": "categoria",
+        "quien_atiende": "categoria",
+        "segmento": "categoria",
+        "lat": "real32",
+        "lon": "real32",
+        "total_pedidos": "entero",
+        "entregas_count": "entero",
+        "frecuencia_compra": "entero",
+        "compras": "entero",
+        "r_score": "entero",
+        "f_score": "entero",
+        "m_score": "entero",
+        "rfm_score": "entero",
+        "riesgo_abandono": "real32",
+    },
+}
+
+TIPO_TEXTO = pd.StringDtype("pyarrow")
+
+
+def _convertir(serie, tipo):
+    if tipo == "categoria":
+        return serie if isinstance(serie.dtype, pd.CategoricalDtype) else serie.astype("category")
+    if tipo == "texto":
+        if serie.dtype == TIPO_TEXTO:
+            return serie
+        # Los nulos se guardan como texto vacío para que fillna/concatenaciones sigan funcionando igual
+        return serie.astype(object).where(serie.notna(), "").astype(str).astype(TIPO_TEXTO)
+    if tipo == "entero":
+        if not pd.api.types.is_numeric_dtype(serie) or serie.isna().any():
+            return serie
+        valores = serie.to_numpy()
+        if not np.array_equal(valores, np.round(valores)):
+            return serie
+        return pd.to_numeric(serie, downcast="integer")
+    if tipo == "real32":
+        return serie.astype(np.float32) if pd.api.types.is_float_dtype(serie) else serie
+    raise ValueError(f"Tipo de esquema desconocido: {tipo}")
+
+
+def tipar(tabla, nombre):
+    """Aplica el esquema de `nombre` a las columnas presentes de la tabla (en el sitio)"""
+    for columna, tipo in ESQUEMA[nombre].items():
+        if columna in tabla:
+            tabla[columna] = _convertir(tabla[columna], tipo)
+    return tabla
+
+
+def rellenar(tabla, valor=0):
+    """`fillna(valor)` que también admite columnas categóricas (añade la categoría si falta)"""
+    con_nulos = tabla.columns[tabla.isna().any().to_numpy()]
+    for columna in con_nulos:
+        serie = tabla[columna]
+        if isinstance(serie.dtype, pd.CategoricalDtype) and valor not in serie.cat.categories:
+            tabla[columna] = serie.cat.add_categories([valor])
+    return tabla.fillna({columna: valor for columna in con_nulos})
+
+
+def concatenar(actual, nuevas, nombre):
+    """Concatena filas nuevas conservando las columnas categóricas del esquema.
+
+    `pd.concat` de categóricas con categorías distintas devuelve `object`;
+    aquí se unen antes las categorías de ambas partes.
+    """
+    # Copia superficial: la tabla actual puede estar compartida con sesiones en curso
+    actual = actual.copy(deep=False)
+    nuevas = tipar(nuevas, nombre)
+    for columna, tipo in ESQUEMA[nombre].items():
+        if tipo != "categoria" or columna not in actual or columna not in nuevas:
+            continue
+        categorias = actual[columna].cat.categories.union(nuevas[columna].cat.categories, sort=False)
+        actual[columna] = actual[columna].cat.set_categories(categorias)
+        nuevas[columna] = nuevas[columna].cat.set_categories(categorias)
+    return tipar(pd.concat([actual, nuevas], ignore_index=True), nombre)
+
+
+def reporte_memoria(tablas):
+    """Filas, columnas y MB (incluyendo el contenido de los objetos) de cada tabla"""
+    return pd.DataFrame([
+        {
+            "tabla": nombre,
+            "filas": len(tabla),
+            "columnas": tabla.shape[1],
+            "memoria_mb": round(tabla.memory_usage(deep=True).sum() / 1024 ** 2, 2),
+        }
+        for nombre, tabla in tablas.items()
+        if tabla is not None
+    ])
@@ -0,0 +1,130 @@
+# ----------------------------------------------------------
+# EXPORTACIÓN POR BLOQUES: CSV, PARQUET Y EXCEL
+# ----------------------------------------------------------
+import numbers
+import os
+import tempfile
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+# Formato -> (extensión, tipo MIME)
+FORMATOS = {
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Filas convertidas y escritas por bloque
+TAMANO_BLOQUE = 50_000
+# Bytes que el archivo temporal guarda en memoria antes de pasar a disco
+MEMORIA_TEMPORAL = 32 * 1024 * 1024
+# Filas de datos por hoja de Excel (el límite es 1.048.576 con el encabezado)
+FILAS_POR_HOJA = 1_048_575
+
+
+def formato_por_extension(ruta):
+    """Formato de exportación según la extensión del archivo (CSV por defecto)"""
+    extension = os.path.splitext(ruta)[1].lower()
+    return next((formato for formato, (ext, _) in FORMATOS.items() if ext == extension), "CSV")
+
+
+def nombre_archivo(base, formato, fecha=None):
+    """`base_AAAAMMDD.ext` para el botón de descarga"""
+    return f"{base}_{(fecha or datetime.now()).strftime('%Y%m%d')}{FORMATOS[formato][0]}"
+
+
+def _bloques(tabla, tamano_bloque):
+    for inicio in range(0, len(tabla), tamano_bloque):
+        yield tabla.iloc[inicio:inicio + tamano_bloque]
+
+
+def _valores_excel(bloque):
+    """Valores nativos de Python, nulos como celdas vacías y lo que Excel no admite
+    (periodos, mezclas en columnas de objetos) como texto"""
+    valores = bloque.astype(object).where(bloque.notna(), None)
+    for columna in bloque.columns[[not (pd.api.types.is_numeric_dtype(t) or pd.api.types.is_datetime64_any_dtype(t)) for t in bloque.dtypes]]:
+        valores[columna] = [
+            v if v is None or isinstance(v, (str, numbers.Number, date)) else str(v) for v in valores[columna]
+        ]
+    return valores
+
+
+def _texto(bloque, columnas):
+    """Columnas de objetos como texto (códigos numéricos y de texto mezclados), conservando los nulos"""
+    if not columnas:
+        return bloque
+    return bloque.assign(**{c: bloque[c].where(bloque[c].isna(), bloque[c].astype(str)) for c in columnas})
+
+
+# ----------------------------------------------------------
+# Escritores por formato (destino: archivo binario abierto)
+# ----------------------------------------------------------
+def escribir_csv(tabla, destino, tamano_bloque=TAMANO_BLOQUE):
+    destino.write(tabla.iloc[:0].to_csv(index=False).encode("utf-8"))
+    for bloque in _bloques(tabla, tamano_bloque):
+        destino.write(bloque.to_csv(index=False, header=False).encode("utf-8"))
+
+
+def escribir_parquet(tabla, destino, tamano_bloque=TAMANO_BLOQUE):
+    """Un grupo de filas por bloque, con el esquema fijado por el primer bloque"""
+    objetos = list(tabla.columns[tabla.dtypes == object])
+    esquema = pa.Schema.from_pandas(_texto(tabla.iloc[:tamano_bloque], objetos), preserve_index=False)
+    for columna in objetos:
+        esquema = esquema.set(esquema.get_field_index(columna), pa.field(columna, pa.string()))
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for bloque in _bloques(tabla, tamano_bloque):
+            escritor.write_table(pa.Table.from_pandas(_texto(bloque, objetos), schema=esquema, preserve_index=False))
+        if tabla.empty:
+            escritor.write_table(esquema.empty_table())
+
+
+def escribir_excel(tabla, destino, tamano_bloque=TAMANO_BLOQUE, hoja="datos"):
+    """Libro en modo de solo escritura (las filas no se guardan en memoria); más filas de las que
+    caben en una hoja continúan en `hoja_2`, `hoja_3`..."""
+    libro = Workbook(write_only=True)
+    encabezado = [str(columna) for columna in tabla.columns]
+    pagina, filas_hoja = libro.create_sheet(hoja), 0
+    pagina.append(encabezado)
+    for bloque in _bloques(tabla, tamano_bloque):
+        for fila in _valores_excel(bloque).itertuples(index=False, name=None):
+            if filas_hoja == FILAS_POR_HOJA:
+                pagina, filas_hoja = libro.create_sheet(f"{hoja}_{len(libro.worksheets) + 1}"), 0
+                pagina.append(encabezado)
+            pagina.append(fila)
+            filas_hoja += 1
+    libro.save(destino)
+
+
+ESCRITORES = {"CSV": escribir_csv, "Parquet": escribir_parquet, "Excel": escribir_excel}
+
+
+def exportar(tabla, destino, formato=None, tamano_bloque=TAMANO_BLOQUE, titulos=None):
+    """Escribe la tabla por bloques en `destino` (ruta o archivo binario).
+
+    Sin `formato` se deduce de la extensión de la ruta. `titulos` renombra
+    columnas ({columna: título}); el resto se exporta con su nombre.
+    """
+    if titulos:
+        tabla = tabla.rename(columns=titulos)
+    if isinstance(destino, (str, os.PathLike)):
+        formato = formato or formato_por_extension(os.fspath(destino))
+        with open(destino, "wb") as archivo:
+            ESCRITORES[formato](tabla, archivo, tamano_bloque)
+    else:
+        ESCRITORES[formato or "CSV"](tabla, destino, tamano_bloque)
+
+
+def contenido_exportacion(tabla, formato, tamano_bloque=TAMANO_BLOQUE, titulos=None):
+    """Bytes del archivo exportado (p. ej. para `st.download_button`).
+
+    Se escribe por bloques en un temporal que pasa a disco al superar
+    MEMORIA_TEMPORAL, así que solo el resultado final queda en memoria.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=MEMORIA_TEMPORAL) as archivo:
+        exportar(tabla, archivo, formato, tamano_bloque, titulos)
+        archivo.seek(0)
+        return archivo.read()
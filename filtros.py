@@ -0,0 +1,85 @@
+# ----------------------------------------------------------
+# MOTOR DE FILTROS: ÍNDICES POR ZONA, SEGMENTO Y MES
+# ----------------------------------------------------------
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+TODOS = "Todos"
+
+# Combinaciones (vendedor, segmento, mes) que se mantienen en memoria
+MAX_SELECCIONES = 256
+
+
+class MotorFiltros:
+    """Índices de los filtros del sidebar, construidos una vez por carga.
+
+    Para cada columna filtrable (zona, segmento, mes más frecuente) se
+    guarda un bitmap por valor. Una combinación de filtros se resuelve con
+    un AND de bitmaps y se memoriza (LRU) como un array de posiciones de
+    fila, de modo que las sesiones no vuelven a recorrer la tabla ni copian
+    el DataFrame base. El motor no guarda el DataFrame: las posiciones se
+    aplican sobre la copia de cada sesión con `filtrar`.
+    """
+
+    COLUMNAS = {"vendedor": "zona", "segmento": "segmento", "mes": "mes_frecuente"}
+
+    def __init__(self, df, pedidos, max_selecciones=MAX_SELECCIONES):
+        self.n_filas = len(df)
+        self.bitmaps = {}
+        self.opciones = {}
+        for filtro, columna in self.COLUMNAS.items():
+            codigos, valores = pd.factorize(df[columna].astype(str))
+            self.bitmaps[filtro] = {valor: codigos == i for i, valor in enumerate(valores)}
+            self.opciones[filtro] = sorted(valores.tolist(), key=str)
+
+        # Meses con actividad según los pedidos (opciones del filtro de mes)
+        self.opciones["mes"] = sorted(pedidos["mes_pedido"].astype(str).unique().tolist()) if not pedidos.empty else []
+
+        # Filas de pedidos agrupadas por cliente (sustituye a pedidos[...].isin(...))
+        cod_pedidos, clientes_pedidos = pd.factorize(pedidos["codigo_cliente"]) if not pedidos.empty else (np.array([], dtype=np.intp), pd.Index([]))
+        self._orden_pedidos = np.argsort(cod_pedidos, kind="stable")
+        limites = np.searchsorted(cod_pedidos[self._orden_pedidos], np.arange(len(clientes_pedidos) + 1))
+        cliente_pedidos = clientes_pedidos.get_indexer(df["codigo_cliente"])
+        self._inicio = np.where(cliente_pedidos >= 0, limites[cliente_pedidos], 0)
+        self._fin = np.where(cliente_pedidos >= 0, limites[np.minimum(cliente_pedidos + 1, len(clientes_pedidos))], 0)
+
+        self.seleccion = lru_cache(maxsize=max_selecciones)(self._seleccion)
+
+    def _seleccion(self, vendedor=TODOS, segmento=TODOS, mes=TODOS):
+        """Posiciones de fila que cumplen los filtros (None si no se filtra nada)"""
+        mascara = None
+        for filtro, valor in (("vendedor", vendedor), ("segmento", segmento), ("mes", mes)):
+            if valor == TODOS:
+                continue
+            bitmap = self.bitmaps[filtro].get(valor)
+            if bitmap is None:
+                return np.array([], dtype=np.intp)
+            mascara = bitmap if mascara is None else mascara & bitmap
+        if mascara is None:
+            return None
+        posiciones = np.flatnonzero(mascara)
+        posiciones.setflags(write=False)
+        return posiciones
+
+    def filtrar(self, df, vendedor=TODOS, segmento=TODOS, mes=TODOS):
+        """Vista filtrada de `df`; sin filtros devuelve el mismo DataFrame"""
+        posiciones = self.seleccion(vendedor, segmento, mes)
+        return df if posiciones is None else df.iloc[posiciones]
+
+    def posiciones_pedidos(self, posiciones_clientes=None):
+        """Filas de `pedidos` de los clientes en esas posiciones de `df` (todos si es None)"""
+        if posiciones_clientes is None:
+            posiciones_clientes = slice(None)
+        inicio, fin = self._inicio[posiciones_clientes], self._fin[posiciones_clientes]
+        largos = fin - inicio
+        if largos.sum() == 0:
+            return np.array([], dtype=np.intp)
+        # Concatenar los rangos [inicio, fin) sin bucles Python
+        desplazamiento = np.repeat(inicio - np.cumsum(np.r_[0, largos[:-1]]), largos)
+        return np.unique(self._orden_pedidos[np.arange(largos.sum()) + desplazamiento])
+
+    def pedidos_de(self, pedidos, posiciones_clientes=None):
+        """Pedidos de los clientes seleccionados, equivalente a `isin(df_filtrado['codigo_cliente'])`"""
+        return pedidos.iloc[self.posiciones_pedidos(posiciones_clientes)]
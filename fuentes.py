@@ -0,0 +1,282 @@
+# ----------------------------------------------------------
+# FUENTES DE DATOS: GOOGLE SHEETS, ARCHIVOS LOCALES Y BASES SQL
+# ----------------------------------------------------------
+import glob
+import hashlib
+import os
+import sqlite3
+from io import BytesIO
+
+import pandas as pd
+import requests
+
+URL_EXPORTACION = "https://docs.google.com/spreadsheets/d/{file_id}/export?format=xlsx"
+
+# ID del archivo en Google Drive (extraído de la URL compartida)
+# URL proporcionada: https://docs.google.com/spreadsheets/d/1MLgtcblazoKbx0ZwiPljCQxix5bTuKBn/edit?usp=sharing&ouid=117295945155119200843&rtpof=true&sd=true
+FILE_ID = "1MLgtcblazoKbx0ZwiPljCQxix5bTuKBn"
+
+# Nombre de cada hoja/tabla en la fuente
+HOJAS = ("pedido", "entregado", "clientes")
+
+
+class FuenteDatos:
+    """Interfaz común de las fuentes de datos.
+
+    Cada fuente entrega las hojas crudas `pedido`, `entregado` y `clientes`
+    y mantiene un `testigo` (ETag, fecha de modificación, hash...) para saber
+    si hubo cambios desde la última lectura. El testigo se guarda junto a la
+    instantánea local para poder comprobar cambios tras un reinicio.
+    """
+
+    tipo = None
+
+    def __init__(self, ubicacion):
+        self.ubicacion = ubicacion
+        self.testigo = None
+
+    @property
+    def identificador(self):
+        """Nombre estable para la carpeta de la instantánea"""
+        resumen = hashlib.sha1(f"{self.tipo}:{self.ubicacion}".encode("utf-8")).hexdigest()[:12]
+        return f"{self.tipo}-{resumen}"
+
+    def leer_si_cambio(self, forzar=False):
+        """Devuelve (pedidos, entregas, clientes) o None si la fuente no cambió"""
+        testigo = self._testigo_actual()
+        if not forzar and testigo is not None and testigo == self.testigo:
+            return None
+        hojas = self._leer()
+        self.testigo = testigo if testigo is not None else self._testigo_actual()
+        return hojas
+
+    def _testigo_actual(self):
+        raise NotImplementedError
+
+    def _leer(self):
+        raise NotImplementedError
+
+
+class FuenteGoogleSheets(FuenteDatos):
+    """Exportación xlsx de una hoja de Google Sheets.
+
+    Usa una petición condicional (ETag / Last-Modified) y, si el servidor
+    no las soporta, compara un hash del contenido descargado.
+    """
+
+    tipo = "sheets"
+
+    @property
+    def identificador(self):
+        return self.ubicacion
+
+    def leer_si_cambio(self, forzar=False):
+        testigo = self.testigo or {}
+        cabeceras = {}
+        if not forzar:
+            if testigo.get("etag"):
+                cabeceras["If-None-Match"] = testigo["etag"]
+            if testigo.get("last_modified"):
+                cabeceras["If-Modified-Since"] = testigo["last_modified"]
+        response = requests.get(URL_EXPORTACION.format(file_id=self.ubicacion), headers=cabeceras)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+
+        hash_contenido = hashlib.sha256(response.content).hexdigest()
+        cambio = forzar or hash_contenido != testigo.get("hash")
+        self.testigo = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "hash": hash_contenido,
+        }
+        if not cambio:
+            return None
+        return leer_libro(BytesIO(response.content))
+
+
+class FuenteExcel(FuenteDatos):
+    """Archivo xlsx local con las tres hojas"""
+
+    tipo = "excel"
+
+    def _testigo_actual(self):
+        estado = os.stat(self.ubicacion)
+        return [estado.st_mtime_ns, estado.st_size]
+
+    def _leer(self):
+        return leer_libro(self.ubicacion)
+
+
+class FuenteDirectorio(FuenteDatos):
+    """Directorio con una tabla por hoja en CSV o Parquet.
+
+    Cada hoja puede ser un archivo (`pedido.parquet`, `pedido.csv`) o una
+    carpeta con particiones (`pedido/*.parquet`, `pedido/*.csv`); las
+    particiones se leen en orden alfabético para que las filas nuevas
+    queden al final.
+    """
+
+    tipo = "directorio"
+
+    def _archivos(self, hoja):
+        base = os.path.join(self.ubicacion, hoja)
+        if os.path.isdir(base):
+            archivos = sorted(glob.glob(os.path.join(base, "*.parquet")) + glob.glob(os.path.join(base, "*.csv")))
+        else:
+            archivos = [f"{base}{ext}" for ext in (".parquet", ".csv") if os.path.exists(f"{base}{ext}")][:1]
+        if not archivos:
+            raise FileNotFoundError(f"No se encontró la hoja '{hoja}' en {self.ubicacion}")
+        return archivos
+
+    def _testigo_actual(self):
+        testigo = []
+        for hoja in HOJAS:
+            for archivo in self._archivos(hoja):
+                estado = os.stat(archivo)
+                testigo.append([os.path.relpath(archivo, self.ubicacion), estado.st_mtime_ns, estado.st_size])
+        return testigo
+
+    def _leer(self):
+        hojas = []
+        for hoja in HOJAS:
+            partes = [
+                pd.read_parquet(archivo) if archivo.endswith(".parquet") else pd.read_csv(archivo)
+                for archivo in self._archivos(hoja)
+            ]
+            hojas.append(pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0])
+        return tuple(hojas)
+
+
+class HuellaFilas:
+    """Agregado de SQLite: suma (módulo 2**64) de un hash de cada fila, sin depender del orden.
+
+    SQLite no trae una función de hash: este agregado en Python es el
+    recurso cuando no hay otra marca de cambios (ver `FuenteSQL`).
+    """
+
+    def __init__(self):
+        self.total = 0
+
+    def step(self, *valores):
+        huella = hashlib.blake2b(repr(valores).encode("utf-8"), digest_size=8).digest()
+        self.total = (self.total + int.from_bytes(huella, "little")) % 2 ** 64
+
+    def finalize(self):
+        # Como texto: los enteros de SQLite tienen signo y 64 bits
+        return str(self.total)
+
+
+def _columna_sql(nombre):
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+class FuenteSQL(FuenteDatos):
+    """Base de datos embebida (SQLite o DuckDB), p. ej. una réplica local.
+
+    Por defecto lee las tablas `pedido`, `entregado` y `clientes`; con
+    `consultas` se puede indicar una consulta SQL propia por hoja. El
+    testigo sale de esas mismas consultas: número de filas y una suma de
+    control del contenido, así las correcciones en el sitio (precio,
+    cantidad, zona reasignada) también cuentan como cambio. La suma de
+    control recorre las filas; si una tabla tiene una columna de
+    actualización (`columnas_actualizacion`, p. ej. {"pedido": "updated_at"})
+    se usa su máximo en su lugar, que con un índice no recorre la tabla.
+
+    DuckDB calcula la suma de control con su `hash` nativo. En SQLite, que no
+    tiene hash, antes se consulta `PRAGMA data_version` en una conexión que
+    queda abierta: solo cambia cuando otra conexión confirma escrituras, así
+    que mientras no cambie (ni se reemplace el archivo) el último testigo
+    sigue valiendo y las filas no se recorren.
+    """
+
+    def __init__(self, ubicacion, motor="sqlite", consultas=None, columnas_actualizacion=None):
+        super().__init__(ubicacion)
+        self.tipo = motor
+        self.consultas = {hoja: f"SELECT * FROM {hoja}" for hoja in HOJAS}
+        self.consultas.update(consultas or {})
+        self.columnas_actualizacion = dict(columnas_actualizacion or {})
+        self._vigia = None
+        self._ultima_marca = None
+
+    def _conectar(self):
+        if self.tipo == "duckdb":
+            try:
+                import duckdb
+            except ImportError as e:
+                raise ImportError("La fuente 'duckdb' requiere instalar el paquete duckdb") from e
+            return duckdb.connect(self.ubicacion, read_only=True)
+        conexion = sqlite3.connect(f"file:{self.ubicacion}?mode=ro", uri=True)
+        conexion.create_aggregate("huella_filas", -1, HuellaFilas)
+        return conexion
+
+    def _consulta_testigo(self, conexion, hoja):
+        """Filas y suma de control (o máximo de la columna de actualización) de la consulta de una hoja"""
+        consulta = self.consultas[hoja]
+        if hoja in self.columnas_actualizacion:
+            return f"SELECT COUNT(*), MAX({_columna_sql(self.columnas_actualizacion[hoja])}) FROM ({consulta}) AS hoja"
+        columnas = ", ".join(_columna_sql(d[0]) for d in conexion.execute(f"SELECT * FROM ({consulta}) AS hoja LIMIT 0").description)
+        if self.tipo == "duckdb":
+            return f"SELECT COUNT(*), SUM(hash(row({columnas}))) FROM ({consulta}) AS hoja"
+        return f"SELECT COUNT(*), huella_filas({columnas}) FROM ({consulta}) AS hoja"
+
+    def _marca_cambios(self):
+        """Archivo (dispositivo e inodo) y `PRAGMA data_version` de SQLite, sin leer ninguna tabla"""
+        estado = os.stat(self.ubicacion)
+        archivo = (estado.st_dev, estado.st_ino)
+        if self._vigia is None or self._vigia[0] != archivo:
+            # Archivo nuevo (p. ej. una réplica copiada encima): otra conexión
+            if self._vigia is not None:
+                self._vigia[1].close()
+            self._vigia = (archivo, sqlite3.connect(f"file:{self.ubicacion}?mode=ro", uri=True, check_same_thread=False))
+        return archivo, self._vigia[1].execute("PRAGMA data_version").fetchone()[0]
+
+    def _testigo_actual(self):
+        marca = self._marca_cambios() if self.tipo == "sqlite" else None
+        if marca is not None and self._ultima_marca is not None and self._ultima_marca[0] == marca:
+            return self._ultima_marca[1]
+        conexion = self._conectar()
+        try:
+            testigo = [[str(valor) for valor in conexion.execute(self._consulta_testigo(conexion, hoja)).fetchone()]
+                       for hoja in HOJAS]
+        finally:
+            conexion.close()
+        if marca is not None:
+            self._ultima_marca = (marca, testigo)
+        return testigo
+
+    def _leer(self):
+        conexion = self._conectar()
+        try:
+            if self.tipo == "duckdb":
+                return tuple(conexion.execute(self.consultas[hoja]).df() for hoja in HOJAS)
+            return tuple(pd.read_sql_query(self.consultas[hoja], conexion) for hoja in HOJAS)
+        finally:
+            conexion.close()
+
+
+def leer_libro(origen):
+    """Lee las tres hojas de un libro xlsx"""
+    hojas = pd.read_excel(origen, sheet_name=list(HOJAS))
+    return tuple(hojas[hoja] for hoja in HOJAS)
+
+
+FUENTES = {
+    "sheets": FuenteGoogleSheets,
+    "excel": FuenteExcel,
+    "directorio": FuenteDirectorio,
+    "sqlite": lambda ubicacion: FuenteSQL(ubicacion, motor="sqlite"),
+    "duckdb": lambda ubicacion: FuenteSQL(ubicacion, motor="duckdb"),
+}
+
+
+def configuracion_fuente():
+    """Fuente elegida por entorno: CRM_FUENTE (sheets por defecto) y CRM_RUTA"""
+    return os.environ.get("CRM_FUENTE", "sheets"), os.environ.get("CRM_RUTA", FILE_ID)
+
+
+def crear_fuente(tipo, ubicacion):
+    """Crea la fuente indicada en la configuración"""
+    if tipo not in FUENTES:
+        raise ValueError(f"Fuente de datos desconocida: {tipo}. Opciones: {', '.join(FUENTES)}")
+    return FUENTES[tipo](ubicacion)
@@ -0,0 +1,226 @@
+# ----------------------------------------------------------
+# MAPA DE VENTAS: COORDENADAS, GEOCODIFICACIÓN OFFLINE Y CELDAS POR NIVEL DE ZOOM
+# ----------------------------------------------------------
+# Geocodificación por lotes (fuera del dashboard): python geo.py
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+from busqueda import normalizar_textos
+from cubo import DIMENSIONES_CLIENTE, Cubo
+from instantanea import CARPETA_INSTANTANEA
+
+# Caché local dirección -> coordenadas (la llena `python geo.py`; el dashboard solo la lee)
+RUTA_GEOCODIFICACION = os.environ.get("CRM_GEOCODIFICACION", os.path.join(CARPETA_INSTANTANEA, "geocodificacion.json"))
+URL_GEOCODIFICADOR = os.environ.get("CRM_GEOCODIFICADOR_URL", "https://nominatim.openstreetmap.org/search")
+SUFIJO_PAIS = "República Dominicana"
+AGENTE = "crm-dashboard-geocodificacion"
+
+# Nivel de detalle -> (zoom inicial del mapa, lado de la celda en grados, radio de la mancha)
+NIVELES = {
+    "País": (6, 0.25, 30),
+    "Región": (8, 0.05, 25),
+    "Ciudad": (10, 0.01, 20),
+    "Barrio": (12, 0.002, 15),
+}
+NIVEL_POR_DEFECTO = "Región"
+
+CENTRO_POR_DEFECTO = (18.5, -69.9)  # RD centro
+
+# Celdas enviadas al navegador como máximo (las de mayor monto)
+MAXIMO_CELDAS = 5000
+
+# Origen de las coordenadas de cada cliente
+ORIGENES = ["hoja", "geocodificada", "zona", "sin ubicación"]
+
+_DESPLAZAMIENTO_CELDA = 2 ** 20
+
+
+# ----------------------------------------------------------
+# Caché de geocodificación
+# ----------------------------------------------------------
+class CacheGeocodificacion:
+    """Coordenadas por dirección normalizada, guardadas en un JSON local.
+
+    Las direcciones que el geocodificador no encontró se guardan como
+    `null` para no volver a consultarlas en cada lote.
+    """
+
+    def __init__(self, ruta=RUTA_GEOCODIFICACION):
+        self.ruta = ruta
+        try:
+            with open(ruta, encoding="utf-8") as archivo:
+                self.entradas = json.load(archivo)
+        except (OSError, ValueError):
+            self.entradas = {}
+
+    def coordenadas(self, direcciones):
+        """Arrays (lat, lon) de las direcciones (NaN si no están en la caché)"""
+        claves = normalizar_textos(direcciones)
+        unicas, inversa = np.unique(claves.astype(str), return_inverse=True)
+        encontradas = np.array([self.entradas.get(clave) or (np.nan, np.nan) for clave in unicas], dtype=float).reshape(-1, 2)
+        return encontradas[inversa, 0], encontradas[inversa, 1]
+
+    def pendientes(self, direcciones):
+        """Direcciones normalizadas distintas que aún no se consultaron"""
+        return [clave for clave in dict.fromkeys(normalizar_textos(direcciones)) if clave and clave not in self.entradas]
+
+    def guardar(self):
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        with open(self.ruta + ".tmp", "w", encoding="utf-8") as archivo:
+            json.dump(self.entradas, archivo, ensure_ascii=False)
+        os.replace(self.ruta + ".tmp", self.ruta)
+
+
+def geocodificar(direccion, sesion, url=URL_GEOCODIFICADOR):
+    """(lat, lon) de una dirección con el geocodificador configurado, o None"""
+    respuesta = sesion.get(
+        url,
+        params={"q": f"{direccion}, {SUFIJO_PAIS}", "format": "json", "limit": 1},
+        headers={"User-Agent": AGENTE},
+        timeout=30,
+    )
+    respuesta.raise_for_status()
+    resultados = respuesta.json()
+    return (float(resultados[0]["lat"]), float(resultados[0]["lon"])) if resultados else None
+
+
+# ----------------------------------------------------------
+# Coordenadas de los clientes
+# ----------------------------------------------------------
+def coordenadas_clientes(df, cache=None):
+    """Latitud, longitud y origen de cada cliente.
+
+    Orden de preferencia: coordenadas de la hoja, caché de geocodificación
+    por dirección y centroide de la zona del cliente. Los clientes sin
+    ninguna de ellas quedan fuera del mapa en lugar de apilarse en un punto.
+    """
+    n = len(df)
+    # Copias: `to_numpy` puede devolver la memoria de la tabla compartida, que no se debe modificar
+    lat = df["lat"].to_numpy(dtype=float, na_value=np.nan, copy=True) if "lat" in df else np.full(n, np.nan)
+    lon = df["lon"].to_numpy(dtype=float, na_value=np.nan, copy=True) if "lon" in df else np.full(n, np.nan)
+    # La tabla de clientes rellena los nulos con 0: (0, 0) también es "sin coordenadas"
+    origen = np.where(np.isnan(lat) | np.isnan(lon) | ((lat == 0) & (lon == 0)), 3, 0)
+
+    if cache is not None and "direccion" in df and (origen == 3).any():
+        faltan = origen == 3
+        lat_cache, lon_cache = cache.coordenadas(df["direccion"].to_numpy(dtype=object)[faltan])
+        encontradas = ~np.isnan(lat_cache)
+        posiciones = np.flatnonzero(faltan)[encontradas]
+        lat[posiciones], lon[posiciones], origen[posiciones] = lat_cache[encontradas], lon_cache[encontradas], 1
+
+    if "zona" in df and (origen == 3).any():
+        zona = df["zona"].astype(str).to_numpy()
+        ubicados = origen < 3
+        centroides = pd.DataFrame({"zona": zona[ubicados], "lat": lat[ubicados], "lon": lon[ubicados]}).groupby("zona").mean()
+        faltan = np.flatnonzero(origen == 3)
+        centro = centroides.reindex(zona[faltan])
+        con_centro = centro["lat"].notna().to_numpy()
+        posiciones = faltan[con_centro]
+        lat[posiciones], lon[posiciones], origen[posiciones] = centro["lat"].to_numpy()[con_centro], centro["lon"].to_numpy()[con_centro], 2
+
+    return lat, lon, pd.Categorical.from_codes(origen, ORIGENES)
+
+
+def clave_celda(lat, lon, lado):
+    """Clave entera de la celda de la cuadrícula (lado en grados) de cada punto"""
+    fila = np.floor(lat / lado).astype(np.int64) + _DESPLAZAMIENTO_CELDA
+    columna = np.floor(lon / lado).astype(np.int64) + _DESPLAZAMIENTO_CELDA
+    return fila * (2 * _DESPLAZAMIENTO_CELDA) + columna
+
+
+class MapaVentas:
+    """Ventas de los clientes agregadas en celdas, precalculadas por nivel de zoom.
+
+    Para cada nivel hay un `Cubo` por las dimensiones de cliente de los
+    filtros más la celda, así que el mapa de cualquier combinación de
+    filtros es una consulta al cubo: se envían las celdas con datos (con
+    su centroide, clientes y monto), no un punto por cliente. Lo mismo da
+    los centroides por zona.
+    """
+
+    MEDIDAS = ["clientes", "monto_total", "lat_suma", "lon_suma"]
+
+    def __init__(self, df, cache=None):
+        lat, lon, self.origen = coordenadas_clientes(df, cache)
+        # Coordenadas resueltas de cada fila de df (NaN sin ubicación), p. ej. para las rutas
+        self.lat, self.lon = lat, lon
+        self.conteo_origen = pd.Series(self.origen).value_counts().reindex(ORIGENES, fill_value=0)
+        ubicados = ~np.isnan(lat)
+        lat, lon = lat[ubicados], lon[ubicados]
+        base = pd.DataFrame({dimension: df[dimension].astype(str).to_numpy()[ubicados] for dimension in DIMENSIONES_CLIENTE})
+        base["clientes"] = 1
+        base["monto_total"] = df["monto_total"].fillna(0).to_numpy(dtype=float)[ubicados]
+        base["lat_suma"] = lat
+        base["lon_suma"] = lon
+
+        self.centro = (float(np.median(lat)), float(np.median(lon))) if len(lat) else CENTRO_POR_DEFECTO
+        self.cubos = {
+            nivel: Cubo(base.assign(celda=clave_celda(lat, lon, lado)), DIMENSIONES_CLIENTE + ["celda"], self.MEDIDAS, [["zona", "celda"]])
+            for nivel, (_, lado, _) in NIVELES.items()
+        }
+
+    @staticmethod
+    def _centroides(totales):
+        return pd.DataFrame({
+            "lat": totales["lat_suma"] / totales["clientes"],
+            "lon": totales["lon_suma"] / totales["clientes"],
+            "clientes": totales["clientes"],
+            "monto_total": totales["monto_total"],
+        })
+
+    def celdas(self, filtros=None, nivel=NIVEL_POR_DEFECTO, maximo=MAXIMO_CELDAS):
+        """Celdas con clientes para los filtros: centroide, clientes y monto (las `maximo` de mayor monto)"""
+        totales = self.cubos[nivel].consultar(filtros, por=["celda"])
+        totales = totales[totales["clientes"] > 0]
+        if len(totales) > maximo:
+            totales = totales.nlargest(maximo, "monto_total")
+        return self._centroides(totales).reset_index(drop=True)
+
+    def zonas(self, filtros=None):
+        """Centroide, clientes y monto de cada zona para los filtros"""
+        totales = self.cubos[NIVEL_POR_DEFECTO].consultar(filtros, por=["zona"])
+        totales = totales[totales["clientes"] > 0]
+        return self._centroides(totales).assign(zona=totales["zona"].astype(str).to_numpy()).reset_index(drop=True)
+
+
+def main():
+    from datos import AlmacenDatos
+    from fuentes import configuracion_fuente, crear_fuente
+
+    tipo_fuente, ubicacion = configuracion_fuente()
+    parser = argparse.ArgumentParser(description="Geocodifica las direcciones de clientes sin coordenadas y las guarda en la caché local")
+    parser.add_argument("--fuente", default=tipo_fuente, help="sheets, excel, directorio, sqlite o duckdb")
+    parser.add_argument("--ruta", default=ubicacion, help="ID de Google Sheets o ruta de la fuente")
+    parser.add_argument("--cache", default=RUTA_GEOCODIFICACION, help="Archivo JSON de la caché")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de direcciones a consultar")
+    parser.add_argument("--pausa", type=float, default=1.0, help="Segundos entre consultas (Nominatim pide 1 por segundo)")
+    args = parser.parse_args()
+
+    almacen = AlmacenDatos(crear_fuente(args.fuente, args.ruta))
+    almacen.refrescar()
+    clientes = almacen.clientes
+    # Mismo criterio que el mapa: nulos y (0, 0), que es como la tabla de clientes guarda los nulos
+    _, _, origen = coordenadas_clientes(clientes)
+    sin_coordenadas = clientes[np.asarray(origen != "hoja")]
+    cache = CacheGeocodificacion(args.cache)
+    pendientes = cache.pendientes(sin_coordenadas["direccion"])[:args.limite]
+
+    sesion = requests.Session()
+    for i, direccion in enumerate(pendientes, 1):
+        cache.entradas[direccion] = geocodificar(direccion, sesion)
+        if i % 50 == 0:
+            cache.guardar()
+        time.sleep(args.pausa)
+    cache.guardar()
+    encontradas = sum(cache.entradas[d] is not None for d in pendientes)
+    print(f"{encontradas:,} de {len(pendientes):,} direcciones geocodificadas en {os.path.abspath(args.cache)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# ----------------------------------------------------------
+# GUÍA DE VENTAS: DISCURSOS Y RECOMENDACIONES (UNO O TODOS LOS CLIENTES)
+# ----------------------------------------------------------
+# Uso por lotes: python guia_ventas.py guias.csv   (o guias.parquet / guias.xlsx)
+import argparse
+import os
+from string import Formatter
+
+import numpy as np
+import pandas as pd
+
+from datos import AlmacenDatos
+from exportacion import TAMANO_BLOQUE, exportar
+from fuentes import configuracion_fuente, crear_fuente
+from perfiles import IndicePerfiles
+from recomendaciones import MotorRecomendaciones
+
+# Descuento ofrecido según el segmento (el resto de segmentos se trata como Inactivo)
+DESCUENTOS = {"Activo": 5, "Disminuido": 10, "Inactivo": 15}
+
+PLANTILLAS = {
+    "Activo": (
+        '"Don/Dña {nombre}, siempre es un placer atenderle. '
+        'Como veo que frecuenta nuestro colmado, quería comentarle sobre **{producto_recomendado}** '
+        'que está teniendo mucha aceptación. ¿Le interesaría probar una muestra o llevar una cantidad pequeña '
+        'con un **5% de descuento** por ser cliente preferencial?"'
+    ),
+    "Disminuido": (
+        '"Don/Dña {nombre}, ¡cuánto tiempo sin atenderle! '
+        'Hemos notado que antes solía comprar **{producto_top}** con frecuencia. '
+        'Tenemos una **oferta especial** solo para usted este mes. ¿Quiere que le aparte algunas unidades '
+        'con un **10% de descuento** para que vuelva a disfrutar de nuestros productos?"'
+    ),
+    "Inactivo": (
+        '"Don/Dña {nombre}, espero que esté bien. '
+        'Nos hacía falta su visita y queríamos ofrecerle un **descuento especial del 15%** '
+        'en su próxima compra más **entrega gratuita**. ¿Qué productos necesita actualmente '
+        'para su negocio? Tenemos disponibilidad de **{producto_recomendado}** '
+        'que podría interesarle."'
+    ),
+}
+
+# Texto usado cuando no hay producto que mencionar
+SIN_PRODUCTO = "nuestros productos"
+
+# Frecuencia de contacto según días desde la última compra
+FRECUENCIAS_CONTACTO = [
+    (15, "Cada 2 semanas (cliente muy activo)"),
+    (30, "Semanal (mantener engagement)"),
+    (float("inf"), "2-3 veces por semana (recuperación urgente)"),
+]
+
+COLUMNAS_GUIA = [
+    "codigo_cliente", "nombre", "zona", "telefono", "segmento", "producto_top",
+    "producto_recomendado", "descuento", "frecuencia_contacto", "guion",
+]
+
+
+def _segmento_plantilla(segmento):
+    return segmento if segmento in PLANTILLAS else "Inactivo"
+
+
+def primer_nombre(nombre):
+    partes = str(nombre).split()
+    return partes[0] if partes else ""
+
+
+def frecuencia_contacto(dias):
+    """Frecuencia recomendada de contacto para un cliente"""
+    return next(texto for limite, texto in FRECUENCIAS_CONTACTO if dias < limite)
+
+
+def guion_cliente(cliente, producto_top=None, producto_recomendado=None):
+    """Discurso recomendado para un cliente (pestaña Clientes)"""
+    plantilla = PLANTILLAS[_segmento_plantilla(cliente["segmento"])]
+    return plantilla.format(
+        nombre=primer_nombre(cliente["nombre"]),
+        producto_top=SIN_PRODUCTO if pd.isna(producto_top) else producto_top,
+        producto_recomendado=SIN_PRODUCTO if pd.isna(producto_recomendado) else producto_recomendado,
+    )
+
+
+def _renderizar(plantilla, columnas):
+    """Aplica una plantilla de str.format a columnas enteras con concatenación vectorizada"""
+    resultado = pd.Series("", index=columnas.index, dtype=object)
+    for literal, campo, _, _ in Formatter().parse(plantilla):
+        resultado = resultado + literal
+        if campo:
+            resultado = resultado + columnas[campo].astype(str)
+    return resultado
+
+
+def generar_guias(df, indice_perfiles, motor_recomendaciones):
+    """Segmento, productos, descuento, frecuencia y discurso de todos los clientes.
+
+    Usa la misma lógica que la pestaña Clientes: el producto principal sale
+    del índice de perfiles y el recomendado de la tabla precalculada del
+    motor de recomendaciones. Los clientes sin recomendación del motor se
+    completan con la primera oportunidad de su grupo (tipo de negocio, zona)
+    que no compran, con el ranking calculado una vez por grupo.
+    """
+    guias = df[["codigo_cliente", "nombre", "zona", "telefono", "segmento", "tipo_negocio", "frecuencia_compra"]].reset_index(drop=True)
+    guias["producto_top"] = indice_perfiles.producto_principal(guias["codigo_cliente"])
+    guias["producto_recomendado"] = motor_recomendaciones.primera_recomendacion(guias["codigo_cliente"])
+
+    faltan = guias["producto_recomendado"].isna().to_numpy()
+    guias.loc[faltan, "producto_recomendado"] = indice_perfiles.primera_oportunidad(guias[faltan])
+
+    segmento = guias["segmento"].where(guias["segmento"].isin(list(PLANTILLAS)), "Inactivo")
+    guias["descuento"] = segmento.map(DESCUENTOS).astype(int)
+    limites = [limite for limite, _ in FRECUENCIAS_CONTACTO]
+    guias["frecuencia_contacto"] = np.array([texto for _, texto in FRECUENCIAS_CONTACTO], dtype=object)[
+        np.searchsorted(limites, guias["frecuencia_compra"].to_numpy(), side="right")
+    ]
+
+    columnas = pd.DataFrame({
+        "nombre": guias["nombre"].astype(str).str.split().str[0].fillna(""),
+        "producto_top": guias["producto_top"].fillna(SIN_PRODUCTO),
+        "producto_recomendado": guias["producto_recomendado"].fillna(SIN_PRODUCTO),
+    })
+    guias["guion"] = ""
+    for nombre_segmento, plantilla in PLANTILLAS.items():
+        filas = segmento == nombre_segmento
+        guias.loc[filas, "guion"] = _renderizar(plantilla, columnas[filas])
+    return guias[COLUMNAS_GUIA]
+
+
+def escribir_guias(guias, ruta, tamano_bloque=TAMANO_BLOQUE):
+    """Escribe las guías por bloques en CSV, Parquet o Excel (según la extensión)"""
+    exportar(guias, ruta, tamano_bloque=tamano_bloque)
+
+
+def main():
+    tipo_fuente, ubicacion = configuracion_fuente()
+    parser = argparse.ArgumentParser(description="Genera la guía de ventas de todos los clientes")
+    parser.add_argument("salida", help="Archivo de salida .csv, .parquet o .xlsx")
+    parser.add_argument("--fuente", default=tipo_fuente, help="sheets, excel, directorio, sqlite o duckdb")
+    parser.add_argument("--ruta", default=ubicacion, help="ID de Google Sheets o ruta de la fuente")
+    args = parser.parse_args()
+
+    almacen = AlmacenDatos(crear_fuente(args.fuente, args.ruta))
+    almacen.refrescar()
+    df, pedidos, *_ = almacen.resultados()
+    guias = generar_guias(df, IndicePerfiles(df, pedidos), MotorRecomendaciones(pedidos))
+    escribir_guias(guias, args.salida)
+    print(f"{len(guias):,} guías escritas en {os.path.abspath(args.salida)}")
+
+
+if __name__ == "__main__":
+    main()
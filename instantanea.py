@@ -0,0 +1,134 @@
+# ----------------------------------------------------------
+# INSTANTÁNEA COLUMNAR (FEATHER) DE LAS HOJAS PROCESADAS
+# ----------------------------------------------------------
+import datetime
+import json
+import numbers
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Carpeta local donde se guardan las instantáneas (una subcarpeta por archivo)
+CARPETA_INSTANTANEA = os.environ.get("CRM_CACHE_DIR", os.path.join(".cache", "crm"))
+
+TABLAS = ("pedidos", "entregas", "clientes")
+ARCHIVO_METADATOS = "metadatos.json"
+
+# Tipos que se admiten mezclados en una columna object: la columna se guarda
+# como texto junto con el código (posición en esta tupla) del tipo de cada
+# valor, y al cargarla cada valor se convierte de vuelta a su tipo
+TIPOS_MIXTOS = (
+    ((str,), str),
+    ((bool, np.bool_), lambda texto: texto == "True"),
+    ((numbers.Integral,), int),
+    ((numbers.Real,), float),
+    ((datetime.datetime,), pd.Timestamp),
+    ((type(None),), lambda texto: None),
+)
+
+
+def carpeta_instantanea(file_id, carpeta=None):
+    return os.path.join(carpeta or CARPETA_INSTANTANEA, file_id)
+
+
+def _columnas_mixtas(tabla):
+    """Columnas object que Arrow no puede tipar (p. ej. codigo_cliente con números y texto)"""
+    mixtas = []
+    for columna in tabla.columns[tabla.dtypes == object]:
+        try:
+            pa.array(tabla[columna], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            mixtas.append(columna)
+    return mixtas
+
+
+def _codigo_tipo(tipo):
+    for codigo, (clases, _) in enumerate(TIPOS_MIXTOS):
+        if issubclass(tipo, clases):
+            return codigo
+    raise TypeError(f"Tipo no admitido en una columna mixta de la instantánea: {tipo.__name__}")
+
+
+def _tipos_mixta(serie):
+    """Código de tipo (posición en TIPOS_MIXTOS) de cada valor de una columna mixta"""
+    tipos = serie.map(type)
+    return tipos.map({tipo: _codigo_tipo(tipo) for tipo in tipos.unique()}).to_numpy(dtype=np.int8)
+
+
+def _restaurar_mixta(serie, tipos):
+    """Devuelve a cada valor (guardado como texto) su tipo original según `tipos`"""
+    valores = serie.to_numpy(dtype=object)
+    for codigo, (_, convertir) in enumerate(TIPOS_MIXTOS):
+        posiciones = np.flatnonzero(tipos == codigo)
+        if len(posiciones) and convertir is not str:
+            valores[posiciones] = [convertir(v) for v in valores[posiciones]]
+    return pd.Series(valores, index=serie.index, name=serie.name, dtype=object)
+
+
+def guardar_instantanea(carpeta, tablas, huellas, metadatos):
+    """Escribe las tablas en Feather sin compresión (aptas para memory-map).
+
+    Los archivos se escriben con nombre temporal y se renombran; el archivo
+    de metadatos se escribe al final para que una escritura interrumpida
+    nunca deje una instantánea a medias como válida. Las columnas mixtas
+    se guardan como texto con el tipo de cada valor aparte
+    (`tipos_<tabla>_<n>.npy`); un tipo fuera de TIPOS_MIXTOS lanza TypeError.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    metadatos = dict(metadatos, filas={}, columnas_mixtas={}, huellas={})
+    for nombre in TABLAS:
+        tabla = tablas[nombre].reset_index(drop=True)
+        mixtas = _columnas_mixtas(tabla)
+        if mixtas:
+            tabla = tabla.copy()
+            for k, columna in enumerate(mixtas):
+                destino = os.path.join(carpeta, f"tipos_{nombre}_{k}.npy")
+                with open(destino + ".tmp", "wb") as archivo:
+                    np.save(archivo, _tipos_mixta(tabla[columna]))
+                os.replace(destino + ".tmp", destino)
+                tabla[columna] = tabla[columna].astype(str)
+        destino = os.path.join(carpeta, f"{nombre}.feather")
+        feather.write_feather(tabla, destino + ".tmp", compression="uncompressed")
+        os.replace(destino + ".tmp", destino)
+        metadatos["filas"][nombre] = len(tabla)
+        metadatos["columnas_mixtas"][nombre] = mixtas
+
+    for hoja, (columnas, valores) in huellas.items():
+        destino = os.path.join(carpeta, f"huellas_{hoja}.npy")
+        with open(destino + ".tmp", "wb") as archivo:
+            np.save(archivo, valores)
+        os.replace(destino + ".tmp", destino)
+        metadatos["huellas"][hoja] = columnas
+
+    destino = os.path.join(carpeta, ARCHIVO_METADATOS)
+    with open(destino + ".tmp", "w", encoding="utf-8") as archivo:
+        json.dump(metadatos, archivo, ensure_ascii=False)
+    os.replace(destino + ".tmp", destino)
+
+
+def cargar_instantanea(carpeta):
+    """Lee la instantánea con memory-map. Devuelve None si no existe o no es válida"""
+    try:
+        with open(os.path.join(carpeta, ARCHIVO_METADATOS), encoding="utf-8") as archivo:
+            metadatos = json.load(archivo)
+        tablas = {}
+        for nombre in TABLAS:
+            tabla = feather.read_table(os.path.join(carpeta, f"{nombre}.feather"), memory_map=True).to_pandas()
+            if len(tabla) != metadatos["filas"][nombre]:
+                return None
+            for k, columna in enumerate(metadatos["columnas_mixtas"][nombre]):
+                tipos = np.load(os.path.join(carpeta, f"tipos_{nombre}_{k}.npy"))
+                if len(tipos) != len(tabla):
+                    return None
+                tabla[columna] = _restaurar_mixta(tabla[columna], tipos)
+            tablas[nombre] = tabla
+        huellas = {
+            hoja: (columnas, np.load(os.path.join(carpeta, f"huellas_{hoja}.npy")))
+            for hoja, columnas in metadatos["huellas"].items()
+        }
+    except (OSError, ValueError, KeyError, pa.ArrowInvalid):
+        return None
+    return tablas, huellas, metadatos
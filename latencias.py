@@ -0,0 +1,51 @@
+# ----------------------------------------------------------
+# LATENCIA DE EJECUCIÓN POR SESIÓN (PANEL DE DEPURACIÓN)
+# ----------------------------------------------------------
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Mediciones guardadas por sesión
+MAXIMO_REGISTROS = 100
+CLAVE_ESTADO = "latencias"
+
+
+def registrar(estado, nombre, milisegundos):
+    """Añade una medición al historial de la sesión (`st.session_state` u otro dict)"""
+    if CLAVE_ESTADO not in estado:
+        estado[CLAVE_ESTADO] = deque(maxlen=MAXIMO_REGISTROS)
+    estado[CLAVE_ESTADO].append({"unidad": nombre, "hora": time.strftime("%H:%M:%S"), "ms": round(milisegundos, 1)})
+
+
+@contextmanager
+def medir(estado, nombre):
+    """Mide el bloque y lo registra como una ejecución de `nombre`"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(estado, nombre, (time.perf_counter() - inicio) * 1000)
+
+
+def ultima(estado, nombre):
+    """Última medición de `nombre` en ms (None si no hay)"""
+    for registro in reversed(estado.get(CLAVE_ESTADO, ())):
+        if registro["unidad"] == nombre:
+            return registro["ms"]
+    return None
+
+
+def resumen(estado):
+    """Ejecuciones, última, mediana y máximo (ms) por unidad"""
+    historial = pd.DataFrame(list(estado.get(CLAVE_ESTADO, ())), columns=["unidad", "hora", "ms"])
+    if historial.empty:
+        return historial
+    agrupado = historial.groupby("unidad", sort=False)["ms"]
+    return pd.DataFrame({
+        "ejecuciones": agrupado.size(),
+        "ultima_ms": agrupado.last(),
+        "mediana_ms": agrupado.median().round(1),
+        "maximo_ms": agrupado.max(),
+    }).reset_index()
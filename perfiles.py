@@ -0,0 +1,144 @@
+# ----------------------------------------------------------
+# ÍNDICE DE PERFILES DE PRODUCTO POR CLIENTE Y POR GRUPO
+# ----------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+COLUMNAS_PERFIL = ["producto", "cantidad", "monto"]
+# Productos del ranking de cada grupo que se prueban por cliente en `primera_oportunidad`
+# (se duplica para los clientes que ya los compran todos)
+CANDIDATOS_OPORTUNIDAD = 8
+
+
+class TablaIndexada:
+    """Tabla de productos agregados, ordenada por clave y cantidad descendente.
+
+    Las filas de cada clave quedan contiguas, así que una consulta es una
+    búsqueda en diccionario más un corte de la tabla.
+    """
+
+    def __init__(self, tabla, claves, columnas=COLUMNAS_PERFIL):
+        indice = pd.MultiIndex.from_frame(tabla[claves])
+        codigos, valores = indice.factorize()
+        # Orden: clave, cantidad descendente y nombre de producto (igual que nlargest sobre un groupby)
+        rango_producto = pd.factorize(tabla["producto"], sort=True)[0]
+        orden = np.lexsort((rango_producto, -tabla["cantidad"].to_numpy(dtype=float), codigos))
+        self.tabla = tabla[columnas].iloc[orden].reset_index(drop=True)
+        limites = np.searchsorted(codigos[orden], np.arange(len(valores) + 1))
+        self.posiciones = {clave: (limites[i], limites[i + 1]) for i, clave in enumerate(valores)}
+        self.claves = valores
+        self._inicios = limites[:-1]
+
+    def consultar(self, clave, n=None):
+        inicio, fin = self.posiciones.get(clave, (0, 0))
+        if n is not None:
+            fin = min(fin, inicio + n)
+        return self.tabla.iloc[inicio:fin].reset_index(drop=True)
+
+    def primeros(self):
+        """Primera fila (la de mayor cantidad) de cada clave, indexada por clave"""
+        return self.tabla.iloc[self._inicios].set_index(self.claves)
+
+    def claves_filas(self):
+        """Clave de cada fila de la tabla"""
+        return self.claves.repeat(np.diff(np.r_[self._inicios, len(self.tabla)]))
+
+
+class IndicePerfiles:
+    """Cantidades y montos por producto, precalculados al cargar los datos.
+
+    - Por `codigo_cliente`: lo que compra cada cliente.
+    - Por (`tipo_negocio`, `zona`): lo que compran los clientes similares,
+      base de los productos recomendados.
+    - Catálogo: precio de referencia (promedio de `precio_unitario`) y
+      popularidad (clientes distintos que compran cada producto).
+    """
+
+    def __init__(self, df, pedidos):
+        por_cliente = (pedidos.groupby(["codigo_cliente", "producto"], sort=False, observed=True)
+                       .agg(cantidad=("cantidad", "sum"), monto=("monto", "sum"))
+                       .reset_index())
+        grupos = df[["codigo_cliente", "tipo_negocio", "zona"]].drop_duplicates("codigo_cliente")
+        por_grupo = (por_cliente.merge(grupos, on="codigo_cliente", how="inner")
+                     .groupby(["tipo_negocio", "zona", "producto"], sort=False, observed=True)
+                     .agg(cantidad=("cantidad", "sum"), monto=("monto", "sum"), clientes=("codigo_cliente", "size"))
+                     .reset_index())
+        self.clientes = TablaIndexada(por_cliente, ["codigo_cliente"])
+        self.grupos = TablaIndexada(por_grupo, ["tipo_negocio", "zona"], COLUMNAS_PERFIL + ["clientes"])
+        self.clientes_por_grupo = grupos.groupby(["tipo_negocio", "zona"], sort=False, observed=True).size().to_dict()
+
+        # Catálogo ordenado por popularidad
+        self.catalogo = pedidos.groupby("producto", observed=True).agg(
+            precio_referencia=("precio_unitario", "mean"),
+            cantidad=("cantidad", "sum"),
+        )
+        self.catalogo["clientes"] = por_cliente.groupby("producto", observed=True).size()
+        self.catalogo = self.catalogo.sort_values(["clientes", "cantidad"], ascending=False, kind="mergesort")
+
+    def productos_cliente(self, codigo_cliente, n=None):
+        """Productos del cliente ordenados por cantidad (columnas producto, cantidad, monto)"""
+        return self.clientes.consultar((codigo_cliente,), n)
+
+    def productos_grupo(self, tipo_negocio, zona, n=None):
+        """Productos más comprados por los clientes del mismo tipo de negocio y zona"""
+        return self.grupos.consultar((tipo_negocio, zona), n)
+
+    def producto_principal(self, codigos_cliente):
+        """Producto que más compra cada cliente (NaN si no tiene compras), en lote"""
+        primeros = self.clientes.primeros()
+        principales = pd.Series(primeros["producto"].to_numpy(), index=primeros.index.get_level_values(0))
+        return principales.reindex(pd.Index(codigos_cliente)).to_numpy()
+
+    def oportunidades(self, codigo_cliente, tipo_negocio, zona, n=5):
+        """Productos que el cliente no compra, priorizados por su grupo.
+
+        El orden es el porcentaje de clientes del mismo tipo de negocio y
+        zona que compran el producto y, a igualdad, su popularidad general.
+        """
+        comprados = self.productos_cliente(codigo_cliente)["producto"]
+        candidatos = self.catalogo[~self.catalogo.index.isin(comprados)]
+
+        grupo = self.productos_grupo(tipo_negocio, zona)
+        total_grupo = self.clientes_por_grupo.get((tipo_negocio, zona), 0)
+        tasa = pd.Series(grupo["clientes"].to_numpy() / max(total_grupo, 1), index=grupo["producto"])
+
+        candidatos = candidatos.assign(tasa_similares=tasa.reindex(candidatos.index).fillna(0).to_numpy())
+        ordenados = candidatos.sort_values(["tasa_similares", "clientes"], ascending=False, kind="mergesort").head(n)
+        return ordenados.reset_index()[["producto", "precio_referencia", "tasa_similares", "clientes"]]
+
+    def primera_oportunidad(self, clientes, candidatos=CANDIDATOS_OPORTUNIDAD):
+        """Primera de `oportunidades` (n=1) de cada cliente, en lote.
+
+        `clientes` lleva `codigo_cliente`, `tipo_negocio` y `zona`. El ranking
+        de cada grupo se calcula una sola vez; a cada cliente le corresponde el
+        primer producto de ese ranking que no compra, resuelto con un cruce
+        contra sus compras en lugar de una consulta por cliente. Devuelve un
+        array alineado con `clientes` (NaN si no queda ningún producto).
+        """
+        clientes = clientes[["codigo_cliente", "tipo_negocio", "zona"]].reset_index(drop=True)
+        resultado = np.full(len(clientes), np.nan, dtype=object)
+        grupos = clientes[["tipo_negocio", "zona"]].drop_duplicates()
+        compras = pd.DataFrame({"codigo_cliente": self.clientes.claves_filas().get_level_values(0),
+                                "producto": self.clientes.tabla["producto"].to_numpy()})
+        compras = compras[compras["codigo_cliente"].isin(clientes["codigo_cliente"])]
+        compras["comprado"] = True
+
+        pendientes = clientes.assign(fila=np.arange(len(clientes)))
+        while not pendientes.empty:
+            ranking = pd.concat([
+                self.oportunidades(None, tipo_negocio, zona, n=candidatos)[["producto"]]
+                .assign(tipo_negocio=tipo_negocio, zona=zona, rango=lambda r: np.arange(len(r)))
+                for tipo_negocio, zona in grupos.itertuples(index=False, name=None)
+            ], ignore_index=True)
+            pares = pendientes.merge(ranking.astype({"producto": object}), on=["tipo_negocio", "zona"])
+            pares = pares.merge(compras.astype({"producto": object}), on=["codigo_cliente", "producto"], how="left")
+            primeros = (pares[pares["comprado"].isna()].sort_values(["fila", "rango"], kind="mergesort")
+                        .drop_duplicates("fila"))
+            resultado[primeros["fila"].to_numpy()] = primeros["producto"].to_numpy()
+            # Quien ya compra todos los candidatos vuelve a probar con el doble, mientras quede catálogo
+            if candidatos >= len(self.catalogo):
+                break
+            pendientes = pendientes[~pendientes["fila"].isin(primeros["fila"])]
+            grupos = pendientes[["tipo_negocio", "zona"]].drop_duplicates()
+            candidatos *= 2
+        return resultado
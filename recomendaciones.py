@@ -0,0 +1,142 @@
+# ----------------------------------------------------------
+# RECOMENDACIONES: FILTRADO COLABORATIVO ÍTEM-ÍTEM
+# ----------------------------------------------------------
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Recomendaciones precalculadas por cliente
+N_RECOMENDACIONES = 10
+# Vecinos más similares que se guardan por producto
+N_VECINOS = 50
+# Filas (productos o clientes) procesadas por lote en los productos densos
+TAMANO_LOTE = 2048
+
+
+def top_k_por_fila(matriz, k):
+    """Índices y valores de los k mayores de cada fila, ordenados de mayor a menor"""
+    k = min(k, matriz.shape[1])
+    if k == 0:
+        return np.empty((matriz.shape[0], 0), dtype=np.int32), np.empty((matriz.shape[0], 0), dtype=matriz.dtype)
+    indices = np.argpartition(-matriz, k - 1, axis=1)[:, :k]
+    valores = np.take_along_axis(matriz, indices, axis=1)
+    orden = np.argsort(-valores, axis=1, kind="stable")
+    return np.take_along_axis(indices, orden, axis=1).astype(np.int32), np.take_along_axis(valores, orden, axis=1)
+
+
+class MotorRecomendaciones:
+    """Recomendaciones por similitud coseno entre productos.
+
+    Se construye una vez por carga de datos:
+
+    1. Matriz dispersa cliente×producto binaria (compró / no compró).
+    2. Similitud coseno ítem-ítem por lotes de productos, guardando solo los
+       `n_vecinos` más similares de cada producto (matriz dispersa).
+    3. Puntaje de cada cliente = suma de similitudes con lo que ya compra,
+       calculado por lotes de clientes; se descartan los productos ya
+       comprados y se guardan los `n_recomendaciones` mejores.
+
+    Consultar un cliente es una búsqueda en la tabla precalculada.
+    """
+
+    def __init__(self, pedidos, n_recomendaciones=N_RECOMENDACIONES, n_vecinos=N_VECINOS, tamano_lote=TAMANO_LOTE):
+        validos = pedidos["codigo_cliente"].notna() & pedidos["producto"].notna()
+        cod_cliente, self.clientes = pd.factorize(pedidos.loc[validos, "codigo_cliente"])
+        cod_producto, self.productos = pd.factorize(pedidos.loc[validos, "producto"])
+        self.productos = pd.Index(self.productos)
+        forma = (len(self.clientes), len(self.productos))
+
+        compras = sparse.csr_matrix((np.ones(len(cod_cliente), dtype=np.float32), (cod_cliente, cod_producto)), shape=forma)
+        compras.sum_duplicates()
+        compras.data[:] = 1.0
+        self.compras = compras
+
+        self.similitud = self._similitud(compras, n_vecinos, tamano_lote)
+        self.recomendados, self.puntajes = self._recomendar_todos(compras, self.similitud, n_recomendaciones, tamano_lote)
+        self._posicion = pd.Index(self.clientes)
+
+    @staticmethod
+    def _similitud(compras, n_vecinos, tamano_lote):
+        """Coseno ítem-ítem podado a los vecinos más cercanos de cada producto"""
+        por_producto = compras.T.tocsr()
+        normas = np.sqrt(np.asarray(por_producto.sum(axis=1)).ravel())
+        normas[normas == 0] = 1.0
+        n_productos = por_producto.shape[0]
+        filas, columnas, valores = [], [], []
+        for inicio in range(0, n_productos, tamano_lote):
+            fin = min(inicio + tamano_lote, n_productos)
+            coocurrencias = (por_producto[inicio:fin] @ compras).toarray()
+            coseno = coocurrencias / normas[inicio:fin, None] / normas[None, :]
+            coseno[np.arange(fin - inicio), np.arange(inicio, fin)] = 0.0
+            indices, similitudes = top_k_por_fila(coseno, n_vecinos)
+            positivos = similitudes > 0
+            filas.append(np.repeat(np.arange(inicio, fin), positivos.sum(axis=1)))
+            columnas.append(indices[positivos])
+            valores.append(similitudes[positivos])
+        if not filas:
+            return sparse.csr_matrix((n_productos, n_productos), dtype=np.float32)
+        return sparse.csr_matrix(
+            (np.concatenate(valores).astype(np.float32), (np.concatenate(filas), np.concatenate(columnas))),
+            shape=(n_productos, n_productos),
+        )
+
+    @staticmethod
+    def _recomendar_todos(compras, similitud, n_recomendaciones, tamano_lote):
+        """Top-N productos no comprados para todos los clientes, por lotes"""
+        n_clientes = compras.shape[0]
+        recomendados = np.full((n_clientes, min(n_recomendaciones, compras.shape[1])), -1, dtype=np.int32)
+        puntajes = np.zeros(recomendados.shape, dtype=np.float32)
+        similitud_t = similitud.T.tocsr()
+        for inicio in range(0, n_clientes, tamano_lote):
+            fin = min(inicio + tamano_lote, n_clientes)
+            lote = compras[inicio:fin]
+            puntaje = (lote @ similitud_t).toarray()
+            # Excluir lo que el cliente ya compra
+            puntaje[lote.nonzero()] = -np.inf
+            indices, valores = top_k_por_fila(puntaje, recomendados.shape[1])
+            indices[~(valores > 0)] = -1
+            recomendados[inicio:fin] = indices
+            puntajes[inicio:fin] = np.where(valores > 0, valores, 0)
+        return recomendados, puntajes
+
+    def recomendar(self, codigo_cliente, n=5):
+        """Productos recomendados (no comprados) con su puntaje de afinidad"""
+        posicion = self._posicion.get_indexer([codigo_cliente])[0]
+        if posicion < 0:
+            return pd.DataFrame({"producto": pd.Series(dtype=object), "afinidad": pd.Series(dtype=float)})
+        codigos = self.recomendados[posicion, :n]
+        validos = codigos >= 0
+        return pd.DataFrame({
+            "producto": self.productos.take(codigos[validos]),
+            "afinidad": self.puntajes[posicion, :n][validos],
+        })
+
+    def primera_recomendacion(self, codigos_cliente):
+        """Mejor producto recomendado de cada cliente (NaN si no hay), en lote"""
+        posiciones = self._posicion.get_indexer(pd.Index(codigos_cliente))
+        codigos = np.full(len(posiciones), -1, dtype=np.int32)
+        if self.recomendados.shape[1]:
+            codigos[posiciones >= 0] = self.recomendados[posiciones[posiciones >= 0], 0]
+        productos = self.productos.take(np.maximum(codigos, 0)).to_numpy(dtype=object) if len(self.productos) else np.full(len(codigos), np.nan, dtype=object)
+        productos[codigos < 0] = np.nan
+        return productos
+
+
+def recomendaciones_cliente(motor, indice_perfiles, cliente, n=5):
+    """Recomendaciones del motor, completadas con oportunidades del grupo del cliente.
+
+    Los clientes sin historial (o con muy pocas compras) no tienen vecinos
+    suficientes; para ellos se completa la lista con lo que más compran los
+    clientes del mismo tipo de negocio y zona.
+    """
+    recomendados = motor.recomendar(cliente["codigo_cliente"], n)
+    if len(recomendados) < n:
+        relleno = indice_perfiles.oportunidades(cliente["codigo_cliente"], cliente["tipo_negocio"], cliente["zona"], n=2 * n)
+        relleno = relleno[~relleno["producto"].isin(recomendados["producto"])].head(n - len(recomendados))
+        recomendados = pd.concat(
+            [recomendados, pd.DataFrame({"producto": relleno["producto"].to_numpy(), "afinidad": 0.0})],
+            ignore_index=True,
+        )
+    precios = indice_perfiles.catalogo["precio_referencia"]
+    recomendados["precio_referencia"] = precios.reindex(recomendados["producto"]).to_numpy()
+    return recomendados
@@ -0,0 +1,97 @@
+# ----------------------------------------------------------
+# RFM Y CADENCIA DE COMPRA POR CLIENTE
+# ----------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+# Umbrales de segmento sin historial suficiente (menos de dos días con compra)
+DIAS_ACTIVO = 30
+DIAS_INACTIVO = 90
+
+# Con cadencia conocida: activo hasta 1.5 intervalos sin comprar, inactivo desde 3
+FACTOR_ACTIVO = 1.5
+FACTOR_INACTIVO = 3.0
+# Límites de los umbrales por cadencia (días)
+LIMITES_ACTIVO = (7, 90)
+LIMITES_INACTIVO = (30, 180)
+
+SEGMENTOS = np.array(["Activo", "Disminuido", "Inactivo"], dtype=object)
+
+
+def mediana_por_grupo(grupo, valores, n_grupos):
+    """Mediana de `valores` por grupo entero (NaN si el grupo no tiene valores), sin bucles Python"""
+    medianas = np.full(n_grupos, np.nan)
+    if len(valores) == 0:
+        return medianas
+    orden = np.lexsort((valores, grupo))
+    grupo, valores = grupo[orden], valores[orden]
+    conteos = np.bincount(grupo, minlength=n_grupos)
+    inicios = np.r_[0, np.cumsum(conteos)[:-1]]
+    con_valores = conteos > 0
+    bajo = inicios + (conteos - 1) // 2
+    alto = inicios + conteos // 2
+    medianas[con_valores] = (valores[bajo[con_valores]] + valores[alto[con_valores]]) / 2
+    return medianas
+
+
+def quintil(valores, ascendente=True):
+    """Puntaje 1-5 por rango percentil (5 = mejor); NaN se queda en 1"""
+    rangos = pd.Series(valores).rank(method="first", pct=True, ascending=ascendente)
+    return np.ceil(rangos.fillna(0.2) * 5).clip(1, 5).astype(np.int8).to_numpy()
+
+
+def calcular_rfm(serie_clientes, hoy=None):
+    """Cadencia y RFM de cada cliente a partir de sus ventas diarias.
+
+    `serie_clientes` es la `SerieIndexada` de clientes de `SeriesVentas`:
+    una fila por (cliente, día con compra) ya ordenada, así que intervalos,
+    última compra y montos salen de diferencias y conteos sobre arrays, en
+    una sola pasada y sin agrupar por cliente en Python. Una compra es un
+    día con pedidos del cliente.
+    """
+    hoy = hoy if hoy is not None else pd.Timestamp.now().normalize()
+    dia_hoy = int(np.datetime64(pd.Timestamp(hoy), "D").astype(np.int64))
+    entidad, dia = serie_clientes.entidad, serie_clientes.dia
+    n = len(serie_clientes.etiquetas)
+
+    compras = np.bincount(entidad, minlength=n)
+    monto = np.bincount(entidad, weights=serie_clientes.medidas["monto"], minlength=n)
+    ultima = np.full(n, np.nan)
+    fines = np.cumsum(compras) - 1
+    ultima[compras > 0] = dia[fines[compras > 0]]
+    recencia = dia_hoy - ultima
+
+    mismo = entidad[1:] == entidad[:-1]
+    intervalo = mediana_por_grupo(entidad[1:][mismo], np.diff(dia)[mismo].astype(float), n)
+
+    rfm = pd.DataFrame({
+        "compras": compras,
+        "recencia": recencia,
+        "intervalo_compra": intervalo,
+        "monto_rfm": monto,
+    }, index=serie_clientes.etiquetas)
+    rfm["r_score"] = quintil(-recencia)
+    rfm["f_score"] = quintil(compras.astype(float))
+    rfm["m_score"] = quintil(monto)
+    rfm["rfm_score"] = rfm["r_score"] + rfm["f_score"] + rfm["m_score"]
+    return rfm
+
+
+def segmentar(recencia, intervalo):
+    """Activo / Disminuido / Inactivo según los días sin comprar frente a la cadencia propia"""
+    recencia = np.asarray(recencia, dtype=float)
+    intervalo = np.asarray(intervalo, dtype=float)
+    con_cadencia = ~np.isnan(intervalo)
+    umbral_activo = np.where(con_cadencia, np.clip(FACTOR_ACTIVO * intervalo, *LIMITES_ACTIVO), DIAS_ACTIVO)
+    umbral_inactivo = np.where(con_cadencia, np.clip(FACTOR_INACTIVO * intervalo, *LIMITES_INACTIVO), DIAS_INACTIVO)
+    indice = np.where(recencia < umbral_activo, 0, np.where(recencia < umbral_inactivo, 1, 2))
+    # Sin compras (recencia NaN) se considera inactivo
+    indice[np.isnan(recencia)] = 2
+    return SEGMENTOS[indice]
+
+
+def compras_anuales(intervalo, compras):
+    """Compras esperadas por año: 365 / intervalo mediano; con una sola compra, una al año"""
+    intervalo = np.asarray(intervalo, dtype=float)
+    compras = np.asarray(compras, dtype=float)
+    return np.where(~np.isnan(intervalo), 365 / np.maximum(intervalo, 1), np.minimum(compras, 1))
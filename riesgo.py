@@ -0,0 +1,232 @@
+# ----------------------------------------------------------
+# RIESGO DE ABANDONO: ENTRENAMIENTO Y PUNTUACIÓN POR LOTES
+# ----------------------------------------------------------
+# Entrenamiento offline: python riesgo.py   (guarda el modelo en CRM_MODELO_RIESGO; el dashboard solo lo carga)
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from rfm import DIAS_ACTIVO, calcular_rfm
+
+# Archivo del modelo entrenado, configurable por entorno
+RUTA_MODELO = os.environ.get("CRM_MODELO_RIESGO", os.path.join("modelos", "riesgo_abandono.json"))
+
+CARACTERISTICAS = ["recencia_log", "recencia_relativa", "compras_log", "tendencia", "efectividad", "ticket_log"]
+
+# Se considera abandono no comprar nada en los próximos HORIZONTE_DIAS
+HORIZONTE_DIAS = 90
+# La tendencia compara las ventas de la última ventana con las de la anterior
+VENTANA_TENDENCIA = 90
+RECENCIA_MAXIMA = 365
+RECENCIA_RELATIVA_MAXIMA = 20
+# Mínimo de clientes de cada clase para entrenar
+MINIMO_POR_CLASE = 5
+
+
+# ----------------------------------------------------------
+# Características
+# ----------------------------------------------------------
+def tendencia_ventas(serie_clientes, hoy, ventana=VENTANA_TENDENCIA):
+    """Variación de ventas de la última ventana frente a la anterior, en [-1, 1] (0 sin ventas)"""
+    hoy, dias, un_dia = pd.Timestamp(hoy), pd.Timedelta(days=ventana), pd.Timedelta(days=1)
+    reciente = serie_clientes.totales(hoy - dias + un_dia, hoy)
+    anterior = serie_clientes.totales(hoy - 2 * dias + un_dia, hoy - dias)
+    total = reciente + anterior
+    return ((reciente - anterior) / total.where(total > 0)).fillna(0.0)
+
+
+def efectividad_hasta(pedidos, entregas, corte):
+    """Entregas / líneas de pedido por cliente con lo registrado hasta `corte`"""
+    lineas = pedidos[(pedidos["fecha_pedido"] <= corte) & pedidos["codigo_producto"].notna()].groupby("codigo_cliente").size()
+    entregados = entregas[entregas["fecha_entrega"] <= corte].groupby("codigo_cliente").size()
+    return (entregados.reindex(lineas.index).fillna(0) / lineas).clip(0, 1)
+
+
+def caracteristicas(recencia, intervalo, compras, monto, tendencia, efectividad):
+    """Matriz (clientes × CARACTERISTICAS) a partir de columnas alineadas por cliente"""
+    recencia = np.clip(np.nan_to_num(np.asarray(recencia, dtype=float), nan=RECENCIA_MAXIMA), 0, RECENCIA_MAXIMA)
+    intervalo = np.asarray(intervalo, dtype=float)
+    compras = np.nan_to_num(np.asarray(compras, dtype=float))
+    monto = np.nan_to_num(np.asarray(monto, dtype=float))
+    cadencia = np.where(np.isnan(intervalo), DIAS_ACTIVO, np.maximum(intervalo, 1))
+    return np.column_stack([
+        np.log1p(recencia),
+        np.minimum(recencia / cadencia, RECENCIA_RELATIVA_MAXIMA),
+        np.log1p(compras),
+        np.nan_to_num(np.asarray(tendencia, dtype=float)),
+        np.nan_to_num(np.asarray(efectividad, dtype=float)),
+        np.log1p(np.maximum(monto, 0) / np.maximum(compras, 1)),
+    ])
+
+
+def datos_entrenamiento(series, pedidos, entregas, hoy=None, horizonte=HORIZONTE_DIAS):
+    """Características a fecha de corte (hoy - horizonte) y etiqueta de abandono posterior.
+
+    `hoy` es por defecto el último día con pedidos. Solo entran los clientes
+    que ya habían comprado antes del corte; abandono = ninguna compra entre
+    el corte y `hoy`.
+    """
+    hoy = pd.Timestamp(hoy) if hoy is not None else series.fecha_max
+    corte = hoy - pd.Timedelta(days=horizonte)
+    serie_corte = series.clientes.hasta(corte)
+    rfm = calcular_rfm(serie_corte, corte)
+    rfm = rfm[rfm["compras"] > 0]
+    efectividad = efectividad_hasta(pedidos, entregas, corte).reindex(rfm.index).fillna(0.0)
+    X = caracteristicas(
+        rfm["recencia"], rfm["intervalo_compra"], rfm["compras"], rfm["monto_rfm"],
+        tendencia_ventas(serie_corte, corte).reindex(rfm.index), efectividad,
+    )
+    posteriores = series.clientes.totales(corte + pd.Timedelta(days=1), hoy, "lineas").reindex(rfm.index)
+    return X, (posteriores.to_numpy() == 0).astype(float)
+
+
+# ----------------------------------------------------------
+# Modelo
+# ----------------------------------------------------------
+def area_bajo_curva(y, probabilidad):
+    """AUC ROC por rangos (Mann-Whitney)"""
+    positivos = y == 1
+    n_pos, n_neg = positivos.sum(), (~positivos).sum()
+    if n_pos == 0 or n_neg == 0:
+        return float("nan")
+    rangos = pd.Series(probabilidad).rank().to_numpy()
+    return float((rangos[positivos].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+
+class ModeloRiesgo:
+    """Regresión logística con regularización L2, en NumPy.
+
+    Las características se estandarizan con la media y el desvío del
+    entrenamiento; el ajuste es por Newton (pocas características, converge
+    en unas pocas iteraciones). Se guarda como JSON legible.
+    """
+
+    def __init__(self, media, escala, pesos, sesgo, metadatos=None):
+        self.media = np.asarray(media, dtype=float)
+        self.escala = np.asarray(escala, dtype=float)
+        self.pesos = np.asarray(pesos, dtype=float)
+        self.sesgo = float(sesgo)
+        self.metadatos = metadatos or {}
+
+    @classmethod
+    def entrenar(cls, X, y, regularizacion=1.0, iteraciones=50, tolerancia=1e-8):
+        media = X.mean(axis=0)
+        escala = X.std(axis=0)
+        escala[escala == 0] = 1.0
+        Z = np.column_stack([np.ones(len(X)), (X - media) / escala])
+        penalizacion = np.full(Z.shape[1], regularizacion)
+        penalizacion[0] = 0.0  # el sesgo no se regulariza
+        beta = np.zeros(Z.shape[1])
+        for _ in range(iteraciones):
+            p = 1 / (1 + np.exp(-Z @ beta))
+            gradiente = Z.T @ (p - y) + penalizacion * beta
+            hessiana = (Z * (p * (1 - p))[:, None]).T @ Z + np.diag(penalizacion)
+            paso = np.linalg.solve(hessiana, gradiente)
+            beta -= paso
+            if np.abs(paso).max() < tolerancia:
+                break
+        modelo = cls(media, escala, beta[1:], beta[0])
+        modelo.metadatos = {
+            "entrenado": datetime.now().isoformat(timespec="seconds"),
+            "clientes": int(len(y)),
+            "tasa_abandono": float(y.mean()),
+            "auc_entrenamiento": area_bajo_curva(y, modelo.probabilidad(X)),
+        }
+        return modelo
+
+    def probabilidad(self, X):
+        """Probabilidad de abandono de cada fila de X"""
+        z = ((X - self.media) / self.escala) @ self.pesos + self.sesgo
+        return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+    def guardar(self, ruta=RUTA_MODELO):
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        contenido = {
+            "caracteristicas": CARACTERISTICAS,
+            "media": self.media.tolist(),
+            "escala": self.escala.tolist(),
+            "pesos": self.pesos.tolist(),
+            "sesgo": self.sesgo,
+            "metadatos": self.metadatos,
+        }
+        with open(ruta + ".tmp", "w", encoding="utf-8") as archivo:
+            json.dump(contenido, archivo, indent=2)
+        os.replace(ruta + ".tmp", ruta)
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_MODELO):
+        """Modelo guardado, o None si no existe o usa otras características"""
+        try:
+            with open(ruta, encoding="utf-8") as archivo:
+                contenido = json.load(archivo)
+        except (OSError, ValueError):
+            return None
+        if contenido.get("caracteristicas") != CARACTERISTICAS:
+            return None
+        return cls(contenido["media"], contenido["escala"], contenido["pesos"], contenido["sesgo"], contenido.get("metadatos"))
+
+
+def entrenar_modelo(series, pedidos, entregas, hoy=None):
+    """Entrena con los datos cargados; None si no hay suficientes clientes de cada clase"""
+    X, y = datos_entrenamiento(series, pedidos, entregas, hoy)
+    if min(y.sum(), len(y) - y.sum()) < MINIMO_POR_CLASE:
+        return None
+    return ModeloRiesgo.entrenar(X, y)
+
+
+def firma_modelo(ruta=RUTA_MODELO):
+    """Fecha de modificación del modelo guardado (None si no existe), para recargarlo solo si cambió"""
+    try:
+        return os.stat(ruta).st_mtime_ns
+    except OSError:
+        return None
+
+
+def puntuar_clientes(modelo, clientes, serie_clientes, hoy=None):
+    """Probabilidad de abandono de cada fila de la tabla de clientes.
+
+    Las características se calculan a fecha `hoy` (por defecto, el último
+    día con pedidos), igual que en el entrenamiento: con una exportación
+    atrasada, medir desde la fecha actual desplazaría la recencia y la
+    tendencia de todos los clientes.
+    """
+    hoy = pd.Timestamp(hoy) if hoy is not None else pd.Timestamp(np.datetime64(serie_clientes.rango_dias[1], "D"))
+    codigos = pd.Index(clientes["codigo_cliente"], dtype=object)
+    rfm = calcular_rfm(serie_clientes, hoy).reindex(codigos)
+    X = caracteristicas(
+        rfm["recencia"], rfm["intervalo_compra"], rfm["compras"], rfm["monto_rfm"],
+        tendencia_ventas(serie_clientes, hoy).reindex(codigos).fillna(0.0), clientes["efectividad_entrega"],
+    )
+    return modelo.probabilidad(X)
+
+
+def main():
+    from datos import AlmacenDatos
+    from fuentes import configuracion_fuente, crear_fuente
+
+    tipo_fuente, ubicacion = configuracion_fuente()
+    parser = argparse.ArgumentParser(description="Entrena el modelo de riesgo de abandono y lo guarda")
+    parser.add_argument("--fuente", default=tipo_fuente, help="sheets, excel, directorio, sqlite o duckdb")
+    parser.add_argument("--ruta", default=ubicacion, help="ID de Google Sheets o ruta de la fuente")
+    parser.add_argument("--salida", default=RUTA_MODELO, help="Archivo JSON del modelo")
+    parser.add_argument("--hoy", default=None, help="Fecha de referencia (por defecto, el último pedido)")
+    args = parser.parse_args()
+
+    almacen = AlmacenDatos(crear_fuente(args.fuente, args.ruta))
+    almacen.refrescar()
+    modelo = entrenar_modelo(almacen.series, almacen.pedidos, almacen.entregas, args.hoy)
+    if modelo is None:
+        raise SystemExit(f"No hay al menos {MINIMO_POR_CLASE} clientes que abandonan y que siguen comprando para entrenar")
+    modelo.guardar(args.salida)
+    metadatos = modelo.metadatos
+    print(f"Modelo entrenado con {metadatos['clientes']:,} clientes "
+          f"(abandono {metadatos['tasa_abandono']:.1%}, AUC {metadatos['auc_entrenamiento']:.3f}) "
+          f"en {os.path.abspath(args.salida)}")
+
+
+if __name__ == "__main__":
+    main()
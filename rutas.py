@@ -0,0 +1,214 @@
+# ----------------------------------------------------------
+# RUTAS DE VISITA: GRUPOS POR DÍA, VECINO MÁS CERCANO Y 2-OPT
+# ----------------------------------------------------------
+import numpy as np
+import pandas as pd
+
+RADIO_TIERRA_KM = 6371.0
+
+# Paradas por día de trabajo de un vendedor
+VISITAS_POR_DIA = 20
+# Prioridades de mayor a menor urgencia (se visitan en ese orden)
+ORDEN_PRIORIDAD = ["ALTA", "MEDIA", "BAJA"]
+# Barridos máximos de 2-opt por recorrido
+MAXIMO_BARRIDOS = 50
+# Más grupos (días) que esto en un tramo se recorren en el orden de la partición, sin 2-opt
+MAXIMO_GRUPOS_MATRIZ = 1_000
+# Paradas que el dashboard planifica como máximo (las de mayor puntaje)
+MAXIMO_PARADAS_RUTA = 5_000
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distancia en km entre puntos (en grados); admite broadcasting de NumPy"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def distancias_haversine(lat, lon, ficticio=False):
+    """Matriz de distancias en km de todas las paradas contra todas.
+
+    Con `ficticio` lleva una fila y columna más (la última) a distancia 0 de
+    todas, el nodo ficticio que usa `dos_opt`.
+    """
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    n = len(lat)
+    distancias = np.zeros((n + ficticio, n + ficticio))
+    distancias[:n, :n] = haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    return distancias
+
+
+def vecino_mas_cercano(distancias, inicio):
+    """Recorrido abierto que siempre va a la parada más cercana aún no visitada"""
+    n = len(distancias)
+    visitado = np.zeros(n, dtype=bool)
+    recorrido = np.empty(n, dtype=np.intp)
+    actual = inicio
+    for k in range(n):
+        recorrido[k] = actual
+        visitado[actual] = True
+        if k < n - 1:
+            candidatas = np.where(visitado, np.inf, distancias[actual])
+            actual = int(np.argmin(candidatas))
+    return recorrido
+
+
+def dos_opt(recorrido, distancias, maximo_barridos=MAXIMO_BARRIDOS):
+    """Mejora 2-opt de un recorrido abierto con la primera parada fija.
+
+    `distancias` incluye el nodo ficticio (última fila y columna, a
+    distancia 0 de todos; ver `distancias_haversine`), así invertir el
+    último tramo también se evalúa. En cada posición i se calculan de una
+    vez (vectorizado) las ganancias de todos los j y se aplica la mejor.
+    """
+    n = len(recorrido)
+    if n < 4:
+        return recorrido
+    ruta = np.r_[recorrido, len(distancias) - 1]
+    for _ in range(maximo_barridos):
+        mejoro = False
+        for i in range(n - 2):
+            a, b = ruta[i], ruta[i + 1]
+            c, d = ruta[i + 2:-1], ruta[i + 3:]
+            ganancia = distancias[a, b] + distancias[c, d] - distancias[a, c] - distancias[b, d]
+            j = int(np.argmax(ganancia))
+            if ganancia[j] > 1e-9:
+                ruta[i + 1:i + 3 + j] = ruta[i + 1:i + 3 + j][::-1]
+                mejoro = True
+        if not mejoro:
+            break
+    return ruta[:-1]
+
+
+def ordenar_paradas(lat, lon, inicio=None):
+    """Orden de visita (posiciones) de unas pocas paradas, saliendo de `inicio` (lat, lon) si se indica.
+
+    Usa la matriz completa de distancias: para muchas paradas, agruparlas
+    antes con `agrupar_paradas`.
+    """
+    n = len(lat)
+    if n == 0:
+        return np.array([], dtype=np.intp)
+    if inicio is None:
+        # Sin punto de salida se empieza por la parada más alejada del centro (un extremo)
+        distancias = distancias_haversine(lat, lon, ficticio=True)
+        primera = int(np.argmax(haversine(lat, lon, np.mean(lat), np.mean(lon))))
+        return dos_opt(vecino_mas_cercano(distancias[:-1, :-1], primera), distancias)
+    # El punto de salida es la parada 0 (fija) y luego se descarta
+    distancias = distancias_haversine(np.r_[inicio[0], lat], np.r_[inicio[1], lon], ficticio=True)
+    return dos_opt(vecino_mas_cercano(distancias[:-1, :-1], 0), distancias)[1:] - 1
+
+
+def agrupar_paradas(lat, lon, tamano):
+    """Parte las paradas en grupos de `tamano` (el último con el resto) cercanos entre sí.
+
+    Bisección recursiva por el eje más extendido, como un árbol k-d: cada
+    corte cae en un múltiplo de `tamano`, así todos los grupos salen llenos
+    salvo el último. Cada segunda mitad se recorre en sentido contrario a la
+    primera, de modo que un grupo termina cerca de donde empieza el siguiente.
+    Devuelve las posiciones de cada grupo, en ese orden.
+    """
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    # Proyección equirectangular: un grado de longitud mide menos que uno de latitud
+    x = lon * np.cos(np.radians(np.mean(lat))) if len(lat) else lon
+    grupos = []
+
+    def dividir(posiciones, n_grupos, invertido):
+        if n_grupos == 1:
+            grupos.append(posiciones)
+            return
+        mitad = n_grupos // 2
+        eje = x if np.ptp(x[posiciones]) >= np.ptp(lat[posiciones]) else lat
+        valores = -eje[posiciones] if invertido else eje[posiciones]
+        particion = np.argpartition(valores, mitad * tamano)
+        dividir(posiciones[particion[:mitad * tamano]], mitad, invertido)
+        dividir(posiciones[particion[mitad * tamano:]], n_grupos - mitad, not invertido)
+
+    if len(lat):
+        dividir(np.arange(len(lat)), -(-len(lat) // tamano), False)
+    return grupos
+
+
+def ruta_vendedor(lat, lon, prioridad, orden_prioridad=ORDEN_PRIORIDAD, inicio=None, visitas_por_dia=VISITAS_POR_DIA):
+    """Orden de visita de las paradas de un vendedor: por tramos de prioridad.
+
+    Cada tramo se parte en grupos de un día (`agrupar_paradas`); los grupos
+    se ordenan recorriendo sus centros y cada uno se optimiza por separado,
+    así ninguna matriz de distancias pasa de un día de paradas (o de
+    MAXIMO_GRUPOS_MATRIZ grupos). El grupo incompleto cierra el tramo y el
+    siguiente tramo empieza donde terminó. Las paradas sin coordenadas van
+    al final de su tramo, en su orden original y en días propios.
+
+    Devuelve (orden, dia): las posiciones en orden de visita y el día (desde
+    1) de cada una. Cada grupo es un día entero, así ningún día mezcla
+    grupos ni tramos (el último día de un tramo puede quedar corto).
+    """
+    rango = pd.Categorical(prioridad, categories=orden_prioridad).codes
+    rango = np.where(rango < 0, len(orden_prioridad), rango)
+    jornadas = []
+    for tramo in np.unique(rango):
+        paradas = np.flatnonzero(rango == tramo)
+        sin_coordenadas = np.isnan(lat[paradas]) | np.isnan(lon[paradas])
+        ubicadas = paradas[~sin_coordenadas]
+        grupos = [ubicadas[grupo] for grupo in agrupar_paradas(lat[ubicadas], lon[ubicadas], visitas_por_dia)]
+        completos = grupos[:-1]
+        if 1 < len(completos) <= MAXIMO_GRUPOS_MATRIZ:
+            centros_lat = np.array([lat[grupo].mean() for grupo in completos])
+            centros_lon = np.array([lon[grupo].mean() for grupo in completos])
+            grupos = [completos[k] for k in ordenar_paradas(centros_lat, centros_lon, inicio)] + grupos[-1:]
+        for grupo in grupos:
+            secuencia = grupo[ordenar_paradas(lat[grupo], lon[grupo], inicio)]
+            inicio = (lat[secuencia[-1]], lon[secuencia[-1]])
+            jornadas.append(secuencia)
+        sin_ubicar = paradas[sin_coordenadas]
+        jornadas.extend(sin_ubicar[k:k + visitas_por_dia] for k in range(0, len(sin_ubicar), visitas_por_dia))
+    if not jornadas:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.intp)
+    dias = np.repeat(np.arange(1, len(jornadas) + 1), [len(jornada) for jornada in jornadas])
+    return np.concatenate(jornadas).astype(np.intp), dias
+
+
+def planificar_rutas(clientes, visitas_por_dia=VISITAS_POR_DIA, columna_vendedor="zona",
+                     columna_prioridad="prioridad", orden_prioridad=ORDEN_PRIORIDAD):
+    """Ruta ordenada por vendedor con día, orden y distancias de cada visita.
+
+    `clientes` necesita las columnas `lat`, `lon`, la del vendedor y la de
+    prioridad. Devuelve las filas reordenadas (vendedor, día, orden) con
+    `dia`, `orden`, `distancia_km` (desde la parada anterior del mismo día)
+    y `acumulado_km`.
+    """
+    lat = clientes["lat"].to_numpy(dtype=float, na_value=np.nan)
+    lon = clientes["lon"].to_numpy(dtype=float, na_value=np.nan)
+    prioridad = clientes[columna_prioridad].astype(str).to_numpy()
+    codigos, vendedores = pd.factorize(clientes[columna_vendedor].astype(str), sort=True)
+
+    posiciones, dias, ordenes = [], [], []
+    for k in range(len(vendedores)):
+        grupo = np.flatnonzero(codigos == k)
+        orden, dia = ruta_vendedor(lat[grupo], lon[grupo], prioridad[grupo], orden_prioridad,
+                                   visitas_por_dia=visitas_por_dia)
+        posiciones.append(grupo[orden])
+        ordenes.append(np.arange(1, len(orden) + 1))
+        dias.append(dia)
+    if not posiciones:
+        return clientes.iloc[:0].assign(dia=[], orden=[], distancia_km=[], acumulado_km=[])
+
+    posiciones = np.concatenate(posiciones)
+    ruta = clientes.iloc[posiciones].assign(dia=np.concatenate(dias), orden=np.concatenate(ordenes))
+    # Distancia desde la parada anterior del mismo vendedor y día (la primera del día, 0)
+    lat_ruta, lon_ruta = lat[posiciones], lon[posiciones]
+    tramo = haversine(lat_ruta[:-1], lon_ruta[:-1], lat_ruta[1:], lon_ruta[1:])
+    mismo_dia = (codigos[posiciones][1:] == codigos[posiciones][:-1]) & (ruta["dia"].to_numpy()[1:] == ruta["dia"].to_numpy()[:-1])
+    distancia = np.r_[0.0, np.where(mismo_dia, np.nan_to_num(tramo), 0.0)]
+    ruta["distancia_km"] = distancia.round(2)
+    ruta["acumulado_km"] = pd.Series(distancia, index=ruta.index).groupby([codigos[posiciones], ruta["dia"].to_numpy()]).cumsum().round(2)
+    return ruta
+
+
+def resumen_rutas(ruta, columna_vendedor="zona"):
+    """Paradas, días y km por vendedor"""
+    return ruta.groupby(columna_vendedor, observed=True).agg(
+        paradas=("orden", "size"),
+        dias=("dia", "max"),
+        km=("distancia_km", "sum"),
+    ).round({"km": 1}).reset_index()
@@ -0,0 +1,222 @@
+# ----------------------------------------------------------
+# SERIES DE TIEMPO: VENTAS DIARIAS POR CLIENTE Y PRODUCTO
+# ----------------------------------------------------------
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+MEDIDAS = ("monto", "cantidad", "lineas")
+
+# Frecuencias de agregación (alias de pandas con la etiqueta al inicio del periodo)
+FRECUENCIAS = {"D": "D", "W": "W-MON", "M": "MS"}
+
+# Desplazamientos para combinar (entidad, día) en una clave entera ordenable
+_DESPLAZAMIENTO_DIA = 2 ** 31
+_BASE_ENTIDAD = 2 ** 32
+
+
+def dias_desde_epoca(fechas):
+    """Fechas (Serie o array datetime64) como número entero de días"""
+    return np.asarray(fechas, dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+
+
+def _dia(fecha, defecto):
+    if fecha is None:
+        return defecto
+    return int(dias_desde_epoca([pd.Timestamp(fecha)])[0])
+
+
+class SerieIndexada:
+    """Ventas diarias de una dimensión (cliente o producto) en arrays compactos.
+
+    Una fila por (entidad, día con ventas), ordenada por entidad y día, con
+    las sumas acumuladas de cada medida. La suma de cualquier rango de días
+    es la diferencia de dos acumulados, y los límites de todas las entidades
+    se obtienen con una sola búsqueda binaria vectorizada.
+    """
+
+    def __init__(self, etiquetas, entidad, dia, medidas):
+        clave = entidad.astype(np.int64) * _BASE_ENTIDAD + (dia.astype(np.int64) + _DESPLAZAMIENTO_DIA)
+        orden = np.argsort(clave, kind="stable")
+        clave = clave[orden]
+        inicios = np.flatnonzero(np.r_[True, clave[1:] != clave[:-1]]) if len(clave) else np.array([], dtype=np.int64)
+
+        self.etiquetas = pd.Index(etiquetas, dtype=object)
+        self.clave = clave[inicios]
+        self.entidad = (self.clave // _BASE_ENTIDAD).astype(np.int32)
+        self.dia = (self.clave % _BASE_ENTIDAD - _DESPLAZAMIENTO_DIA).astype(np.int32)
+        self.medidas = {
+            nombre: np.add.reduceat(valores[orden], inicios) if len(inicios) else np.array([], dtype=float)
+            for nombre, valores in medidas.items()
+        }
+        self.acumulados = {nombre: np.r_[0.0, np.cumsum(valores)] for nombre, valores in self.medidas.items()}
+
+    @classmethod
+    def desde_pedidos(cls, pedidos, columna):
+        validos = pedidos[columna].notna().to_numpy() & pedidos["fecha_pedido"].notna().to_numpy()
+        codigos, etiquetas = pd.factorize(pedidos.loc[validos, columna])
+        medidas = {
+            "monto": pedidos.loc[validos, "monto"].to_numpy(dtype=float, na_value=0.0),
+            "cantidad": pedidos.loc[validos, "cantidad"].to_numpy(dtype=float, na_value=0.0),
+            "lineas": np.ones(int(validos.sum()), dtype=float),
+        }
+        return cls(etiquetas, codigos, dias_desde_epoca(pedidos.loc[validos, "fecha_pedido"]), medidas)
+
+    def combinar(self, otra):
+        """Nueva serie con los puntos de ambas (las etiquetas nuevas se añaden al final)"""
+        etiquetas = self.etiquetas.append(otra.etiquetas.difference(self.etiquetas, sort=False))
+        entidad_otra = etiquetas.get_indexer(otra.etiquetas)[otra.entidad]
+        return SerieIndexada(
+            etiquetas,
+            np.concatenate([self.entidad, entidad_otra]),
+            np.concatenate([self.dia, otra.dia]),
+            {nombre: np.concatenate([self.medidas[nombre], otra.medidas[nombre]]) for nombre in self.medidas},
+        )
+
+    def hasta(self, fecha):
+        """Nueva serie solo con los puntos hasta `fecha` (incluida)"""
+        mascara = self.dia <= _dia(fecha, _DESPLAZAMIENTO_DIA - 1)
+        return SerieIndexada(
+            self.etiquetas,
+            self.entidad[mascara],
+            self.dia[mascara],
+            {nombre: valores[mascara] for nombre, valores in self.medidas.items()},
+        )
+
+    @property
+    def rango_dias(self):
+        return (int(self.dia.min()), int(self.dia.max())) if len(self.dia) else (0, -1)
+
+    def _limites(self, entidades, desde, hasta):
+        base = entidades.astype(np.int64) * _BASE_ENTIDAD + _DESPLAZAMIENTO_DIA
+        return np.searchsorted(self.clave, base + desde, side="left"), np.searchsorted(self.clave, base + hasta, side="right")
+
+    def totales(self, desde=None, hasta=None, medida="monto"):
+        """Total de la medida por entidad entre dos fechas (incluidas)"""
+        desde, hasta = _dia(desde, -_DESPLAZAMIENTO_DIA), _dia(hasta, _DESPLAZAMIENTO_DIA - 1)
+        inicio, fin = self._limites(np.arange(len(self.etiquetas)), desde, hasta)
+        acumulado = self.acumulados[medida]
+        return pd.Series(acumulado[fin] - acumulado[inicio], index=self.etiquetas, name=medida)
+
+    def diaria(self, etiquetas=None, medida="monto"):
+        """Serie diaria densa (días sin ventas en 0) de las entidades indicadas o de todas"""
+        if etiquetas is None:
+            seleccion = slice(None)
+        else:
+            elegidas = np.zeros(len(self.etiquetas), dtype=bool)
+            posiciones = self.etiquetas.get_indexer(pd.Index(etiquetas))
+            elegidas[posiciones[posiciones >= 0]] = True
+            seleccion = elegidas[self.entidad]
+        dias, valores = self.dia[seleccion], self.medidas[medida][seleccion]
+        if len(dias) == 0:
+            return pd.Series(dtype=float, name=medida)
+        primero = dias.min()
+        suma = np.bincount(dias - primero, weights=valores)
+        fechas = pd.to_datetime(np.arange(primero, primero + len(suma)).astype("datetime64[D]"))
+        return pd.Series(suma, index=fechas, name=medida)
+
+    def intervalos(self):
+        """Días entre compras consecutivas de cada entidad (compras, promedio, desvío, mínimo, máximo, último)"""
+        mismo = self.entidad[1:] == self.entidad[:-1]
+        diferencias = pd.DataFrame({
+            "entidad": self.entidad[1:][mismo],
+            "dias": np.diff(self.dia)[mismo],
+        })
+        estadisticas = diferencias.groupby("entidad")["dias"].agg(["mean", "std", "min", "max", "last"])
+        estadisticas.columns = ["intervalo_promedio", "intervalo_desvio", "intervalo_min", "intervalo_max", "ultimo_intervalo"]
+        estadisticas = estadisticas.reindex(np.arange(len(self.etiquetas)))
+        estadisticas.insert(0, "compras", np.bincount(self.entidad, minlength=len(self.etiquetas)))
+        estadisticas.index = self.etiquetas
+        return estadisticas
+
+
+class SeriesVentas:
+    """Series de ventas diarias por cliente y por producto.
+
+    Se construye una vez y se actualiza con `con_pedidos` cuando llegan
+    pedidos nuevos: solo se agregan por día las filas nuevas y se combinan
+    con los puntos existentes (el objeto anterior no se modifica, así las
+    sesiones que lo usan no ven cambios a mitad de una ejecución).
+
+    Las ventas semanales o mensuales salen de las diarias: cualquier rango
+    es una resta de acumulados. Los totales por zona (u otro atributo del
+    cliente) se obtienen sumando los totales de los clientes.
+    """
+
+    def __init__(self, pedidos=None, clientes=None, productos=None):
+        if pedidos is not None:
+            clientes = SerieIndexada.desde_pedidos(pedidos, "codigo_cliente")
+            productos = SerieIndexada.desde_pedidos(pedidos, "producto")
+        self.clientes = clientes
+        self.productos = productos
+
+    def con_pedidos(self, pedidos_nuevos):
+        """Nuevas series con los pedidos añadidos"""
+        if pedidos_nuevos.empty:
+            return self
+        return SeriesVentas(
+            clientes=self.clientes.combinar(SerieIndexada.desde_pedidos(pedidos_nuevos, "codigo_cliente")),
+            productos=self.productos.combinar(SerieIndexada.desde_pedidos(pedidos_nuevos, "producto")),
+        )
+
+    @property
+    def fecha_min(self):
+        return pd.Timestamp(np.datetime64(self.clientes.rango_dias[0], "D"))
+
+    @property
+    def fecha_max(self):
+        return pd.Timestamp(np.datetime64(self.clientes.rango_dias[1], "D"))
+
+    def serie(self, frecuencia="M", clientes=None, producto=None, desde=None, hasta=None, medida="monto"):
+        """Ventas por día ("D"), semana ("W") o mes ("M") de unos clientes, un producto o del total"""
+        if producto is not None:
+            diaria = self.productos.diaria([producto], medida)
+        else:
+            diaria = self.clientes.diaria(clientes, medida)
+        if desde is not None or hasta is not None:
+            diaria = diaria.loc[pd.Timestamp(desde) if desde is not None else None:pd.Timestamp(hasta) if hasta is not None else None]
+        if diaria.empty:
+            return diaria
+        return diaria.resample(FRECUENCIAS[frecuencia], label="left", closed="left").sum()
+
+    @staticmethod
+    def acumulado_movil(serie, periodos):
+        """Suma móvil de los últimos `periodos` periodos"""
+        return serie.rolling(periodos, min_periods=1).sum()
+
+    @staticmethod
+    def tasa_crecimiento(serie, periodos=1):
+        """Variación relativa respecto a `periodos` periodos antes (NaN si antes no hubo ventas)"""
+        anterior = serie.shift(periodos)
+        return (serie - anterior) / anterior.where(anterior != 0)
+
+    def totales_clientes(self, desde=None, hasta=None, medida="monto"):
+        return self.clientes.totales(desde, hasta, medida)
+
+    def totales_productos(self, desde=None, hasta=None, medida="monto"):
+        return self.productos.totales(desde, hasta, medida)
+
+    def totales_grupo(self, grupo_cliente, desde=None, hasta=None, medida="monto"):
+        """Totales por grupo de clientes; `grupo_cliente` es una Serie codigo_cliente -> grupo (p. ej. zona)"""
+        totales = self.totales_clientes(desde, hasta, medida)
+        grupo_cliente = grupo_cliente[~grupo_cliente.index.duplicated()]
+        grupos = pd.Series(grupo_cliente.to_numpy(), index=pd.Index(grupo_cliente.index, dtype=object)).reindex(totales.index)
+        return totales.groupby(grupos.to_numpy(), observed=True).sum()
+
+    def crecimiento_clientes(self, desde, hasta, medida="monto"):
+        """Ventas del rango, del rango anterior de igual duración y su variación relativa, por cliente"""
+        desde, hasta = pd.Timestamp(desde), pd.Timestamp(hasta)
+        duracion = hasta - desde + pd.Timedelta(days=1)
+        actual = self.totales_clientes(desde, hasta, medida)
+        anterior = self.totales_clientes(desde - duracion, desde - pd.Timedelta(days=1), medida)
+        return pd.DataFrame({
+            "actual": actual,
+            "anterior": anterior,
+            "crecimiento": (actual - anterior) / anterior.where(anterior != 0),
+        })
+
+    @cached_property
+    def intervalos_clientes(self):
+        """Estadísticas de días entre compras de cada cliente"""
+        return self.clientes.intervalos()
@@ -0,0 +1,128 @@
+# ----------------------------------------------------------
+# TABLAS PAGINADAS: ORDEN Y PAGINACIÓN EN EL SERVIDOR CON AGGRID
+# ----------------------------------------------------------
+import json
+
+import pandas as pd
+import streamlit as st
+from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
+
+from controles import indice_guardado, recordar_control, valor_guardado
+from exportacion import FORMATOS, contenido_exportacion, nombre_archivo
+
+FILAS_POR_PAGINA = 50
+OPCIONES_FILAS = [25, 50, 100, 250]
+
+
+def posiciones_ordenadas(serie, descendente=False):
+    """Posiciones de fila que ordenan la serie (estable, nulos al final)"""
+    valores = serie.where(serie.isna(), serie.astype(str)) if serie.dtype == object else serie
+    ordenada = pd.Series(valores.to_numpy()).sort_values(ascending=not descendente, kind="mergesort", na_position="last")
+    return ordenada.index.to_numpy()
+
+
+def formatear_pagina(pagina, formatos):
+    """Aplica los formatos (`"RD${:,.2f}"` o una función) solo a las filas visibles"""
+    pagina = pagina.copy()
+    for columna, formato in (formatos or {}).items():
+        aplicar = formato if callable(formato) else formato.format
+        pagina[columna] = [aplicar(valor) if pd.notna(valor) else "" for valor in pagina[columna]]
+    # Columnas con tipos mezclados (p. ej. códigos numéricos y de texto) se envían como texto
+    for columna in pagina.columns[pagina.dtypes == object]:
+        if pd.api.types.infer_dtype(pagina[columna], skipna=True).startswith("mixed"):
+            pagina[columna] = pagina[columna].astype(str)
+    return pagina
+
+
+def estilo_filas_js(columna, colores):
+    """Regla de AgGrid que colorea cada fila según el valor de `columna`"""
+    return JsCode(f"""
+        function(params) {{
+            const colores = {json.dumps(colores)};
+            const color = params.data ? colores[params.data[{json.dumps(columna)}]] : undefined;
+            return color ? {{'background-color': color}} : null;
+        }}
+    """)
+
+
+def tabla_paginada(df, columnas, key, titulos=None, formatos=None, orden=None, descendente=True,
+                   colores_filas=None, filas_por_pagina=FILAS_POR_PAGINA):
+    """Tabla AgGrid que solo envía al navegador la página visible.
+
+    El orden y la paginación se resuelven en el servidor sobre `df`
+    completo; el formato de las columnas se aplica solo a la página.
+    `colores_filas` es `(columna, {valor: color})` y se traduce a una regla
+    de estilo de fila de AgGrid (sin Styler). Los controles conservan su
+    valor al cambiar de sección (ver controles.py). Devuelve la página mostrada.
+    """
+    titulos = titulos or {}
+    columnas_control = st.columns([3, 2, 2, 2])
+    with columnas_control[0]:
+        columna_orden = st.selectbox(
+            "Ordenar por", columnas,
+            index=indice_guardado(f"{key}_orden", columnas, columnas.index(orden) if orden in columnas else 0),
+            format_func=lambda c: titulos.get(c, c), **recordar_control(f"{key}_orden"),
+        )
+    with columnas_control[1]:
+        sentido = st.selectbox("Sentido", ["Descendente", "Ascendente"],
+                               index=indice_guardado(f"{key}_sentido", ["Descendente", "Ascendente"], 0 if descendente else 1),
+                               **recordar_control(f"{key}_sentido"))
+    with columnas_control[2]:
+        tamano = st.selectbox(
+            "Filas por página", OPCIONES_FILAS,
+            index=indice_guardado(f"{key}_tamano", OPCIONES_FILAS,
+                                  OPCIONES_FILAS.index(filas_por_pagina) if filas_por_pagina in OPCIONES_FILAS else 0),
+            **recordar_control(f"{key}_tamano"),
+        )
+    total_paginas = max(1, -(-len(df) // tamano))
+    with columnas_control[3]:
+        pagina = st.number_input("Página", min_value=1, max_value=total_paginas, step=1,
+                                 value=min(valor_guardado(f"{key}_pagina", 1), total_paginas), **recordar_control(f"{key}_pagina"))
+    pagina = min(int(pagina), total_paginas)
+
+    inicio = (pagina - 1) * tamano
+    posiciones = posiciones_ordenadas(df[columna_orden], sentido == "Descendente")[inicio:inicio + tamano]
+    visibles = formatear_pagina(df[columnas].iloc[posiciones], formatos).reset_index(drop=True)
+    st.caption(f"Mostrando {inicio + 1 if len(df) else 0:,}–{inicio + len(visibles):,} de {len(df):,} · página {pagina} de {total_paginas}")
+
+    gb = GridOptionsBuilder.from_dataframe(visibles)
+    # El orden ya se resolvió sobre toda la tabla; ordenar en el navegador solo afectaría a la página
+    gb.configure_default_column(sortable=False, filter=False)
+    for columna in columnas:
+        gb.configure_column(columna, header_name=titulos.get(columna, columna))
+    if colores_filas is not None:
+        gb.configure_grid_options(getRowStyle=estilo_filas_js(*colores_filas))
+
+    AgGrid(
+        visibles,
+        gridOptions=gb.build(),
+        theme="alpine",
+        enable_enterprise_modules=False,
+        allow_unsafe_jscode=colores_filas is not None,
+        fit_columns_on_grid_load=True,
+        height=min(400, 36 + 29 * max(len(visibles), 1)),
+        key=f"{key}_grid",
+    )
+    return visibles
+
+
+def boton_exportar(obtener_tabla, nombre, key, titulos=None, etiqueta="📥 Descargar"):
+    """Selector de formato y botón de descarga de una vista.
+
+    `obtener_tabla` (sin argumentos) devuelve la tabla a exportar: solo se
+    llama, y el archivo solo se escribe por bloques, al pulsar el botón.
+    Descargar no vuelve a ejecutar la página.
+    """
+    columnas_exportar = st.columns([1, 2])
+    with columnas_exportar[0]:
+        formato = st.selectbox("Formato", list(FORMATOS), index=indice_guardado(f"{key}_formato", FORMATOS),
+                               label_visibility="collapsed", **recordar_control(f"{key}_formato"))
+    with columnas_exportar[1]:
+        st.download_button(
+            f"{etiqueta} {formato}",
+            data=lambda: contenido_exportacion(obtener_tabla(), formato, titulos=titulos),
+            file_name=nombre_archivo(nombre, formato),
+            mime=FORMATOS[formato][1],
+            key=f"{key}_descarga",
+            on_click="ignore",
+        )
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from rutas import VISITAS_POR_DIA, planificar_rutas
+
+
+def _clientes(semilla=0):
+    generador = np.random.default_rng(semilla)
+    n_alta, n_media = 27, 30
+    lat = np.r_[generador.uniform(-12.2, -11.9, n_alta), generador.uniform(-13.2, -12.9, n_media)]
+    lon = np.r_[generador.uniform(-77.1, -76.9, n_alta), generador.uniform(-76.4, -76.2, n_media)]
+    lat[[3, 40]] = np.nan
+    return pd.DataFrame({
+        "lat": lat,
+        "lon": lon,
+        "zona": "Z1",
+        "prioridad": ["ALTA"] * n_alta + ["MEDIA"] * n_media,
+    })
+
+
+def test_ningun_dia_mezcla_prioridades():
+    ruta = planificar_rutas(_clientes())
+    por_dia = ruta.groupby(["zona", "dia"])
+    assert (por_dia["prioridad"].nunique() == 1).all()
+    assert (por_dia.size() <= VISITAS_POR_DIA).all()
+
+
+def test_ningun_dia_mezcla_ubicadas_y_sin_coordenadas():
+    ruta = planificar_rutas(_clientes())
+    sin_coordenadas = ruta["lat"].isna() | ruta["lon"].isna()
+    assert (sin_coordenadas.groupby([ruta["zona"], ruta["dia"]]).nunique() == 1).all()
+
+
+def test_dias_consecutivos_y_todas_las_paradas():
+    clientes = _clientes()
+    ruta = planificar_rutas(clientes)
+    assert sorted(ruta.index) == sorted(clientes.index)
+    assert ruta["dia"].is_monotonic_increasing
+    assert list(ruta["dia"].unique()) == list(range(1, ruta["dia"].max() + 1))
+    assert list(ruta["orden"]) == list(range(1, len(ruta) + 1))